@@ -0,0 +1,163 @@
+"""
+Compare index backends: rebuild throughput, index size and cold and warm
+query latency.
+
+    python benchmarks/backends.py --notes 2000
+
+Backends are the segment file, the SQLite FTS5 database and, as a
+baseline, the old layout pickling all processed notes and the index.
+Stems are cached before the first build, so builds differ in indexing
+and storage only. Cold queries run in a fresh interpreter and include
+imports and opening the index.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from corpus import WORDS, generate_notes
+
+from mnemo_cli.enums import Language
+from mnemo_cli.indexer import build_index, search_index
+from mnemo_cli.pipeline import build_segment, build_sqlite, process_notes
+from mnemo_cli.segment import Segment
+from mnemo_cli.sqlite_index import SqliteIndex
+from mnemo_cli.utils.storage import load_pickle, save_pickle
+
+
+COLD_SEARCH = """
+import sys, time
+started = time.perf_counter()
+from mnemo_cli.enums import Language
+from mnemo_cli.indexer import search_index
+backend, path, query, languages = sys.argv[1:]
+languages = {Language(code) for code in languages.split(",")}
+if backend == "pickle":
+    from mnemo_cli.utils.storage import load_pickle
+    data = load_pickle(path)
+    index, notes = data["index"], {note["id"]: note for note in data["notes"]}
+elif backend == "segment":
+    from mnemo_cli.segment import Segment
+    index = Segment(path)
+    notes = index.notes
+else:
+    from mnemo_cli.sqlite_index import SqliteIndex
+    index = SqliteIndex(path)
+    notes = index.notes
+search_index(query=query, index=index, notes=notes, languages=languages, limit=10)
+print(time.perf_counter() - started)
+"""
+
+
+
+def build_pickle(notes, languages, path):
+    processed = process_notes(notes, languages)
+    save_pickle({"notes": processed, "index": build_index(processed)}, path)
+
+
+
+def open_pickle(path):
+    data = load_pickle(path)
+    return data["index"], {note["id"]: note for note in data["notes"]}
+
+
+
+def open_segment(path):
+    segment = Segment(path)
+    return segment, segment.notes
+
+
+
+def open_sqlite(path):
+    index = SqliteIndex(path)
+    return index, index.notes
+
+
+
+BACKENDS = {
+    "pickle": ("index.pkl", build_pickle, open_pickle),
+    "segment": ("index.seg", build_segment, open_segment),
+    "sqlite": ("index.sqlite", build_sqlite, open_sqlite),
+}
+
+
+
+def make_queries(languages: list[str]) -> list[str]:
+    queries = []
+    for lang in languages:
+        common, other = WORDS[lang][0], WORDS[lang][3]
+        queries.append(common)
+        queries.append(f"{common} {other}")
+    queries.append(f'"{WORDS[languages[0]][0]} {WORDS[languages[0]][1]}"')
+    return queries
+
+
+
+def cold_search(backend: str, path: Path, query: str, languages: str, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_SEARCH, backend, str(path), query, languages],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(float(output))
+    return statistics.median(runs)
+
+
+
+def warm_search(index, notes, query: str, languages: set, repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        search_index(query=query, index=index, notes=notes, languages=languages, limit=10)
+        runs.append(time.perf_counter() - started)
+    return statistics.median(runs)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--languages", default="en,es,ru")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    language_codes = args.languages.split(",")
+    languages = {Language(code) for code in language_codes}
+    notes = list(generate_notes(args.notes, languages=language_codes, seed=args.seed))
+    queries = make_queries(language_codes)
+    process_notes(notes, languages)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'backend':<8} {'build s':>8} {'notes/s':>8} {'size KB':>9}  query")
+        for backend in args.backends.split(","):
+            filename, build, open_index = BACKENDS[backend]
+            path = Path(tmp) / filename
+
+            started = time.perf_counter()
+            build(iter(notes), languages, path)
+            seconds = time.perf_counter() - started
+            print(
+                f"{backend:<8} {seconds:>8.2f} {len(notes) / seconds:>8.0f} "
+                f"{path.stat().st_size / 1024:>9.0f}"
+            )
+
+            index, stored = open_index(path)
+            for query in queries:
+                cold = cold_search(backend, path, query, args.languages, args.repeat)
+                warm = warm_search(index, stored, query, languages, args.repeat)
+                print(f"{'':<37} {query:<24} cold {cold * 1000:>7.1f} ms  warm {warm * 1000:>7.1f} ms")
+            if hasattr(index, "close"):
+                index.close()
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Synthetic multilingual note corpora in the shape `export_notes` returns.
+
+    python benchmarks/corpus.py --notes 1000 --languages en,es,ru > notes.jsonl
+"""
+import argparse
+from datetime import datetime, timedelta
+import json
+import random
+import sys
+
+
+WORDS = {
+    "en": [
+        "note", "project", "meeting", "python", "search", "index", "idea", "book",
+        "travel", "recipe", "server", "deploy", "config", "garden", "running",
+        "music", "budget", "family", "weekend", "design", "review", "release",
+        "database", "question", "answer", "learning", "writing", "reading",
+        "morning", "evening", "health", "coffee", "kubernetes", "docker",
+        "function", "testing", "planning", "shopping", "holiday", "language",
+    ],
+    "es": [
+        "nota", "proyecto", "reunión", "búsqueda", "índice", "idea", "libro",
+        "viaje", "receta", "servidor", "configuración", "jardín", "correr",
+        "música", "presupuesto", "familia", "semana", "diseño", "revisión",
+        "pregunta", "respuesta", "aprender", "escribir", "leer", "mañana",
+        "tarde", "salud", "café", "función", "prueba", "compras", "vacaciones",
+        "idioma", "ciudad", "trabajo", "casa", "comida", "historia", "tiempo",
+    ],
+    "ru": [
+        "заметка", "проект", "встреча", "поиск", "индекс", "идея", "книга",
+        "путешествие", "рецепт", "сервер", "настройка", "сад", "бег", "музыка",
+        "бюджет", "семья", "выходные", "дизайн", "обзор", "релиз", "вопрос",
+        "ответ", "обучение", "письмо", "чтение", "утро", "вечер", "здоровье",
+        "кофе", "функция", "тест", "покупки", "отпуск", "язык", "город",
+        "работа", "дом", "еда", "история", "время",
+    ],
+}
+
+STOP_WORDS = {
+    "en": ["the", "and", "with", "for", "about", "from", "this"],
+    "es": ["el", "la", "con", "para", "sobre", "desde", "esta"],
+    "ru": ["и", "в", "на", "с", "для", "про", "это"],
+}
+
+SYLLABLES = {
+    "en": ["ka", "ro", "mi", "tek", "lan", "sor", "vi", "den", "pal", "qui"],
+    "es": ["ca", "ro", "mi", "la", "ño", "gue", "ti", "dos", "par", "ción"],
+    "ru": ["ка", "ро", "ми", "ла", "ст", "ви", "де", "пол", "ник", "ость"],
+}
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+START_DATE = datetime(2020, 1, 1)
+
+
+
+def make_vocabulary(lang: str, size: int, rng: random.Random) -> list[str]:
+    """Common words first, then pseudo-words for the long tail."""
+    words = list(WORDS[lang])
+    seen = set(words)
+    while len(words) < size:
+        word = "".join(rng.choices(SYLLABLES[lang], k=rng.randint(2, 4)))
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+
+def make_text(vocabulary: list[str], weights: list[float], stop_words: list[str], length: int, rng: random.Random) -> str:
+    words = rng.choices(vocabulary, cum_weights=weights, k=length)
+    for i in range(0, length, 5):
+        words[i] = rng.choice(stop_words)
+
+    sentences = []
+    for start in range(0, length, 12):
+        sentence = " ".join(words[start:start + 12])
+        sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+    return " ".join(sentences)
+
+
+
+def generate_notes(
+        count: int,
+        *,
+        languages: list[str] = ("en", "es", "ru"),
+        vocabulary_size: int = 5000,
+        mean_length: int = 120,
+        max_length: int = 2000,
+        seed: int = 0,
+        source: str = "apple",
+        ):
+    """
+    Yield `count` notes with ids, titles, bodies and created/modified
+    strings. Each note is written in one of `languages`; body lengths in
+    words follow a log-normal distribution around `mean_length`, capped at
+    `max_length`, and words follow a Zipf distribution.
+    """
+    rng = random.Random(seed)
+    vocabularies = {lang: make_vocabulary(lang, vocabulary_size, rng) for lang in languages}
+    cum_weights = []
+    total = 0.0
+    for rank in range(vocabulary_size):
+        total += 1 / (rank + 1)
+        cum_weights.append(total)
+
+    for i in range(count):
+        lang = languages[i % len(languages)]
+        vocabulary = vocabularies[lang]
+        length = min(max_length, max(1, int(rng.lognormvariate(0, 0.8) * mean_length)))
+        created = START_DATE + timedelta(minutes=rng.randint(0, 60 * 24 * 365 * 5))
+        modified = created + timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+
+        yield {
+            "id": f"{source}-{lang}-{i}",
+            "source": source,
+            "title": make_text(vocabulary, cum_weights, STOP_WORDS[lang], rng.randint(2, 6), rng).rstrip("."),
+            "body": make_text(vocabulary, cum_weights, STOP_WORDS[lang], length, rng),
+            "created": created.strftime(DATE_FORMAT),
+            "modified": modified.strftime(DATE_FORMAT),
+        }
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", type=int, default=1000)
+    parser.add_argument("--languages", default="en,es,ru")
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--mean-length", type=int, default=120)
+    parser.add_argument("--max-length", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for note in generate_notes(
+        args.notes,
+        languages=args.languages.split(","),
+        vocabulary_size=args.vocabulary,
+        mean_length=args.mean_length,
+        max_length=args.max_length,
+        seed=args.seed,
+    ):
+        sys.stdout.write(json.dumps(note, ensure_ascii=False) + "\n")
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Benchmark the index, persistence and search paths on a synthetic corpus.
+
+    python benchmarks/run.py --notes 2000 --output results.json
+    python benchmarks/run.py --notes 2000 --compare results.json
+
+Times process_notes, build_index, pickle and segment save/load, and cold
+(fresh interpreter) and warm (repeated in-process) search_notes. Results
+are written as JSON so runs can be compared.
+"""
+import argparse
+from datetime import datetime, timezone
+from importlib import metadata
+import json
+import os
+from pathlib import Path
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from corpus import WORDS, generate_notes
+
+from mnemo_cli.enums import Language, Source
+from mnemo_cli.indexer import build_index
+from mnemo_cli.pipeline import process_notes, search_notes
+from mnemo_cli.segment import SEGMENT_FILE, Segment, write_segment
+from mnemo_cli.utils.config import save_config
+from mnemo_cli.utils.storage import load_pickle, save_pickle
+
+
+COLD_SEARCH = """
+import sys, time
+started = time.perf_counter()
+from mnemo_cli.pipeline import search_notes
+search_notes(sys.argv[1], limit=10)
+print(time.perf_counter() - started)
+"""
+
+
+
+def measure(fn, repeat: int = 1):
+    runs = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - started)
+
+    return {
+        "seconds": statistics.median(runs),
+        "min": min(runs),
+        "runs": len(runs),
+    }, result
+
+
+
+def make_queries(languages: list[str]) -> list[str]:
+    queries = []
+    for lang in languages:
+        common, other = WORDS[lang][0], WORDS[lang][3]
+        queries.append(common)
+        queries.append(f"{common} {other}")
+    queries.append(f'"{WORDS[languages[0]][0]} {WORDS[languages[0]][1]}"')
+    return queries
+
+
+
+def git_revision() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+
+
+def run(args) -> dict:
+    languages = args.languages.split(",")
+    language_set = {Language(lang) for lang in languages}
+    results = {}
+
+    notes = list(generate_notes(
+        args.notes,
+        languages=languages,
+        vocabulary_size=args.vocabulary,
+        mean_length=args.mean_length,
+        max_length=args.max_length,
+        seed=args.seed,
+    ))
+
+    results["process_notes"], processed = measure(
+        lambda: process_notes(notes, language_set)
+    )
+    results["build_index"], index = measure(
+        lambda: build_index(processed), args.repeat
+    )
+
+    with tempfile.TemporaryDirectory() as project:
+        project_root = Path(project)
+        data_dir = project_root / ".mnemo" / "data"
+        data_dir.mkdir(parents=True)
+
+        pickle_path = data_dir / "bench.pkl"
+        results["save_pickle"], _ = measure(
+            lambda: save_pickle({"notes": processed, "index": index}, pickle_path),
+            args.repeat,
+        )
+        results["load_pickle"], _ = measure(lambda: load_pickle(pickle_path), args.repeat)
+        results["pickle_bytes"] = pickle_path.stat().st_size
+        pickle_path.unlink()
+
+        segment_path = data_dir / SEGMENT_FILE
+        results["write_segment"], _ = measure(
+            lambda: write_segment(segment_path, index, processed), args.repeat
+        )
+        results["segment_bytes"] = segment_path.stat().st_size
+
+        def open_segment():
+            with Segment(segment_path) as segment:
+                return len(segment)
+
+        results["open_segment"], _ = measure(open_segment, args.repeat)
+
+        save_config(project_root, sources={Source.APPLE}, languages=language_set)
+
+        cwd = os.getcwd()
+        os.chdir(project_root)
+        try:
+            for query in make_queries(languages):
+                cold = []
+                for _ in range(args.repeat):
+                    output = subprocess.run(
+                        [sys.executable, "-c", COLD_SEARCH, query],
+                        capture_output=True,
+                        text=True,
+                        check=True,
+                    ).stdout
+                    cold.append(float(output))
+                results[f"search_cold[{query}]"] = {
+                    "seconds": statistics.median(cold),
+                    "min": min(cold),
+                    "runs": len(cold),
+                }
+
+                search_notes(query, limit=10)
+                results[f"search_warm[{query}]"], _ = measure(
+                    lambda: search_notes(query, limit=10), args.repeat * 5
+                )
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "version": metadata.version("mnemo-cli"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": vars(args) | {"output": None, "compare": None},
+        },
+        "results": results,
+    }
+
+
+
+def print_report(report: dict, baseline: dict | None = None) -> None:
+    base = baseline["results"] if baseline else {}
+    print(f"{'benchmark':<40} {'value':>12} {'baseline':>12} {'ratio':>7}")
+    for name, value in report["results"].items():
+        old = base.get(name)
+        if isinstance(value, dict):
+            value = value["seconds"] * 1000
+            old = old["seconds"] * 1000 if old else None
+            unit, spec = "ms", ">9.1f"
+        else:
+            unit, spec = "B", ">9d"
+
+        line = f"{name:<40} {value:{spec}} {unit:<2}"
+        if old:
+            line += f" {old:{spec}} {unit:<2} {value / old:>6.2f}x"
+        print(line)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--languages", default="en,es,ru")
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--mean-length", type=int, default=120)
+    parser.add_argument("--max-length", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+    print_report(report, baseline)
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+
+
+if __name__ == "__main__":
+    main()
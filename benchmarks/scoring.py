@@ -0,0 +1,101 @@
+"""
+Compare the pure Python and NumPy scoring paths of search_index.
+
+    python benchmarks/scoring.py --notes 20000 --limit 10
+
+Notes are random token lists drawn from a Zipf-like vocabulary, so common
+tokens match most of the corpus and rare ones only a few notes.
+"""
+import argparse
+import random
+import time
+
+from mnemo_cli import indexer
+from mnemo_cli.enums import Language, Scorer
+
+
+QUERIES = [
+    "w0",
+    "w0 w1",
+    "w1 w5 w20",
+    "w2 w40 w300",
+    "w3 w7 w11 w13 w17",
+]
+
+
+
+def make_notes(count: int, vocabulary: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocabulary)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+
+    notes = []
+    for i in range(count):
+        length = rng.randint(20, 400)
+        tokens = rng.choices(words, weights=weights, k=length)
+        notes.append({
+            "id": f"note-{i}",
+            "tokens": [(token, pos) for pos, token in enumerate(tokens)],
+        })
+
+    return notes
+
+
+
+def time_search(index, notes, query: str, limit: int, scorer: Scorer, vectorized: bool, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        results, total, _ = indexer.search_index(
+            query=query,
+            index=index,
+            notes=notes,
+            languages={Language.EN},
+            limit=limit,
+            scorer=scorer,
+            vectorized=vectorized,
+        )
+        best = min(best, time.perf_counter() - started)
+
+    return best, results, total
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--vocabulary", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    notes = make_notes(args.notes, args.vocabulary, args.seed)
+    index = indexer.build_index(notes)
+    notes_by_id = {note["id"]: note for note in notes}
+
+    # Query tokens are already "stems"
+    indexer.prepare_for_search = lambda query, languages: query.split()
+
+    print(f"{'scorer':<7} {'query':<20} {'matches':>8} {'python ms':>10} {'numpy ms':>10} {'speedup':>8}")
+    for scorer in Scorer:
+        for query in QUERIES:
+            python_time, expected, total = time_search(
+                index, notes_by_id, query, args.limit, scorer, False, args.repeat
+            )
+            numpy_time, results, _ = time_search(
+                index, notes_by_id, query, args.limit, scorer, True, args.repeat
+            )
+            if [r["note"]["id"] for r in results] != [r["note"]["id"] for r in expected]:
+                raise SystemExit(f"Result order differs for {scorer.value} {query!r}")
+
+            print(
+                f"{scorer.value:<7} {query:<20} {total:>8} "
+                f"{python_time * 1000:>10.1f} {numpy_time * 1000:>10.1f} "
+                f"{python_time / numpy_time:>7.1f}x"
+            )
+
+
+
+if __name__ == "__main__":
+    main()
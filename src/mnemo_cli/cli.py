@@ -1,18 +1,32 @@
-import re
-import subprocess
+from contextlib import nullcontext
+import json
+import statistics
+import sys
+import time
 import typer
-import questionary
 from typing import List
 
 from rich import print
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.markup import escape
 
 from pathlib import Path
 
-from mnemo_cli.enums import Language, Source
-from mnemo_cli.pipeline import get_last_search, get_notes, get_stats, init_mnemo, rebuild_index, search_notes
+from mnemo_cli import daemon, watcher
+from mnemo_cli.enums import Backend, Language, Scorer, Source
+from mnemo_cli.pipeline import (
+    get_last_search,
+    get_notes,
+    get_stats,
+    init_mnemo,
+    rebuild_index,
+    search_batch,
+    search_notes,
+)
 from mnemo_cli.utils.note_url import build_note_url
+from mnemo_cli.utils.snippet import build_snippet
 from mnemo_cli.utils.storage import find_project_root
+from mnemo_cli.utils.text import WHITESPACE_RE
+from mnemo_cli.utils.timing import TIMINGS
 
 
 app = typer.Typer(no_args_is_help=True)
@@ -23,11 +37,46 @@ SOURCE_STYLES = {
 }
 
 @app.callback()
-def root():
+def root(
+    ctx: typer.Context,
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        help="Print where the command spent its time (bypasses the daemon)"
+    ),
+    profile_output: Path = typer.Option(
+        None,
+        "--profile-output",
+        help="Write cProfile stats of the command to this file"
+    ),
+    ):
     """
     mnemo - work with notes index
     """
-    pass
+    if not profile and profile_output is None:
+        return
+
+    TIMINGS.profiling = True
+    TIMINGS.reset()
+    started = time.perf_counter()
+    profiler = None
+    if profile_output is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    def report():
+        total = time.perf_counter() - started
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_output)
+            print(f"cProfile stats written to {profile_output}")
+        if profile:
+            print("")
+            print_timings(TIMINGS.snapshot(), total)
+
+    ctx.call_on_close(report)
 
 
 
@@ -40,10 +89,20 @@ def ensure_initialized():
         raise typer.Exit(code=1)
 
 
-def make_progress_handler(progress: Progress):
+def make_progress():
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+
+    return Progress(
+        SpinnerColumn(),
+        TextColumn("{task.description}"),
+        transient=True,
+    )
+
+
+def make_progress_handler(progress):
     spinner_tasks = {}
 
-    def on_progress(event: str):
+    def on_progress(event: str, **info):
         if event == "export:start":
             spinner_tasks["export"] = progress.add_task(
                 "Exporting notes...", total=None
@@ -53,11 +112,29 @@ def make_progress_handler(progress: Progress):
             progress.remove_task(spinner_tasks["export"])
             print(":sparkles: [green]Exporting notes done[/green]")
 
+        elif event == "export:source":
+            if info["error"]:
+                print(
+                    f"[red]Exporting {info['source']} failed after "
+                    f"{info['seconds']:.1f}s: {info['error']}[/red]"
+                )
+            else:
+                print(
+                    f"Exported {info['notes']} notes from {info['source']} "
+                    f"in {info['seconds']:.1f}s"
+                )
+
         elif event == "process:start":
             spinner_tasks["process"] = progress.add_task(
                 "Processing notes...", total=None
             )
 
+        elif event == "process:chunk":
+            progress.update(
+                spinner_tasks["process"],
+                description=f"Processing notes... ({info['notes']} done)"
+            )
+
         elif event == "process:done":
             progress.remove_task(spinner_tasks["process"])
             print(":sparkles: [green]Processing notes done[/green]")
@@ -71,6 +148,12 @@ def make_progress_handler(progress: Progress):
             progress.remove_task(spinner_tasks["index"])
             print(":sparkles: [green]Indexing notes done[/green]")
 
+        elif event == "delta:done":
+            print(
+                f"Added {info['added']}, updated {info['updated']}, "
+                f"deleted {info['deleted']} notes"
+            )
+
     return on_progress
 
 
@@ -81,32 +164,106 @@ def print_stats(stats):
     print(f"Note sources    {stats['sources']}")
     print(f"Note languages  {stats['languages']}")
     print(f"Unique tokens   {stats['unique_tokens']}")
+    if stats.get("backend"):
+        print(f"Index backend   {stats['backend']}")
+    if stats.get("last_rebuild"):
+        print(f"Last rebuild    {stats['last_rebuild']['total']:.2f}s")
     print(f"Project path    {stats['project_root']}")
 
 
-def make_snippet(text, query, window=40):
-    idx = text.lower().find(query.lower())
-    if idx == -1:
+def print_timings(spans: dict, total: float):
+    print("[bold underline green]Timings[/bold underline green]\n")
+    accounted = 0.0
+    for name, span in sorted(spans.items(), key=lambda item: -item[1]["seconds"]):
+        accounted += span["seconds"]
+        share = span["seconds"] / total * 100 if total else 0
+        print(
+            f"{name:<18} {span['seconds'] * 1000:>9.1f} ms {share:>5.1f}%  "
+            f"({span['calls']} calls)"
+        )
+    print(f"{'other':<18} {max(total - accounted, 0) * 1000:>9.1f} ms")
+    print(f"{'total':<18} {total * 1000:>9.1f} ms")
+
+
+def print_stem_cache(stats: dict):
+    calls = stats["hits"] + stats["misses"]
+    rate = stats["hits"] / calls * 100 if calls else 0
+    print(
+        f"{'stem cache':<18} {stats['hits']} hits, {stats['misses']} misses "
+        f"({rate:.1f}%), {stats['size']} stems"
+    )
+
+
+def make_snippet(note, positions):
+    segments = build_snippet(note, positions)
+    if segments is None:
         return None
 
-    start = max(0, idx - window)
-    end = min(len(text), idx + len(query) + window)
+    parts = []
+    for text, matched in segments:
+        text = escape(WHITESPACE_RE.sub(" ", text))
+        parts.append(f"[bold yellow]{text}[/bold yellow]" if matched else text)
+
+    return "".join(parts)
 
-    snippet = text[start:end]
-    highlighted = re.sub(
-        re.escape(query),
-        r"[bold yellow]\g<0>[/bold yellow]",
-        snippet,
-        flags=re.IGNORECASE
+
+def format_score(score):
+    if not isinstance(score, tuple):
+        score = (score,)
+    return ", ".join(
+        f"{part:.3f}" if isinstance(part, float) else str(part)
+        for part in score
     )
 
-    return f"...{highlighted}..."
+
+def run_batch(path: str, **options):
+    """Stream JSON Lines results to stdout, latency and throughput to stderr."""
+    latencies = []
+    started = time.perf_counter()
+    with nullcontext(sys.stdin) if path == "-" else Path(path).open(encoding="utf-8") as lines:
+        queries = (line.strip() for line in lines if line.strip())
+        for result in search_batch(queries, **options):
+            latencies.append(result["seconds"])
+            typer.echo(json.dumps(result, ensure_ascii=False))
+    total = time.perf_counter() - started
+
+    if not latencies:
+        typer.echo("No queries", err=True)
+        return
+
+    latencies.sort()
+    p95 = latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)]
+    typer.echo(
+        f"{len(latencies)} queries in {total:.2f}s ({len(latencies) / total:.1f} queries/s), "
+        f"latency p50 {statistics.median(latencies) * 1000:.1f} ms, "
+        f"p95 {p95 * 1000:.1f} ms, max {latencies[-1] * 1000:.1f} ms",
+        err=True,
+    )
+
+
+JOBS_OPTION = typer.Option(
+    1, "--jobs", "-j", min=0, help="Worker processes for note processing (0 = one per CPU)"
+)
+BATCH_SIZE_OPTION = typer.Option(
+    1000, "--batch-size", min=1, help="Notes held in memory at a time while indexing"
+)
+
 
 @app.command()
-def init():
+def init(
+    jobs: int = JOBS_OPTION,
+    batch_size: int = BATCH_SIZE_OPTION,
+    backend: Backend = typer.Option(
+        Backend.SEGMENT,
+        "--backend",
+        help="Index storage: segment file, or sqlite for a SQLite FTS5 database"
+    ),
+    ):
     """
     Initialize project
     """
+    import questionary
+
     project_root = Path.cwd()
     mnemo_dir = project_root / ".mnemo"
 
@@ -125,14 +282,10 @@ def init():
         typer.echo("Cancelled.")
         raise typer.Exit(code=0)
     if action == "rebuild":
-        with Progress(
-            SpinnerColumn(),
-            TextColumn("{task.description}"),
-            transient=True,
-        ) as progress:
+        with make_progress() as progress:
 
             on_progress = make_progress_handler(progress)
-            rebuild_index(progress=on_progress)
+            rebuild_index(progress=on_progress, jobs=jobs, batch_size=batch_size)
             print(":sparkles: [green]Mnemo index successfully built[/green]")
             stats = get_stats()
             print_stats(stats)
@@ -182,14 +335,17 @@ def init():
     selected_sources = {Source(code) for code in note_sources}
     selected_languages = {Language(code) for code in note_languages}
 
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("{task.description}"),
-        transient=True,
-    ) as progress:
+    with make_progress() as progress:
 
         on_progress = make_progress_handler(progress)
-        init_mnemo(selected_sources, selected_languages, progress=on_progress)
+        init_mnemo(
+            selected_sources,
+            selected_languages,
+            backend=backend,
+            progress=on_progress,
+            jobs=jobs,
+            batch_size=batch_size,
+        )
 
     print(":sparkles: [green]Mnemo index successfully built[/green]")
     stats = get_stats()
@@ -199,19 +355,28 @@ def init():
 
 
 @app.command()
-def rebuild():
+def rebuild(
+    incremental: bool = typer.Option(
+        False,
+        "--incremental/--full",
+        help="Re-process only added, changed and deleted notes"
+    ),
+    jobs: int = JOBS_OPTION,
+    batch_size: int = BATCH_SIZE_OPTION,
+    ):
     """
     Rebuild search index using existing mnemo configuration.
     """
     ensure_initialized()
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("{task.description}"),
-        transient=True,
-    ) as progress:
+    with make_progress() as progress:
 
         on_progress = make_progress_handler(progress)
-        rebuild_index(progress=on_progress)
+        rebuild_index(
+            progress=on_progress,
+            incremental=incremental,
+            jobs=jobs,
+            batch_size=batch_size,
+        )
         print(":sparkles: [green]Mnemo revert index successfully built[/green]")
         stats = get_stats()
         print("")
@@ -219,9 +384,56 @@ def rebuild():
 
 
 
+@app.command()
+def watch(
+    interval: float = typer.Option(
+        watcher.POLL_INTERVAL, "--interval", help="Seconds between checks for changes"
+    ),
+    debounce: float = typer.Option(
+        watcher.DEBOUNCE, "--debounce", help="Seconds a source must stay unchanged before updating"
+    ),
+    apple_interval: float = typer.Option(
+        watcher.APPLE_INTERVAL, "--apple-interval", help="Seconds between Apple Notes exports"
+    ),
+    ):
+    """
+    Keep the index fresh: watch sources and apply their changes incrementally.
+    """
+    ensure_initialized()
+    delta = {}
+
+    def on_progress(event: str, **info):
+        if event == "delta:done":
+            delta.update(info)
+        elif event == "watch:update":
+            print(
+                f"{time.strftime('%H:%M:%S')} Updated {', '.join(info['sources'])}: "
+                f"{delta.get('added', 0)} added, {delta.get('updated', 0)} updated, "
+                f"{delta.get('deleted', 0)} deleted in {info['seconds']:.2f}s"
+            )
+            delta.clear()
+        elif event == "watch:error":
+            print(
+                f"{time.strftime('%H:%M:%S')} [red]Updating {info['source']} failed:[/red] "
+                f"{escape(info['error'])}"
+            )
+
+    print(f"Watching for changes every {interval:g}s, press Ctrl+C to stop")
+    try:
+        watcher.watch(
+            interval=interval,
+            debounce=debounce,
+            apple_interval=apple_interval,
+            progress=on_progress,
+        )
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+
 @app.command()
 def search(
-    query: List[str],
+    query: List[str] = typer.Argument(None),
     limit: int = typer.Option(
         5, "--limit", "-l", help="Maximum number of search results to show"
     ),
@@ -234,21 +446,79 @@ def search(
         False,
         "--snippet/--no-snippet",
         help="Show snippet with search query in note text"
-    )
+    ),
+    scorer: Scorer = typer.Option(
+        Scorer.BM25,
+        "--scorer",
+        help="Ranking: bm25, or tuple for (coverage, frequency, phrase bonus)"
+    ),
+    use_numpy: bool = typer.Option(
+        False,
+        "--numpy/--no-numpy",
+        help="Score candidates with NumPy (requires numpy)"
+    ),
+    fuzzy: bool = typer.Option(
+        False,
+        "--fuzzy/--no-fuzzy",
+        help="Correct query words that are not in the index (1-2 typos)"
+    ),
+    batch: str = typer.Option(
+        None,
+        "--batch",
+        help="Search each line of FILE (- for stdin) and print results as JSON Lines"
+    ),
+    jobs: int = typer.Option(
+        1, "--jobs", "-j", min=0, help="Worker processes for --batch (0 = one per CPU)"
+    ),
     ):
     """Search notes by query."""
     ensure_initialized()
+    if use_numpy:
+        from mnemo_cli import vectorized
+        if not vectorized.available():
+            print("[red]NumPy is not installed[/red]")
+            print("Install it with [bold]pip install mnemo-cli\\[numpy][/bold]")
+            raise typer.Exit(code=1)
+
+    if batch is not None:
+        if query:
+            print("[red]Pass queries either as arguments or with --batch, not both[/red]")
+            raise typer.Exit(code=1)
+        run_batch(
+            batch,
+            jobs=jobs,
+            limit=limit,
+            scorer=scorer.value,
+            vectorized=use_numpy,
+            fuzzy=fuzzy,
+        )
+        return
+    if not query:
+        print("[red]Missing query[/red]")
+        raise typer.Exit(code=1)
+
     query_text = " ".join(query)
-    results = search_notes(query_text)
+    results, total, corrections = daemon.call(
+        "search",
+        search_notes,
+        query=query_text,
+        limit=limit,
+        scorer=scorer.value,
+        vectorized=use_numpy,
+        fuzzy=fuzzy,
+    )
 
-    print(f"Found {len(results)} notes (show top {limit})")
-    for i, result in enumerate(results[:limit], 1):
+    if corrections:
+        corrected = ", ".join(f"{word} -> {term}" for word, term in corrections.items())
+        print(f"[dim]Corrected: {corrected}[/dim]")
+    print(f"Found {total} notes (show top {limit})")
+    for i, result in enumerate(results, 1):
         note = result["note"]
-        score = result["score"]
+        score = format_score(result["score"])
         source = note["source"]
         snippet = None
         if show_snippet:
-            snippet = make_snippet(note["body"], query_text)
+            snippet = make_snippet(note, result.get("positions", []))
         style = SOURCE_STYLES.get(source, "white")
 
         if show_score:
@@ -267,12 +537,13 @@ def open(index: int):
     Open note from the last search
     """
     ensure_initialized()
-    results = get_last_search()
+    results = daemon.call("last_search", get_last_search)
     if index < 1 or index > len(results):
         print("Invalid index.")
         raise typer.Exit(code=1)
 
-    note = results[index - 1]["note"]
+    note_id, source, _ = results[index - 1]
+    note = {"id": note_id, "source": source}
 
     if note["source"] == "apple":
         note_id = note["id"]
@@ -282,6 +553,8 @@ def open(index: int):
             show note id "{note_id}"
         end tell
         '''
+        import subprocess
+
         subprocess.run(
             ["osascript", "-e", script],
             check=False
@@ -307,8 +580,64 @@ def list():
         print(t)
 
 @app.command()
-def stats():
+def stats(
+    perf: bool = typer.Option(
+        False,
+        "--perf",
+        help="Show where the last rebuild spent its time"
+    )
+    ):
     """Print notes index stats."""
     ensure_initialized()
-    stats = get_stats()
+    stats = daemon.call("stats", get_stats)
     print_stats(stats)
+
+    if perf:
+        print("")
+        if stats.get("last_rebuild"):
+            print_timings(stats["last_rebuild"]["spans"], stats["last_rebuild"]["total"])
+            if "stem_cache" in stats["last_rebuild"]:
+                print_stem_cache(stats["last_rebuild"]["stem_cache"])
+        else:
+            print("No rebuild timings yet. Run [bold]mnemo rebuild[/bold] first.")
+
+
+
+@app.command()
+def serve(
+    background: bool = typer.Option(
+        False,
+        "--background/--foreground",
+        help="Detach the daemon from the terminal"
+    ),
+    stop: bool = typer.Option(
+        False,
+        "--stop",
+        help="Stop a running daemon"
+    )
+    ):
+    """
+    Keep the index loaded in a daemon that search, open and stats use when it is running.
+    """
+    ensure_initialized()
+    project_root = find_project_root()
+
+    if stop:
+        if not daemon.is_running(project_root):
+            print("mnemo daemon is not running")
+            raise typer.Exit(code=1)
+        daemon.request(project_root, "shutdown")
+        print("mnemo daemon stopped")
+        return
+
+    if daemon.is_running(project_root):
+        print("mnemo daemon is already running")
+        raise typer.Exit(code=1)
+
+    if background:
+        daemon.start_background(project_root)
+        print(f"mnemo daemon started on {daemon.socket_path(project_root)}")
+        return
+
+    print(f"mnemo daemon listening on {daemon.socket_path(project_root)}")
+    daemon.serve(project_root)
@@ -0,0 +1,233 @@
+import json
+import os
+import pickle
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from mnemo_cli.enums import Scorer
+from mnemo_cli.indexer import search_index
+from mnemo_cli.pipeline import build_stats, index_path, open_index
+from mnemo_cli.utils.config import load_config
+from mnemo_cli.utils.storage import (
+    LAST_SEARCH_FILE,
+    find_project_root,
+    load_last_search,
+    save_last_search,
+)
+from mnemo_cli.utils.timing import TIMINGS
+
+
+SOCKET_FILE = "mnemo.sock"
+CLIENT_TIMEOUT = 30
+
+
+
+def socket_path(project_root: Path) -> Path:
+    return project_root / ".mnemo" / SOCKET_FILE
+
+
+def request(project_root: Path, command: str, **params):
+    """
+    Send a command to the daemon of the project and return its result.
+    Raises OSError when no daemon is listening.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(CLIENT_TIMEOUT)
+        client.connect(str(socket_path(project_root)))
+        payload = json.dumps({"command": command, "params": params})
+        client.sendall(payload.encode("utf-8") + b"\n")
+        client.shutdown(socket.SHUT_WR)
+
+        chunks = []
+        while chunk := client.recv(65536):
+            chunks.append(chunk)
+
+    response = pickle.loads(b"".join(chunks))
+    if not response["ok"]:
+        raise RuntimeError(f"mnemo daemon error: {response['error']}")
+
+    return response["result"]
+
+
+def call(command: str, fallback, **params):
+    """
+    Run a command on the daemon if one is running for the current project,
+    otherwise call `fallback(**params)` directly. Profiled commands always
+    run in-process so their timings are recorded.
+    """
+    project_root = find_project_root()
+    if not TIMINGS.profiling and socket_path(project_root).exists():
+        try:
+            return request(project_root, command, **params)
+        except OSError:
+            pass
+
+    return fallback(**params)
+
+
+def is_running(project_root: Path) -> bool:
+    try:
+        request(project_root, "ping")
+    except OSError:
+        return False
+    return True
+
+
+def start_background(project_root: Path) -> None:
+    subprocess.Popen(
+        [sys.executable, "-m", "mnemo_cli.daemon", str(project_root)],
+        cwd=project_root,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+
+class IndexState:
+    """
+    Config and the open index of a project. The index is reopened when a
+    rebuild publishes a new index generation.
+    """
+
+    def __init__(self, project_root: Path):
+        self.project_root = project_root
+        self.data_dir = project_root / ".mnemo" / "data"
+        self.index = None
+        self.config = None
+        self._version = None
+
+    def refresh(self) -> None:
+        if self.config is None:
+            self.config = load_config(self.project_root)
+        stat = index_path(self.data_dir, self.config["backend"]).stat()
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version == self._version:
+            return
+
+        if self.index is not None:
+            self.index.close()
+        self.config = load_config(self.project_root)
+        self.index = open_index(self.data_dir, self.config["backend"])
+        self._version = version
+
+    def close(self) -> None:
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def search(
+            self,
+            query: str,
+            limit: int | None = None,
+            scorer: str = Scorer.BM25.value,
+            vectorized: bool = False,
+            fuzzy: bool = False,
+            ):
+        self.refresh()
+        results, total, corrections = search_index(
+            query=query,
+            index=self.index,
+            notes=self.index.notes,
+            languages=self.config["languages"],
+            limit=limit,
+            scorer=scorer,
+            vectorized=vectorized,
+            fuzzy=fuzzy,
+        )
+        save_last_search(results, self.data_dir / LAST_SEARCH_FILE)
+
+        return results, total, corrections
+
+    def get_last_search(self) -> list[tuple]:
+        return load_last_search(self.data_dir / LAST_SEARCH_FILE)
+
+    def get_stats(self) -> dict:
+        self.refresh()
+        return build_stats(self.project_root, self.config, self.index)
+
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        state = self.server.state
+        try:
+            message = json.loads(self.rfile.readline())
+            command = message["command"]
+            params = message.get("params", {})
+
+            if command == "ping":
+                result = "pong"
+            elif command == "search":
+                result = state.search(**params)
+            elif command == "last_search":
+                result = state.get_last_search()
+            elif command == "stats":
+                result = state.get_stats()
+            elif command == "shutdown":
+                result = None
+                threading.Thread(target=self.server.shutdown).start()
+            else:
+                raise ValueError(f"Unknown command: {command}")
+
+            response = {"ok": True, "result": result}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+
+        self.wfile.write(pickle.dumps(response, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    def __init__(self, project_root: Path):
+        self.state = IndexState(project_root)
+        super().__init__(str(socket_path(project_root)), RequestHandler)
+
+    def server_bind(self):
+        # Only the owner may talk to the daemon
+        old_umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+
+
+
+def serve(project_root: Path) -> None:
+    """
+    Hold the project index in memory and answer commands on a Unix socket
+    until interrupted or sent `shutdown`.
+    """
+    path = socket_path(project_root)
+    if path.exists():
+        if is_running(project_root):
+            raise RuntimeError("mnemo daemon is already running")
+        path.unlink()
+
+    server = DaemonServer(project_root)
+
+    def on_terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, on_terminate)
+
+    try:
+        server.state.refresh()
+        server.serve_forever(poll_interval=0.2)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.state.close()
+        path.unlink(missing_ok=True)
+
+
+
+if __name__ == "__main__":
+    serve(Path(sys.argv[1]))
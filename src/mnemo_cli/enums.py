@@ -25,3 +25,19 @@ class Source(Enum):
     @classmethod
     def values(cls) -> list[str]:
         return [s.value for s in cls]
+
+class Backend(Enum):
+    SEGMENT = "segment"
+    SQLITE = "sqlite"
+
+    @classmethod
+    def values(cls) -> list[str]:
+        return [b.value for b in cls]
+
+class Scorer(Enum):
+    BM25 = "bm25"
+    TUPLE = "tuple"
+
+    @classmethod
+    def values(cls) -> list[str]:
+        return [s.value for s in cls]
@@ -0,0 +1,92 @@
+# Typo tolerant term lookup. Every indexed term is split into character
+# trigrams, padded with a character that never occurs in a term, and a
+# trigram index maps each trigram to the numbers of the terms (in sorted
+# term order) containing it. One edit changes at most three trigrams, so a
+# term within k edits of a query token shares all but 3k of its trigrams:
+# only terms sharing enough trigrams are compared with the token.
+
+PAD = "$"
+
+
+
+def max_edits(token: str) -> int:
+    """Allowed edit distance: none for 1-2 characters, 1 up to 5, else 2."""
+    if len(token) < 3:
+        return 0
+    return 1 if len(token) <= 5 else 2
+
+
+
+def trigrams(term: str) -> set[str]:
+    padded = f"{PAD}{PAD}{term}{PAD}{PAD}"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+
+def build_gram_index(terms: list[str]) -> dict[str, list[int]]:
+    """Sorted term numbers per trigram of the sorted `terms`."""
+    grams = {}
+    for number, term in enumerate(terms):
+        for gram in trigrams(term):
+            if gram not in grams:
+                grams[gram] = []
+            grams[gram].append(number)
+
+    return grams
+
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance of a and b, or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+
+    return min(previous[-1], limit + 1)
+
+
+
+def correct_term(index, token: str) -> str | None:
+    """
+    Closest indexed term within max_edits(token) of a token that is not
+    indexed, preferring terms in more documents. `index` provides
+    gram_terms, term_at and doc_frequency (CompactIndex or Segment).
+    """
+    limit = max_edits(token)
+    if limit == 0:
+        return None
+
+    grams = trigrams(token)
+    shared = {}
+    for gram in grams:
+        for number in index.gram_terms(gram):
+            shared[number] = shared.get(number, 0) + 1
+
+    required = max(1, len(grams) - 3 * limit)
+    best = None
+    for number, count in shared.items():
+        if count < required:
+            continue
+
+        term = index.term_at(number)
+        distance = edit_distance(token, term, limit)
+        if distance > limit:
+            continue
+
+        key = (distance, -index.doc_frequency(term), term)
+        if best is None or key < best:
+            best = key
+
+    return best[2] if best else None
@@ -1,122 +1,441 @@
-from mnemo_cli.utils.text import prepare_for_search
+import heapq
+import math
+import re
 
+from mnemo_cli.enums import Language, Scorer
+from mnemo_cli.fuzzy import correct_term
+from mnemo_cli.postings import CompactIndex, IndexBuilder
+from mnemo_cli.utils.text import (
+    prepare_for_search,
+    prepare_phrase,
+    search_token_words,
+    split_phrases,
+    split_wildcards,
+    stem_wildcard,
+)
+from mnemo_cli.utils.timing import span
 
-def build_index(notes):
-    index = {}
 
+def build_index(notes) -> CompactIndex:
+    builder = IndexBuilder()
     for note in notes:
-        note_id = note["id"]
-        tokens = note["tokens"]
+        builder.add(note["id"], note["tokens"])
 
-        for (token, pos) in tokens:
-            if token not in index:
-                index[token] = {}
-            if note_id not in index[token]:
-                index[token][note_id] = []
-                index[token][note_id].append(pos)
-            else:
-                index[token][note_id].append(pos)
+    return builder.finish()
 
-    return index
 
 
+def add_to_index(index: CompactIndex, notes) -> None:
+    index.add_documents((note["id"], note["tokens"]) for note in notes)
 
-def search_index(*, query: str, index, notes, languages):
-    if query == "":
+
+
+def remove_from_index(index: CompactIndex, note_ids) -> None:
+    index.remove_documents(note_ids)
+
+
+
+def shift_intersect(starts: list[int], positions: list[int], offset: int) -> list[int]:
+    """
+    Keep the starts s for which s + offset is in positions. Both lists are
+    sorted, so a single linear merge is enough.
+    """
+    matched = []
+    j = 0
+    n = len(positions)
+
+    for start in starts:
+        target = start + offset
+        while j < n and positions[j] < target:
+            j += 1
+        if j == n:
+            break
+        if positions[j] == target:
+            matched.append(start)
+
+    return matched
+
+
+
+def find_phrase_runs(phrase: list[tuple[int, list[str]]], positions_by_token: dict) -> list[int]:
+    """Start positions where every phrase word occurs at its offset."""
+    starts = None
+    for offset, stems in phrase:
+        lists = [positions_by_token[stem] for stem in stems if stem in positions_by_token]
+        if not lists:
+            return []
+        positions = lists[0] if len(lists) == 1 else sorted(set().union(*lists))
+
+        if starts is None:
+            starts = [p - offset for p in positions]
+        else:
+            starts = shift_intersect(starts, positions, offset)
+        if not starts:
+            return []
+
+    return starts or []
+
+
+
+def find_phrase_matches(query_tokens: list[str], positions_by_token: dict) -> list[dict]:
+    phrase_matches = []
+
+    for i in range(0, len(query_tokens) - 1):
+        pair = (query_tokens[i], query_tokens[i + 1])
+        runs = find_phrase_runs([(0, [pair[0]]), (1, [pair[1]])], positions_by_token)
+        for p in runs:
+            phrase_matches.append({
+                "tokens": pair,
+                "position": p
+            })
+
+    return phrase_matches
+
+
+
+def max_phrase_bonus(query_tokens: list[str], positions_by_token: dict) -> int:
+    """Upper bound of phrase matches: each pair matches at most min(tf) times."""
+    bound = 0
+    for i in range(0, len(query_tokens) - 1):
+        prev_positions = positions_by_token.get(query_tokens[i])
+        next_positions = positions_by_token.get(query_tokens[i + 1])
+        if prev_positions and next_positions:
+            bound += min(len(prev_positions), len(next_positions))
+
+    return bound
+
+
+
+MAX_EXPANSIONS = 50
+
+
+
+def expand_wildcard(
+        index,
+        pattern: str,
+        limit: int = MAX_EXPANSIONS,
+        languages: set[Language] = frozenset(),
+        ) -> list[str]:
+    """
+    Indexed terms matching `pattern`, where * stands for any characters.
+    Only terms sharing the literal prefix before the first * are read from
+    the sorted term dictionary, and at most `limit` of them are returned,
+    so short prefixes stay cheap. Patterns starting with * match nothing.
+    Indexed terms are stems, so a pattern matching none is retried with
+    its prefix stemmed in each of `languages`: notes* then finds note.
+    """
+    terms = match_wildcard(index, pattern, limit)
+    if terms:
+        return terms
+
+    stemmed = {
+        term
+        for variant in stem_wildcard(pattern, languages)
+        for term in match_wildcard(index, variant, limit)
+    }
+    return sorted(stemmed)[:limit]
+
+
+
+def match_wildcard(index, pattern: str, limit: int) -> list[str]:
+    parts = pattern.split("*")
+    prefix = parts[0]
+    if not prefix:
         return []
 
-    # Step 1. Prepare query
-    query_tokens = prepare_for_search(query, languages)
+    exact_prefix = parts[1:] == [""]
+    regex = re.compile(".*".join(map(re.escape, parts)))
+
+    terms = []
+    for term in index.iter_terms(prefix):
+        if exact_prefix or regex.fullmatch(term):
+            terms.append(term)
+            if len(terms) >= limit:
+                break
+
+    return terms
+
+
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+
+def tuple_scorer(index, tokens: list[str], expansions: dict | None = None):
+    """Score by (coverage, frequency, phrase bonus) of the query tokens."""
+    def score(doc: int, positions_by_token: dict, phrase_bonus: int) -> tuple:
+        coverage = len(positions_by_token)
+        frequency = sum(map(len, positions_by_token.values()))
+        return (coverage, frequency, phrase_bonus)
+
+    return score
+
+
+
+def bm25_idf(doc_count: int, df: int) -> float:
+    return math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+
+
+
+def bm25_norm(doc_length, avg_length: float):
+    """Length normalization, works on numbers and NumPy arrays alike."""
+    return BM25_K1 * (1 - BM25_B + BM25_B * doc_length / avg_length)
+
+
+
+def bm25_term_score(idf, tf, norm):
+    return idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+
+
+def average_length(index) -> float:
+    doc_count = index.doc_count
+    return index.total_length / doc_count if doc_count else 1.0
+
+
+
+def bm25_scorer(index, tokens: list[str], expansions: dict | None = None):
+    """
+    Score by (BM25, phrase bonus). Document frequencies and lengths come
+    from the index, so only the query tokens' IDF is computed per query.
+    A wildcard pattern counts as one token; its document frequency is the
+    sum over its `expansions`, capped at the number of documents.
+    """
+    expansions = expansions or {}
+    doc_count = index.doc_count
+    avg_length = average_length(index)
+    idf = {}
+    for token in tokens:
+        df = sum(index.doc_frequency(term) for term in expansions.get(token, (token,)))
+        idf[token] = bm25_idf(doc_count, min(df, doc_count))
+
+    def score(doc: int, positions_by_token: dict, phrase_bonus: int) -> tuple:
+        norm = bm25_norm(index.doc_length(doc), avg_length)
+        total = 0.0
+        for token, positions in positions_by_token.items():
+            total += bm25_term_score(idf[token], len(positions), norm)
+        return (total, phrase_bonus)
+
+    return score
+
+
+
+SCORERS = {
+    Scorer.BM25: bm25_scorer,
+    Scorer.TUPLE: tuple_scorer,
+}
+
+
+
+def select_top(candidates, query_tokens: list[str], score, limit: int | None, required_matches=None) -> list:
+    """
+    Select the best `limit` of (seq, doc, positions_by_token) candidates.
+    Returns (key, doc, phrase_matches, positions_by_token) sorted best first.
+
+    The phrase bonus is the last part of a score. Ties keep candidate order,
+    hence the negated sequence number in the key. Once `limit` results are
+    selected, a candidate whose best possible score can't beat the weakest
+    of them is skipped before phrase matching.
+    """
+    selected = []
+    for seq, doc, positions_by_token in candidates:
+        if limit is not None and len(selected) >= limit:
+            phrase_bound = max_phrase_bonus(query_tokens, positions_by_token)
+            if required_matches is not None:
+                phrase_bound += len(required_matches[doc])
+            bound = score(doc, positions_by_token, phrase_bound) + (-seq,)
+            if not selected or bound <= selected[0][0]:
+                continue
+
+        phrase_matches = find_phrase_matches(query_tokens, positions_by_token)
+        if required_matches is not None:
+            phrase_matches.extend(required_matches[doc])
+        key = score(doc, positions_by_token, len(phrase_matches)) + (-seq,)
+        entry = (key, doc, phrase_matches, positions_by_token)
+
+        if limit is None or len(selected) < limit:
+            heapq.heappush(selected, entry)
+        elif key > selected[0][0]:
+            heapq.heapreplace(selected, entry)
+
+    with span("search:sort"):
+        selected.sort(reverse=True)
+    return selected
+
+
+
+def search_index(
+        *,
+        query: str,
+        index,
+        notes,
+        languages,
+        limit: int | None = None,
+        scorer: Scorer | str = Scorer.BM25,
+        vectorized: bool = False,
+        fuzzy: bool = False,
+        ):
+    """
+    Search the index and return (results, total, corrections). Results
+    are sorted by `scorer` (see SCORERS) and cut to `limit`; notes are
+    only looked up for returned results. Words with * match indexed terms
+    by pattern (see expand_wildcard) and count as one query token. With
+    `fuzzy`, query tokens that are not indexed are replaced by the closest
+    indexed term (see mnemo_cli.fuzzy) and listed in `corrections`, word
+    -> term. `vectorized` scores candidates with NumPy, see
+    mnemo_cli.vectorized; queries with quoted phrases, wildcards or
+    corrections always use the pure Python path.
+    """
+    if query == "":
+        return [], 0, {}
+
+    # Step 1. Prepare query, quoted phrases must match as a whole
+    with span("search:prepare"):
+        query, phrase_texts = split_phrases(query)
+        query, patterns = split_wildcards(query)
+        query_tokens = prepare_for_search(query, languages) + patterns
+        phrases = [prepare_phrase(text, languages) for text in phrase_texts]
+        phrases = [phrase for phrase in phrases if phrase]
 
     if len(query_tokens) == 0:
-        return []
+        return [], 0, {}
+
+    lookup_tokens = list(query_tokens)
+    for phrase in phrases:
+        for _, stems in phrase:
+            lookup_tokens.extend(stem for stem in stems if stem not in lookup_tokens)
+
+    scorer = Scorer(scorer)
+
+    expansions = {}
+    if patterns:
+        with span("search:expand"):
+            expansions = {
+                pattern: expand_wildcard(index, pattern, languages=languages)
+                for pattern in patterns
+            }
+
+    corrections = {}
+    if fuzzy:
+        with span("search:fuzzy"):
+            # Shown by the word typed, once even if it has a stem per language
+            words = search_token_words(query, languages)
+            for qt in query_tokens:
+                if qt in expansions or qt in index:
+                    continue
+                term = correct_term(index, qt)
+                if term is not None:
+                    corrections.setdefault(words.get(qt, qt), term)
+                    expansions[qt] = [term]
 
     # Step 2. Search candidates
-    note_stats = {}
-    max_coverage = 0
-    for qt in query_tokens:
-        if not qt in index:
-            continue
-
-        note_ids = index[qt].keys()
-        for note_id in note_ids:
-            if note_id not in note_stats:
-                note_stats[note_id] = {
-                        "matched_tokens": set(),
-                        "positions_by_token": {}
-                    }
-
-            note_stats[note_id]["matched_tokens"].add(qt)
-
-            if qt not in note_stats[note_id]["positions_by_token"]:
-                note_stats[note_id]["positions_by_token"][qt] = []
-
-            note_stats[note_id]["positions_by_token"][qt].extend(index[qt][note_id])
-
-    for note_id, note_stat in note_stats.items():
-        coverage = len(note_stat["matched_tokens"])
-        note_stat["coverage"] = coverage
-        if coverage > max_coverage:
-            max_coverage = coverage
-
-    # Step 4. Count frequency
-    for note_id, note_stat in note_stats.items():
-        frequency = 0
-        for _, positions in note_stat["positions_by_token"].items():
-            frequency += len(positions)
-        note_stat["frequency"] = frequency
-
-    # Step 5. Count phrase_bonus
-    for note_stat in note_stats.values():
-        note_stat["phrase_matches"] = []
-        note_stat["phrase_bonus"] = 0
-
-    if len(query_tokens) >= 2:
-        qt_pairs = []
-        for i in range(0, len(query_tokens) - 1):
-            qt_pairs.append((query_tokens[i], query_tokens[i + 1]))
-
-        # TODO: could be simpler, don't need 3 iner cycles
-        for (qt_prev, qt_next) in qt_pairs:
-            for note_id, note_stat in note_stats.items():
-                if (
-                    qt_prev in note_stat["positions_by_token"]
-                    and qt_next in note_stat["positions_by_token"]
-                    ):
-                    prev_positions = note_stat["positions_by_token"][qt_prev]
-                    next_positions = note_stat["positions_by_token"][qt_next]
-                    for p in prev_positions:
-                        if (p + 1) in next_positions:
-                            note_stat["phrase_matches"].append({
-                                "tokens": (qt_prev, qt_next),
-                                "position": p
-                            })
-                            note_stat["phrase_bonus"] += 1
-
-    # Step 6. Build results
+    if vectorized and not phrases and not expansions:
+        from mnemo_cli.vectorized import collect_candidates
+
+        with span("search:candidates"):
+            candidates, total, max_coverage = collect_candidates(
+                index, lookup_tokens, scorer, limit
+            )
+        with span("search:score"):
+            selected = select_top(
+                candidates, query_tokens, SCORERS[scorer](index, lookup_tokens), limit
+            )
+        results = build_results(selected, query_tokens, index, notes, max_coverage)
+        return results, total, corrections
+
+    with span("search:candidates"):
+        positions_by_doc = {}
+        for qt in lookup_tokens:
+            for term in expansions.get(qt, (qt,)):
+                if not term in index:
+                    continue
+
+                for doc, positions in index.postings(term):
+                    if doc not in positions_by_doc:
+                        positions_by_doc[doc] = {}
+
+                    if qt not in positions_by_doc[doc]:
+                        positions_by_doc[doc][qt] = []
+
+                    positions_by_doc[doc][qt].extend(positions)
+
+        # Positions of several expanded terms are merged per pattern
+        merged = [pattern for pattern, terms in expansions.items() if len(terms) > 1]
+        if merged:
+            for positions_by_token in positions_by_doc.values():
+                for pattern in merged:
+                    if pattern in positions_by_token:
+                        positions_by_token[pattern] = sorted(set(positions_by_token[pattern]))
+
+    required_matches = None
+    if phrases:
+        with span("search:phrases"):
+            required_matches = {}
+            for doc, positions_by_token in positions_by_doc.items():
+                matches = []
+                for phrase in phrases:
+                    runs = find_phrase_runs(phrase, positions_by_token)
+                    if not runs:
+                        break
+                    if len(phrase) > 1:
+                        tokens = tuple(stems[0] for _, stems in phrase)
+                        matches.extend({"tokens": tokens, "position": p} for p in runs)
+                else:
+                    required_matches[doc] = matches
+
+            positions_by_doc = {
+                doc: positions_by_doc[doc] for doc in required_matches
+            }
+
+    total = len(positions_by_doc)
+    max_coverage = max(map(len, positions_by_doc.values()), default=0)
+
+    # Step 3. Select top results by score
+    selected = []
+    if positions_by_doc:
+        candidates = (
+            (seq, doc, positions_by_token)
+            for seq, (doc, positions_by_token) in enumerate(positions_by_doc.items())
+        )
+        with span("search:score"):
+            selected = select_top(
+                candidates,
+                query_tokens,
+                SCORERS[scorer](index, lookup_tokens, expansions),
+                limit,
+                required_matches,
+            )
+
+    results = build_results(selected, query_tokens, index, notes, max_coverage)
+    return results, total, corrections
+
+
+
+def build_results(
+        selected: list,
+        query_tokens: list[str],
+        index,
+        notes,
+        max_coverage: int,
+        ) -> list:
+    """Resolve notes of the selected candidates only."""
     result = []
-    for note_id, note_stat in note_stats.items():
-        coverage = note_stat["coverage"]
-        frequency = note_stat["frequency"]
-        phrase_matches =  note_stat["phrase_matches"]
-        phrase_bonus = note_stat["phrase_bonus"]
-        matched_tokens = list(filter(lambda qt: qt in note_stat["matched_tokens"], query_tokens))
-
-        item = {
-            "note": notes[note_id],
-            "score": (coverage, frequency, phrase_bonus),
-            "matched_tokens": matched_tokens,
-            "phrase_matches": phrase_matches,
-            "max_coverage": max_coverage,
-        }
-
-        result.append(item)
-
-    # Step 7. Sort results by score (coverage, frequency, phrase bonus)
-    result = sorted(
-        result,
-        key=lambda x: x["score"],
-        reverse=True
-    )
+    with span("search:results"):
+        for key, doc, phrase_matches, positions_by_token in selected:
+            matched_tokens = [qt for qt in query_tokens if qt in positions_by_token]
+
+            positions = sorted({
+                p for token_positions in positions_by_token.values() for p in token_positions
+            })
+
+            result.append({
+                "note": notes[index.doc_id(doc)],
+                "score": key[:-1],
+                "matched_tokens": matched_tokens,
+                "positions": positions,
+                "phrase_matches": phrase_matches,
+                "max_coverage": max_coverage,
+            })
 
     return result
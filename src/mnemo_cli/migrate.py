@@ -0,0 +1,58 @@
+import os
+from pathlib import Path
+
+from mnemo_cli.indexer import build_index
+from mnemo_cli.segment import SEGMENT_FILE, write_segment
+from mnemo_cli.utils.storage import (
+    LAST_SEARCH_FILE,
+    current_generation,
+    load_last_search,
+    load_pickle,
+    new_generation,
+    save_pickle,
+)
+
+
+LEGACY_NOTES_FILE = "notes.pkl"
+LEGACY_INDEX_FILE = "index.pkl"
+
+
+
+def migrate_data_dir(data_dir: Path) -> bool:
+    """
+    Move a data directory from older layouts to index generations: the
+    pickle layout (notes.pkl with token lists, index.pkl) is rewritten to
+    an index segment, an index file directly in the data directory is
+    moved into the first generation. Returns True if anything was migrated.
+    """
+    notes_path = data_dir / LEGACY_NOTES_FILE
+    if notes_path.exists():
+        notes = load_pickle(notes_path)
+        index = build_index(notes)
+        with new_generation(data_dir) as generation:
+            write_segment(generation / SEGMENT_FILE, index, notes)
+
+        last_search_path = data_dir / LAST_SEARCH_FILE
+        if last_search_path.exists():
+            save_pickle(load_last_search(last_search_path), last_search_path)
+
+        notes_path.unlink()
+        (data_dir / LEGACY_INDEX_FILE).unlink(missing_ok=True)
+
+        return True
+
+    if not data_dir.is_dir() or current_generation(data_dir) is not None:
+        return False
+
+    from mnemo_cli.sqlite_index import SQLITE_FILE
+
+    paths = [data_dir / name for name in (SEGMENT_FILE, SQLITE_FILE)]
+    paths = [path for path in paths if path.exists()]
+    if not paths:
+        return False
+
+    with new_generation(data_dir) as generation:
+        for path in paths:
+            os.replace(path, generation / path.name)
+
+    return True
@@ -1,27 +1,180 @@
-from datetime import datetime
+from collections.abc import Iterable, Iterator
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from itertools import chain, islice, repeat
+import math
+import os
 from pathlib import Path
+from queue import Full, Queue
+import shutil
+import threading
+import time
 
-from mnemo_cli.enums import Language, Source
-from mnemo_cli.sources import SOURCES, export_notes
+from mnemo_cli.enums import Backend, Language, Scorer, Source
+from mnemo_cli.sources import export_notes, export_notes_by_id
 from mnemo_cli.utils.config import load_config, save_config
-from mnemo_cli.utils.storage import load_pickle, save_pickle, find_project_root
-from mnemo_cli.utils.text import prepare_for_index
-from mnemo_cli.indexer import build_index, search_index
+from mnemo_cli.utils.storage import (
+    LAST_SEARCH_FILE,
+    current_generation,
+    find_project_root,
+    load_last_search,
+    load_pickle,
+    new_generation,
+    save_last_search,
+    save_pickle,
+)
+from mnemo_cli.utils.snippet import encode_offsets
+from mnemo_cli.utils.text import STEM_CACHE, prepare_for_index, token_offsets
+from mnemo_cli.utils.timing import TIMINGS, load_timings, save_timings, span
+from mnemo_cli.postings import CompactIndex, IndexBuilder
+from mnemo_cli.indexer import add_to_index, build_index, remove_from_index, search_index
+from mnemo_cli.migrate import migrate_data_dir
+from mnemo_cli.segment import SEGMENT_FILE, Segment, SegmentWriter, stored_note, write_segment
+
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_BATCH_SIZE = 1000
+EXPORT_QUEUE_SIZE = 1000
+# Queries in flight per worker process in search_batch
+BATCH_WINDOW = 16
+STEM_CACHE_FILE = "stem_cache.pkl"
+REBUILD_TIMINGS_FILE = "rebuild_timings.json"
+
+
+
+def export_all_notes(
+        sources: set[Source],
+        progress=None,
+        failed_sources: set[str] | None = None,
+        since: dict[Source, datetime] | None = None,
+        ) -> Iterator[dict]:
+    """
+    Export all sources concurrently, one thread per source, and yield notes
+    as they arrive. `since` maps sources to the time after which their
+    modified notes are exported, for sources that can, see export_notes.
+    Each finished source is reported as an export:source progress event
+    with its note count and duration. A failing source is reported and
+    added to `failed_sources` instead of stopping the others.
+    """
+    queue = Queue(maxsize=EXPORT_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def run(source: Source) -> None:
+        started = time.perf_counter()
+        count = 0
+        error = None
+        try:
+            for note in export_notes(source, since=(since or {}).get(source)):
+                note["source"] = source.value
+                if not put(note):
+                    return
+                count += 1
+        except Exception as e:
+            error = e
+
+        put((source, count, time.perf_counter() - started, error))
+
+    threads = [
+        threading.Thread(target=run, args=(source,), daemon=True)
+        for source in sources
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        pending = len(threads)
+        while pending:
+            item = queue.get()
+            if isinstance(item, dict):
+                yield item
+                continue
+
+            pending -= 1
+            source, count, seconds, error = item
+            if error is not None and failed_sources is not None:
+                failed_sources.add(source.value)
+            if progress:
+                progress(
+                    "export:source",
+                    source=source.value,
+                    notes=count,
+                    seconds=seconds,
+                    error=None if error is None else str(error),
+                )
+    finally:
+        stop.set()
+
+
+
+def track_export(notes: Iterable[dict], progress=None) -> Iterator[dict]:
+    """Report export progress and time spent waiting for exported notes."""
+    if progress:
+        progress("export:start")
+
+    iterator = iter(notes)
+    while True:
+        started = time.perf_counter()
+        note = next(iterator, None)
+        TIMINGS.add("export", time.perf_counter() - started)
+        if note is None:
+            break
+        yield note
+
+    if progress:
+        progress("export:done")
+
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
 
+def load_stem_cache(data_dir: Path) -> None:
+    path = data_dir / STEM_CACHE_FILE
+    if path.exists():
+        STEM_CACHE.load(load_pickle(path))
 
 
-def export_all_notes(sources: set[Source]) -> list:
-    all_notes = []
 
-    for source in sources:
-        notes = export_notes(source)
+def save_stem_cache(data_dir: Path) -> None:
+    save_pickle(STEM_CACHE.dump(), data_dir / STEM_CACHE_FILE)
 
-        for note in notes:
-            note["source"] = source.value
 
-        all_notes.extend(notes)
 
-    return all_notes
+def parse_date(value) -> datetime:
+    """Sources export dates as DATE_FORMAT strings or Unix timestamps."""
+    if isinstance(value, str):
+        return datetime.strptime(value, DATE_FORMAT)
+    return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+
+
+
+def process_note(note: dict, languages: set[Language]) -> dict:
+    text = note["title"] + " " + note["body"]
+    tokens = prepare_for_index(text, languages=languages)
+
+    return {
+        "id": note["id"],
+        "source": note["source"],
+        "title": note["title"],
+        "body": note["body"],
+        "created": parse_date(note["created"]),
+        "modified": parse_date(note["modified"]),
+        "tokens": tokens,
+        "offsets": encode_offsets(token_offsets(text)),
+    }
 
 
 
@@ -29,137 +182,818 @@ def process_notes(notes: list, languages: set[Language]) -> list:
     processed = []
 
     for note in notes:
-        tokens = prepare_for_index(
-            note["title"] + " " + note["body"],
-            languages=languages
-        )
-        processed.append({
-            "id": note["id"],
-            "source": note["source"],
-            "title": note["title"],
-            "body": note["body"],
-            "created": datetime.strptime(note["created"], "%Y-%m-%d %H:%M:%S"),
-            "modified": datetime.strptime(note["modified"], "%Y-%m-%d %H:%M:%S"),
-            "tokens": tokens
-        })
+        processed.append(process_note(note, languages))
 
     return processed
 
 
 
-def rebuild_index(progress=None) -> None:
-    project_root = find_project_root()
-    config = load_config(project_root)
-    mnemo_dir = project_root / ".mnemo"
-    data_dir = mnemo_dir / "data"
+def init_process_worker(stems: dict) -> None:
+    """Start a worker process with the parent's stems, see process_chunk."""
+    STEM_CACHE.load(stems)
+    STEM_CACHE.record_new()
+
+
+
+def process_chunk(notes: list, languages: set[Language]) -> tuple[list, dict]:
+    """
+    Process notes in a worker process. The stems it cached meanwhile are
+    returned too, for the parent to merge and save with its own.
+    """
+    processed = process_notes(notes, languages)
+
+    return processed, STEM_CACHE.take_new()
+
+
+
+def index_chunk(notes: list, languages: set[Language]) -> tuple[list, CompactIndex, dict]:
+    processed, stems = process_chunk(notes, languages)
+    index = build_index(processed)
+
+    return [stored_note(note) for note in processed], index, stems
+
+
+
+def worker_count(jobs: int) -> int:
+    """Worker processes for `jobs`, 0 meaning one per CPU."""
+    if jobs < 0:
+        raise ValueError(f"jobs must be 0 or more, got {jobs}")
+    return jobs or os.cpu_count() or 1
+
+
+
+def check_batch_size(batch_size: int) -> None:
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be 1 or more, got {batch_size}")
+
+
+
+def make_executor(jobs: int):
+    """
+    Pool of `jobs` worker processes for map_chunks, started with the
+    parent's stems. A single job runs in this process, without a pool.
+    """
+    if jobs == 1:
+        return nullcontext()
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_process_worker,
+        initargs=(STEM_CACHE.dump(),),
+    )
+
+
+
+def split_chunks(batch: list, jobs: int) -> list[list]:
+    chunk_size = math.ceil(len(batch) / jobs)
+    return [batch[i:i + chunk_size] for i in range(0, len(batch), chunk_size)]
+
 
-    if not mnemo_dir.exists():
-        raise RuntimeError(
-            "mnemo project is not initialized. "
-            "Run `mnemo init` first."
-        )
+
+def map_chunks(executor, function, batch: list, languages: set[Language], jobs: int) -> list[tuple]:
+    """
+    Run `function`, process_chunk or index_chunk, on chunks of a batch in
+    the worker processes and merge the stems they cached. Returns their
+    results in order, without the stems.
+    """
+    parts = []
+    for result in executor.map(function, split_chunks(batch, jobs), repeat(languages)):
+        STEM_CACHE.merge(result[-1])
+        parts.append(result[:-1])
+    return parts
+
+
+
+def track_batches(notes: Iterable[dict], size: int, progress=None) -> Iterator[list]:
+    """
+    Batches of notes to process, reported as process:start once the first
+    one is ready, process:chunk with the notes done after each one and
+    process:done after the last.
+    """
+    done = 0
+    # Notes are exported lazily, processing starts with the first batch
+    batches = batched(notes, size)
+    first = next(batches, None)
 
     if progress:
-        progress("export:start")
+        progress("process:start")
+
+    for batch in chain((first,) if first else (), batches):
+        yield batch
 
-    notes = export_all_notes(config["sources"])
+        done += len(batch)
+        if progress:
+            progress("process:chunk", notes=done)
 
     if progress:
-        progress("export:done")
+        progress("process:done")
+
+
+
+def build_segment(
+        notes: Iterable[dict],
+        languages: set[Language],
+        path: Path,
+        *,
+        jobs: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress=None,
+        ) -> None:
+    """
+    Stream notes through processing and indexing into a segment file.
+    Only one batch of notes is in memory at a time: stored notes go
+    straight to the segment, postings are appended as encoded bytes.
+    With jobs > 1 (0 means one per CPU) each batch is split into chunks
+    processed and indexed by worker processes, then appended in order.
+    """
+    jobs = worker_count(jobs)
+    check_batch_size(batch_size)
+    builder = IndexBuilder()
+
+    with make_executor(jobs) as executor, SegmentWriter(path) as writer:
+        for batch in track_batches(notes, batch_size, progress):
+            if jobs == 1:
+                with span("process"):
+                    processed = process_notes(batch, languages)
+                with span("index"):
+                    for note in processed:
+                        builder.add(note["id"], note["tokens"])
+                with span("save"):
+                    for note in processed:
+                        writer.add_note(note)
+            else:
+                with span("process"):
+                    parts = map_chunks(executor, index_chunk, batch, languages, jobs)
+                for chunk_notes, chunk_index in parts:
+                    with span("index"):
+                        builder.add_index(chunk_index)
+                    with span("save"):
+                        for note in chunk_notes:
+                            writer.add_note(note)
+
+        if progress:
+            progress("index:start")
+
+        with span("index"):
+            index = builder.finish()
+        with span("save"):
+            writer.finish(index)
+
+    if progress:
+        progress("index:done")
+
+
+
+def build_sqlite(
+        notes: Iterable[dict],
+        languages: set[Language],
+        path: Path,
+        *,
+        jobs: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress=None,
+        ) -> None:
+    """
+    Stream notes through processing into a new SQLite index, see
+    mnemo_cli.sqlite_index. FTS5 indexes every batch as it is inserted.
+    With jobs > 1 (0 means one per CPU) batches are split into chunks
+    processed by worker processes.
+    """
+    from mnemo_cli.sqlite_index import SqliteWriter
+
+    jobs = worker_count(jobs)
+    check_batch_size(batch_size)
+    path.unlink(missing_ok=True)
+
+    with make_executor(jobs) as executor, SqliteWriter(path, columns=len(languages)) as writer:
+        for batch in track_batches(notes, batch_size, progress):
+            with span("process"):
+                if jobs == 1:
+                    processed = process_notes(batch, languages)
+                else:
+                    processed = [
+                        note
+                        for (part,) in map_chunks(executor, process_chunk, batch, languages, jobs)
+                        for note in part
+                    ]
+            with span("index"):
+                writer.add_notes(processed)
+
+        if progress:
+            progress("index:start")
+
+        with span("index"):
+            writer.finish()
+
+    if progress:
+        progress("index:done")
+
+
+
+def diff_notes(
+        stored: list,
+        exported: Iterable[dict],
+        failed_sources: set[str] = frozenset(),
+        ) -> tuple[list, list, list]:
+    """
+    Compare exported notes against stored processed notes by id and
+    modification time. Returns (added, updated, deleted_ids); unchanged
+    exported notes are not kept. A delta export sends older notes as
+    unchanged, with their id and modification time only: those not stored
+    (restored from the trash) or stored with another modification time
+    (edits synced late) are exported by id in full. Notes of sources that
+    failed to export are never reported as deleted.
+    """
+    stored_by_id = {note["id"]: note for note in stored}
+    exported_ids = set()
+    added = []
+    updated = []
+    fetch_ids = {}
+
+    for note in exported:
+        exported_ids.add(note["id"])
+        old = stored_by_id.get(note["id"])
+        changed = old is None or old["modified"] != parse_date(note["modified"])
+        if note.get("unchanged"):
+            if changed:
+                if note["source"] not in fetch_ids:
+                    fetch_ids[note["source"]] = []
+                fetch_ids[note["source"]].append(note["id"])
+            continue
+
+        if old is None:
+            added.append(note)
+        elif changed:
+            updated.append(note)
+
+    for source, ids in fetch_ids.items():
+        for note in export_notes_by_id(Source(source), ids):
+            note["source"] = source
+            if note["id"] in stored_by_id:
+                updated.append(note)
+            else:
+                added.append(note)
+
+    deleted = [
+        note_id for note_id, note in stored_by_id.items()
+        if note_id not in exported_ids and note.get("source") not in failed_sources
+    ]
+
+    return added, updated, deleted
+
+
+
+def process_delta(
+        stored: list,
+        exported: Iterable[dict],
+        languages: set[Language],
+        *,
+        progress=None,
+        failed_sources: set[str] = frozenset(),
+        ) -> tuple[list, list, dict]:
+    """
+    Diff exported notes against stored ones, see diff_notes, and process
+    the added and changed notes. Returns them, the ids of the notes to
+    remove (deleted and changed ones) and the counts for delta:done.
+    """
+    added, updated, deleted = diff_notes(stored, exported, failed_sources)
 
     if progress:
         progress("process:start")
 
-    processed_notes = process_notes(notes, config["languages"])
+    with span("process"):
+        changed = process_notes(added + updated, languages)
 
     if progress:
         progress("process:done")
 
+    removed = [*deleted, *(note["id"] for note in updated)]
+    counts = {"added": len(added), "updated": len(updated), "deleted": len(deleted)}
+    return changed, removed, counts
+
+
+
+def apply_delta(
+        stored: list,
+        index: CompactIndex,
+        exported: Iterable[dict],
+        languages: set[Language],
+        *,
+        progress=None,
+        failed_sources: set[str] = frozenset(),
+        ) -> list:
+    """
+    Update stored notes and the inverted index in place so they match
+    the exported notes. Only added and changed notes are re-processed.
+    Returns the new list of processed notes, or None when the export
+    matched the stored notes.
+    """
+    changed, removed, counts = process_delta(
+        stored, exported, languages, progress=progress, failed_sources=failed_sources
+    )
+
     if progress:
         progress("index:start")
 
-    index = build_index(processed_notes)
+    with span("index"):
+        notes_by_id = {note["id"]: note for note in stored}
+        for note_id in removed:
+            del notes_by_id[note_id]
+        remove_from_index(index, removed)
+
+        add_to_index(index, changed)
+        for note in changed:
+            notes_by_id[note["id"]] = note
 
     if progress:
         progress("index:done")
 
-    save_pickle(processed_notes, data_dir / "notes.pkl")
-    save_pickle(index, data_dir / "index.pkl")
+    if progress:
+        progress("delta:done", **counts)
+
+    if not any(counts.values()):
+        return None
+    return list(notes_by_id.values())
+
+
+
+def update_sqlite(
+        path: Path,
+        exported: Iterable[dict],
+        languages: set[Language],
+        *,
+        output: Path | None = None,
+        progress=None,
+        failed_sources: set[str] = frozenset(),
+        ) -> None:
+    """
+    Update a SQLite index so it matches the exported notes, like
+    apply_delta: in place, or as a copy written to `output`. Only ids and
+    modification times are read for the diff, and only added and changed
+    notes are re-processed. Nothing is written when the export matched.
+    """
+    from mnemo_cli.sqlite_index import SqliteIndex, SqliteWriter
+
+    output = output or path
+    with span("load"), SqliteIndex(path) as index:
+        stored = index.stored_notes()
+    changed, removed, counts = process_delta(
+        stored, exported, languages, progress=progress, failed_sources=failed_sources
+    )
 
-    # save_config will update last_indexed_at
-    save_config(
-        project_root,
-        sources=config["sources"],
-        languages=config["languages"]
+    if progress:
+        progress("index:start")
+
+    if any(counts.values()):
+        if output != path:
+            with span("load"):
+                shutil.copyfile(path, output)
+        with span("index"), SqliteWriter(output) as writer:
+            writer.remove_notes(removed)
+            writer.add_notes(changed)
+            writer.finish()
+
+    if progress:
+        progress("index:done")
+
+    if progress:
+        progress("delta:done", **counts)
+
+
+
+def build_notes_index(
+        notes: Iterable[dict],
+        languages: set[Language],
+        data_dir: Path,
+        backend: Backend,
+        *,
+        failed_sources: set[str] = frozenset(),
+        **options,
+        ) -> None:
+    """
+    Build the index of `backend` from scratch into a new generation of
+    `data_dir`, see build_segment and build_sqlite. The generation is
+    not published when a source failed to export while building, as it
+    would lack the notes of that source.
+    """
+    with new_generation(data_dir) as generation:
+        if backend == Backend.SQLITE:
+            build_sqlite(notes, languages, index_path(generation, backend), **options)
+        else:
+            build_segment(notes, languages, index_path(generation, backend), **options)
+
+        if failed_sources:
+            raise RuntimeError(
+                f"Exporting {', '.join(sorted(failed_sources))} notes failed, "
+                "the index was not changed."
+            )
+
+
+
+def rebuild_index(
+        progress=None,
+        *,
+        incremental: bool = False,
+        jobs: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        sources: set[Source] | None = None,
+        failed_sources: set[str] | None = None,
+        ) -> None:
+    """
+    Re-export the configured sources and rebuild or incrementally update
+    the index. `sources` limits an incremental update to some of them;
+    notes of the others are kept as they are. Sources that fail to export
+    are added to `failed_sources`: a full rebuild then raises and keeps
+    the current index, an incremental update keeps their notes.
+    """
+    project_root = find_project_root()
+    config = load_config(project_root)
+    mnemo_dir = project_root / ".mnemo"
+    data_dir = mnemo_dir / "data"
+
+    if not mnemo_dir.exists():
+        raise RuntimeError(
+            "mnemo project is not initialized. "
+            "Run `mnemo init` first."
+        )
+
+    started = time.perf_counter()
+    # Notes modified during the export are picked up by the next update
+    export_started_at = datetime.now(timezone.utc)
+    TIMINGS.reset()
+    STEM_CACHE.reset_stats()
+
+    backend = config["backend"]
+    with span("load"):
+        migrate_data_dir(data_dir)
+        load_stem_cache(data_dir)
+
+    # Updates are written to a copy in a new generation, the current index
+    # stays intact until the update is complete
+    current_path = index_path(data_dir, backend)
+    incremental = incremental and current_path.exists()
+
+    sources = config["sources"] if sources is None else sources & config["sources"]
+    skipped = config["sources"] - sources
+    if skipped and not incremental:
+        raise RuntimeError(
+            "Updating some sources only needs an existing index. "
+            "Run `mnemo rebuild` first."
+        )
+
+    # Notes of skipped sources are kept like those of sources that failed
+    kept_sources = {source.value for source in skipped}
+    notes = track_export(
+        export_all_notes(
+            sources,
+            progress,
+            kept_sources,
+            since=config["indexed_at"] if incremental else None,
+        ),
+        progress
     )
+    # An update that changes nothing leaves its generation empty, so the
+    # current one stays published
+    if incremental and backend == Backend.SQLITE:
+        with new_generation(data_dir) as generation:
+            update_sqlite(
+                current_path,
+                notes,
+                config["languages"],
+                output=index_path(generation, backend),
+                progress=progress,
+                failed_sources=kept_sources,
+            )
+    elif incremental and backend == Backend.SEGMENT:
+        with span("load"), Segment(current_path) as segment:
+            index = segment.to_compact_index()
+            stored = list(segment.iter_notes())
+        with new_generation(data_dir) as generation:
+            processed_notes = apply_delta(
+                stored,
+                index,
+                notes,
+                config["languages"],
+                progress=progress,
+                failed_sources=kept_sources,
+            )
+            if processed_notes is not None:
+                with span("save"):
+                    write_segment(index_path(generation, backend), index, processed_notes)
+    else:
+        build_notes_index(
+            notes,
+            config["languages"],
+            data_dir,
+            backend,
+            failed_sources=kept_sources,
+            jobs=jobs,
+            batch_size=batch_size,
+            progress=progress,
+        )
+
+    if failed_sources is not None:
+        failed_sources.update(kept_sources - {source.value for source in skipped})
+
+    with span("save"):
+        save_stem_cache(data_dir)
+
+        # Sources that failed or were skipped are as fresh as before, and
+        # are exported in full next time after a full build without them
+        indexed_at = {}
+        for source in config["sources"]:
+            if source.value not in kept_sources:
+                indexed_at[source] = export_started_at
+            elif incremental and source in config["indexed_at"]:
+                indexed_at[source] = config["indexed_at"][source]
+        # save_config will update last_indexed_at
+        save_config(
+            project_root,
+            sources=config["sources"],
+            languages=config["languages"],
+            backend=backend,
+            indexed_at=indexed_at,
+        )
+
+    save_timings(
+        data_dir / REBUILD_TIMINGS_FILE,
+        time.perf_counter() - started,
+        stem_cache=STEM_CACHE.stats(),
+    )
+
+
+
+def open_segment(data_dir: Path) -> Segment:
+    migrate_data_dir(data_dir)
+    return Segment(index_path(data_dir, Backend.SEGMENT))
 
 
 
-def search_notes(query: str):
+def index_path(data_dir: Path, backend: Backend) -> Path:
+    """
+    Index file of `backend` in the current generation of a data directory,
+    or in `data_dir` itself when it has no generations (a generation
+    directory being built).
+    """
+    directory = current_generation(data_dir) or data_dir
+    if backend == Backend.SQLITE:
+        from mnemo_cli.sqlite_index import SQLITE_FILE
+
+        return directory / SQLITE_FILE
+    return directory / SEGMENT_FILE
+
+
+
+def open_index(data_dir: Path, backend: Backend):
+    """
+    Open the index of `backend` for reading: a Segment or a SqliteIndex.
+    Both provide the index interface search_index uses, stored notes as
+    `notes`, iter_notes() and len() for the number of unique tokens.
+    """
+    if backend == Backend.SQLITE:
+        from mnemo_cli.sqlite_index import SqliteIndex
+
+        migrate_data_dir(data_dir)
+        return SqliteIndex(index_path(data_dir, backend))
+    return open_segment(data_dir)
+
+
+
+def search_notes(
+        query: str,
+        limit: int | None = None,
+        scorer: str = Scorer.BM25.value,
+        vectorized: bool = False,
+        fuzzy: bool = False,
+        ):
     project_root = find_project_root()
     config = load_config(project_root)
     data_dir = project_root / ".mnemo" / "data"
 
-    index = load_pickle(data_dir / "index.pkl")
-    notes = load_pickle(data_dir / "notes.pkl")
-    notes_by_id = {note["id"]: note for note in notes}
+    with span("load"):
+        opened = open_index(data_dir, config["backend"])
+
+    with opened as index:
+        results, total, corrections = search_index(
+            query=query,
+            index=index,
+            notes=index.notes,
+            languages=config["languages"],
+            limit=limit,
+            scorer=scorer,
+            vectorized=vectorized,
+            fuzzy=fuzzy,
+            )
+
+    with span("save"):
+        save_last_search(results, data_dir / LAST_SEARCH_FILE)
+
+    return results, total, corrections
 
-    results = search_index(
+
+
+def search_query(index, languages: set[Language], query: str, **options) -> dict:
+    """Search one query of a batch, with only what identifies the results."""
+    started = time.perf_counter()
+    results, total, corrections = search_index(
         query=query,
         index=index,
-        notes=notes_by_id,
-        languages=config["languages"]
-        )
+        notes=index.notes,
+        languages=languages,
+        **options,
+    )
+    return {
+        "query": query,
+        "total": total,
+        "corrections": corrections,
+        "results": [
+            {
+                "id": result["note"]["id"],
+                "source": result["note"]["source"],
+                "title": result["note"]["title"],
+                "score": result["score"],
+            }
+            for result in results
+        ],
+        "seconds": time.perf_counter() - started,
+    }
 
-    save_pickle(results, data_dir / "last_search.pkl")
 
-    return results
 
+# Index and options of a search_batch worker process
+BATCH_WORKER = {}
 
 
-def get_last_search() -> list:
-    project_root = find_project_root()
-    path = project_root / ".mnemo" / "data" / "last_search.pkl"
 
-    if not path.exists():
-        return []
+def init_batch_worker(data_dir: Path, backend: Backend, languages: set[Language], options: dict) -> None:
+    BATCH_WORKER.update(
+        index=open_index(data_dir, backend),
+        languages=languages,
+        options=options,
+    )
 
-    return load_pickle(path)
 
 
+def search_batch_query(query: str) -> dict:
+    return search_query(
+        BATCH_WORKER["index"], BATCH_WORKER["languages"], query, **BATCH_WORKER["options"]
+    )
 
 
-def get_stats():
+
+def search_batch(
+        queries: Iterable[str],
+        *,
+        jobs: int = 1,
+        limit: int | None = None,
+        scorer: str = Scorer.BM25.value,
+        vectorized: bool = False,
+        fuzzy: bool = False,
+        ) -> Iterator[dict]:
+    """
+    Search many queries with the index opened once and yield a
+    search_query result per query, in input order, as soon as it is ready.
+    With jobs > 1 (0 means one per CPU) queries are spread over worker
+    processes, each opening the index once, and read in a thread so that
+    finished results are yielded while waiting for more input. The last
+    search is not saved.
+    """
     project_root = find_project_root()
     config = load_config(project_root)
     data_dir = project_root / ".mnemo" / "data"
-    notes = load_pickle(data_dir / "notes.pkl")
-    index = load_pickle(data_dir / "index.pkl")
+    options = {"limit": limit, "scorer": scorer, "vectorized": vectorized, "fuzzy": fuzzy}
+    jobs = worker_count(jobs)
+
+    if jobs == 1:
+        with open_index(data_dir, config["backend"]) as index:
+            for query in queries:
+                yield search_query(index, config["languages"], query, **options)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Migrate once here rather than in every worker
+    migrate_data_dir(data_dir)
+    with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=init_batch_worker,
+            initargs=(data_dir, config["backend"], config["languages"], options),
+            ) as executor:
+        # Futures in input order, then the reader's error or None
+        pending = Queue(maxsize=jobs * BATCH_WINDOW)
+        stop = threading.Event()
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def read() -> None:
+            try:
+                for query in queries:
+                    if not put(executor.submit(search_batch_query, query)):
+                        return
+            except Exception as e:
+                put(e)
+                return
+            put(None)
+
+        # The first submit starts the workers, before the reader thread:
+        # forking a process that has threads may deadlock the children
+        queries = iter(queries)
+        query = next(queries, None)
+        if query is None:
+            return
+        pending.put(executor.submit(search_batch_query, query))
+        threading.Thread(target=read, daemon=True).start()
+        try:
+            while (item := pending.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item.result()
+        finally:
+            stop.set()
+
+
+
+def get_last_search() -> list[tuple]:
+    """(note_id, source, score) of every result of the last search."""
+    project_root = find_project_root()
+    return load_last_search(project_root / ".mnemo" / "data" / LAST_SEARCH_FILE)
+
+
+
+def get_last_search_note(position: int) -> dict | None:
+    """Stored note of a last search result (1-based), looked up in the index."""
+    results = get_last_search()
+    if position < 1 or position > len(results):
+        return None
+
+    note_id = results[position - 1][0]
+    project_root = find_project_root()
+    config = load_config(project_root)
+    with open_index(project_root / ".mnemo" / "data", config["backend"]) as index:
+        return index.notes.get(note_id)
+
+
+
 
-    stats = {
+def build_stats(project_root: Path, config: dict, index) -> dict:
+    return {
         "project_root": project_root,
         "sources": sorted(s.value for s in config["sources"]),
         "languages": sorted(l.value for l in config["languages"]),
+        "backend": config["backend"].value,
         "created_at": config["created_at"],
         "last_indexed_at": config["last_indexed_at"],
-        "notes_count": len(notes),
+        "notes_count": len(index.notes),
         "unique_tokens": len(index),
+        "last_rebuild": load_timings(
+            project_root / ".mnemo" / "data" / REBUILD_TIMINGS_FILE
+        ),
     }
 
+
+
+def get_stats():
+    project_root = find_project_root()
+    config = load_config(project_root)
+    data_dir = project_root / ".mnemo" / "data"
+
+    with open_index(data_dir, config["backend"]) as index:
+        stats = build_stats(project_root, config, index)
+
     return stats
 
 
 
 def get_notes():
     project_root = find_project_root()
+    config = load_config(project_root)
     data_dir = project_root / ".mnemo" / "data"
-    notes = load_pickle(data_dir / "notes.pkl")
+
+    with open_index(data_dir, config["backend"]) as index:
+        notes = list(index.iter_notes())
 
     return notes
 
 
 
-def init_mnemo(sources: set[Source], languages: set[Language], *, progress=None) -> None:
+def init_mnemo(
+        sources: set[Source],
+        languages: set[Language],
+        *,
+        backend: Backend = Backend.SEGMENT,
+        progress=None,
+        jobs: int = 1,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        ) -> None:
     mnemo_dir = Path.cwd() / ".mnemo"
 
     if mnemo_dir.exists():
@@ -168,6 +1002,10 @@ def init_mnemo(sources: set[Source], languages: set[Language], *, progress=None)
             "Use `mnemo rebuild` or delete .mnemo directory."
         )
 
+    started = time.perf_counter()
+    TIMINGS.reset()
+    STEM_CACHE.reset_stats()
+
     mnemo_dir.mkdir()
     data_dir = mnemo_dir / "data"
     data_dir.mkdir()
@@ -176,31 +1014,23 @@ def init_mnemo(sources: set[Source], languages: set[Language], *, progress=None)
         Path.cwd(),
         sources=sources,
         languages=languages,
+        backend=backend,
     )
 
-    if progress:
-        progress("export:start")
-
-    notes = export_all_notes(sources)
-
-    if progress:
-        progress("export:done")
-
-    if progress:
-        progress("process:start")
-
-    processed_notes = process_notes(notes, languages)
-
-    if progress:
-        progress("process:done")
-
-    if progress:
-        progress("index:start")
-
-    index = build_index(processed_notes)
-
-    if progress:
-        progress("index:done")
+    build_notes_index(
+        track_export(export_all_notes(sources, progress), progress),
+        languages,
+        data_dir,
+        backend,
+        jobs=jobs,
+        batch_size=batch_size,
+        progress=progress,
+    )
+    with span("save"):
+        save_stem_cache(data_dir)
 
-    save_pickle(processed_notes, data_dir / "notes.pkl")
-    save_pickle(index, data_dir / "index.pkl")
+    save_timings(
+        data_dir / REBUILD_TIMINGS_FILE,
+        time.perf_counter() - started,
+        stem_cache=STEM_CACHE.stats(),
+    )
@@ -0,0 +1,336 @@
+from bisect import bisect_left
+
+from mnemo_cli.fuzzy import build_gram_index
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(buf, offset: int) -> tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        byte = buf[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
+
+
+
+def encode_postings(entries: list[tuple[int, list[int]]]) -> bytes:
+    """
+    Encode (doc, positions) pairs sorted by doc as:
+    doc_count, then per doc: doc delta, positions count, position deltas.
+    """
+    out = bytearray()
+    write_varint(out, len(entries))
+
+    prev_doc = 0
+    for doc, positions in entries:
+        write_entry(out, doc - prev_doc, positions)
+        prev_doc = doc
+
+    return bytes(out)
+
+
+def write_entry(out: bytearray, doc_delta: int, positions: list[int]) -> None:
+    write_varint(out, doc_delta)
+    write_varint(out, len(positions))
+    prev_pos = 0
+    for pos in positions:
+        write_varint(out, pos - prev_pos)
+        prev_pos = pos
+
+
+def decode_postings(buf) -> list[tuple[int, list[int]]]:
+    count, offset = read_varint(buf, 0)
+    entries = []
+
+    doc = 0
+    for _ in range(count):
+        delta, offset = read_varint(buf, offset)
+        doc += delta
+
+        n_positions, offset = read_varint(buf, offset)
+        positions = []
+        pos = 0
+        for _ in range(n_positions):
+            delta, offset = read_varint(buf, offset)
+            pos += delta
+            positions.append(pos)
+
+        entries.append((doc, positions))
+
+    return entries
+
+
+def group_tokens(tokens: list[tuple[str, int]]) -> dict[str, list[int]]:
+    grouped = {}
+    for (token, pos) in tokens:
+        if token not in grouped:
+            grouped[token] = []
+        grouped[token].append(pos)
+
+    return grouped
+
+
+
+class CompactIndex:
+    """
+    Inverted index with integer doc numbers and varint-encoded postings.
+
+    Note ids are interned once in `doc_ids` (doc number -> note id,
+    None for removed notes). `terms` maps each token to its encoded
+    postings, see `encode_postings`; `sorted_terms` is the term dictionary in
+    sorted order, for prefix lookups, and `grams` its trigram index, for
+    fuzzy lookups (see mnemo_cli.fuzzy). `doc_terms` is the forward index
+    (doc number -> its tokens) used to remove notes. `doc_lengths` holds
+    the token count of each note and `total_length` their sum, for ranking.
+    """
+
+    def __init__(self):
+        self.doc_ids: list[str | None] = []
+        self.doc_terms: list[list[str] | None] = []
+        self.doc_lengths: list[int] = []
+        self.total_length = 0
+        self.terms: dict[str, bytes] = {}
+        self._doc_numbers = None
+        self._sorted_terms = None
+        self._grams = None
+
+    def __getstate__(self):
+        return {
+            "doc_ids": self.doc_ids,
+            "doc_terms": self.doc_terms,
+            "doc_lengths": self.doc_lengths,
+            "total_length": self.total_length,
+            "terms": self.terms,
+        }
+
+    def __setstate__(self, state):
+        self.doc_ids = state["doc_ids"]
+        self.doc_terms = state["doc_terms"]
+        self.doc_lengths = state["doc_lengths"]
+        self.total_length = state["total_length"]
+        self.terms = state["terms"]
+        self._doc_numbers = None
+        self._sorted_terms = None
+        self._grams = None
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def __contains__(self, term: str) -> bool:
+        return term in self.terms
+
+    @property
+    def doc_numbers(self) -> dict[str, int]:
+        if self._doc_numbers is None:
+            self._doc_numbers = {
+                note_id: doc
+                for doc, note_id in enumerate(self.doc_ids)
+                if note_id is not None
+            }
+        return self._doc_numbers
+
+    @property
+    def doc_count(self) -> int:
+        return len(self.doc_numbers)
+
+    @property
+    def sorted_terms(self) -> list[str]:
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.terms)
+        return self._sorted_terms
+
+    @property
+    def grams(self) -> dict[str, list[int]]:
+        if self._grams is None:
+            self._grams = build_gram_index(self.sorted_terms)
+        return self._grams
+
+    def term_at(self, i: int) -> str:
+        return self.sorted_terms[i]
+
+    def gram_terms(self, gram: str) -> list[int]:
+        return self.grams.get(gram, [])
+
+    def iter_terms(self, prefix: str = ""):
+        """Terms starting with `prefix`, in sorted order."""
+        terms = self.sorted_terms
+        for i in range(bisect_left(terms, prefix), len(terms)):
+            if not terms[i].startswith(prefix):
+                break
+            yield terms[i]
+
+    def doc_id(self, doc: int) -> str:
+        return self.doc_ids[doc]
+
+    def doc_length(self, doc: int) -> int:
+        return self.doc_lengths[doc]
+
+    def doc_frequency(self, term: str) -> int:
+        buf = self.terms.get(term)
+        if buf is None:
+            return 0
+        return read_varint(buf, 0)[0]
+
+    def postings(self, term: str) -> list[tuple[int, list[int]]]:
+        buf = self.terms.get(term)
+        if buf is None:
+            return []
+        return decode_postings(buf)
+
+    def add_documents(self, documents) -> None:
+        """
+        Add (note_id, tokens) pairs. New notes get doc numbers above all
+        existing ones, so their postings are appended to each term.
+        """
+        new_postings = {}
+        for note_id, tokens in documents:
+            doc = len(self.doc_ids)
+            grouped = group_tokens(tokens)
+            self.doc_ids.append(note_id)
+            self.doc_terms.append(list(grouped))
+            self.doc_lengths.append(len(tokens))
+            self.total_length += len(tokens)
+            self.doc_numbers[note_id] = doc
+
+            for token, positions in grouped.items():
+                if token not in new_postings:
+                    new_postings[token] = []
+                new_postings[token].append((doc, positions))
+
+        for token, entries in new_postings.items():
+            if token in self.terms:
+                entries = decode_postings(self.terms[token]) + entries
+            else:
+                self._sorted_terms = None
+                self._grams = None
+            self.terms[token] = encode_postings(entries)
+
+    def remove_documents(self, note_ids) -> None:
+        """
+        Remove notes by id. Only postings of the removed notes' tokens
+        are rewritten.
+        """
+        removed_by_token = {}
+        for note_id in note_ids:
+            doc = self.doc_numbers.pop(note_id, None)
+            if doc is None:
+                continue
+
+            for token in self.doc_terms[doc]:
+                if token not in removed_by_token:
+                    removed_by_token[token] = set()
+                removed_by_token[token].add(doc)
+
+            self.doc_ids[doc] = None
+            self.doc_terms[doc] = None
+            self.total_length -= self.doc_lengths[doc]
+            self.doc_lengths[doc] = 0
+
+        for token, docs in removed_by_token.items():
+            if token not in self.terms:
+                continue
+
+            entries = [
+                entry for entry in decode_postings(self.terms[token])
+                if entry[0] not in docs
+            ]
+            if entries:
+                self.terms[token] = encode_postings(entries)
+            else:
+                del self.terms[token]
+                self._sorted_terms = None
+                self._grams = None
+
+    def compact(self) -> None:
+        """
+        Renumber the remaining notes densely, dropping the doc numbers of
+        removed ones. Their order is kept, so postings stay sorted by doc.
+        """
+        live = [doc for doc, note_id in enumerate(self.doc_ids) if note_id is not None]
+        if len(live) == len(self.doc_ids):
+            return
+
+        numbers = {doc: number for number, doc in enumerate(live)}
+        self.terms = {
+            term: encode_postings([
+                (numbers[doc], positions) for doc, positions in decode_postings(buf)
+            ])
+            for term, buf in self.terms.items()
+        }
+        self.doc_ids = [self.doc_ids[doc] for doc in live]
+        self.doc_terms = [self.doc_terms[doc] for doc in live]
+        self.doc_lengths = [self.doc_lengths[doc] for doc in live]
+        self._doc_numbers = None
+
+
+
+class IndexBuilder:
+    """
+    Append-only CompactIndex builder. Postings are encoded as notes arrive,
+    so memory holds encoded bytes rather than position lists.
+    """
+
+    def __init__(self):
+        self.doc_ids: list[str] = []
+        self.doc_terms: list[list[str]] = []
+        self.doc_lengths: list[int] = []
+        self._bodies: dict[str, bytearray] = {}
+        self._counts: dict[str, int] = {}
+        self._last_docs: dict[str, int] = {}
+
+    def _append(self, token: str, doc: int, positions: list[int]) -> None:
+        body = self._bodies.get(token)
+        if body is None:
+            body = self._bodies[token] = bytearray()
+            self._counts[token] = 0
+            self._last_docs[token] = 0
+
+        write_entry(body, doc - self._last_docs[token], positions)
+        self._counts[token] += 1
+        self._last_docs[token] = doc
+
+    def add(self, note_id: str, tokens: list[tuple[str, int]]) -> None:
+        doc = len(self.doc_ids)
+        grouped = group_tokens(tokens)
+        self.doc_ids.append(note_id)
+        self.doc_terms.append(list(grouped))
+        self.doc_lengths.append(len(tokens))
+
+        for token, positions in grouped.items():
+            self._append(token, doc, positions)
+
+    def add_index(self, part: CompactIndex) -> None:
+        """Append an index built over the next batch of notes."""
+        offset = len(self.doc_ids)
+        self.doc_ids.extend(part.doc_ids)
+        self.doc_terms.extend(part.doc_terms)
+        self.doc_lengths.extend(part.doc_lengths)
+
+        for token, buf in part.terms.items():
+            for doc, positions in decode_postings(buf):
+                self._append(token, doc + offset, positions)
+
+    def finish(self) -> CompactIndex:
+        index = CompactIndex()
+        index.doc_ids = self.doc_ids
+        index.doc_terms = self.doc_terms
+        index.doc_lengths = self.doc_lengths
+        index.total_length = sum(self.doc_lengths)
+
+        for token, body in self._bodies.items():
+            header = bytearray()
+            write_varint(header, self._counts[token])
+            index.terms[token] = bytes(header + body)
+
+        self._bodies = {}
+        return index
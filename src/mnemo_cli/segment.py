@@ -0,0 +1,371 @@
+from collections.abc import Mapping
+import mmap
+import pickle
+import struct
+from pathlib import Path
+
+from mnemo_cli.fuzzy import build_gram_index
+from mnemo_cli.postings import CompactIndex, decode_postings, read_varint, write_varint
+
+
+# Segment file layout (little-endian):
+#
+#   header       magic, n_terms, n_docs, n_ids, n_grams, total token count,
+#                term/doc/id/gram table offsets
+#   blobs        pickled stored notes, then term strings, postings, note ids,
+#                per-doc term numbers (varint deltas into the term table),
+#                trigram strings and their term numbers (same encoding)
+#   term table   n_terms x (term offset, term length, postings offset, postings length),
+#                sorted by term
+#   doc table    n_docs x (note id offset, note id length, stored offset, stored length,
+#                terms offset, terms length, token count), indexed by doc number,
+#                stored length 0 for removed notes
+#   id table     n_ids x doc number, sorted by note id
+#   gram table   n_grams x (gram offset, gram length, terms offset, terms length),
+#                sorted by trigram, see mnemo_cli.fuzzy
+#
+# Stored notes are written as they arrive, and the tables once the index is
+# complete. Postings use the CompactIndex encoding, so a segment can be
+# turned back into a mutable index by copying bytes.
+
+MAGIC = b"MNEMOSG3"
+HEADER = struct.Struct("<8sIIIIQQQQQ")
+TERM_ENTRY = struct.Struct("<QIQI")
+DOC_ENTRY = struct.Struct("<QIQIQII")
+ID_ENTRY = struct.Struct("<I")
+GRAM_ENTRY = struct.Struct("<QIQI")
+
+SEGMENT_FILE = "index.seg"
+
+
+
+def stored_note(note: dict) -> dict:
+    return {key: value for key, value in note.items() if key != "tokens"}
+
+
+def encode_term_numbers(numbers: list[int]) -> bytes:
+    out = bytearray()
+    prev = 0
+    for number in numbers:
+        write_varint(out, number - prev)
+        prev = number
+    return bytes(out)
+
+
+def decode_term_numbers(buf) -> list[int]:
+    numbers = []
+    offset = 0
+    number = 0
+    while offset < len(buf):
+        delta, offset = read_varint(buf, offset)
+        number += delta
+        numbers.append(number)
+    return numbers
+
+
+class SegmentWriter:
+    """
+    Streams stored notes to a segment file in doc number order, then writes
+    the postings and tables in `finish`.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = open(self.path, "wb")
+        self._file.write(b"\0" * HEADER.size)
+        self._stored: list[tuple[int, int]] = []
+        self._finished = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is not None or not self._finished:
+            self.path.unlink(missing_ok=True)
+
+    def _write(self, data: bytes) -> tuple[int, int]:
+        offset = self._file.tell()
+        self._file.write(data)
+        return offset, len(data)
+
+    def add_note(self, note: dict | None) -> None:
+        """Store the note of the next doc number, None for a removed note."""
+        if note is None:
+            self._stored.append((0, 0))
+            return
+
+        stored = pickle.dumps(stored_note(note), protocol=pickle.HIGHEST_PROTOCOL)
+        self._stored.append(self._write(stored))
+
+    def finish(self, index: CompactIndex) -> None:
+        if len(index.doc_ids) != len(self._stored):
+            raise RuntimeError("Stored notes don't match the index documents")
+
+        terms = sorted(index.terms)
+        term_numbers = {term: i for i, term in enumerate(terms)}
+
+        term_table = bytearray()
+        for term in terms:
+            term_off, term_len = self._write(term.encode("utf-8"))
+            post_off, post_len = self._write(index.terms[term])
+            term_table += TERM_ENTRY.pack(term_off, term_len, post_off, post_len)
+
+        doc_table = bytearray()
+        for note_id, doc_terms, doc_length, (stored_off, stored_len) in zip(
+            index.doc_ids, index.doc_terms, index.doc_lengths, self._stored
+        ):
+            if note_id is None:
+                doc_table += DOC_ENTRY.pack(0, 0, 0, 0, 0, 0, 0)
+                continue
+            id_off, id_len = self._write(note_id.encode("utf-8"))
+            terms_off, terms_len = self._write(encode_term_numbers(
+                sorted(term_numbers[term] for term in doc_terms)
+            ))
+            doc_table += DOC_ENTRY.pack(
+                id_off, id_len, stored_off, stored_len, terms_off, terms_len, doc_length
+            )
+
+        live_docs = sorted(
+            (note_id, doc)
+            for doc, note_id in enumerate(index.doc_ids)
+            if note_id is not None
+        )
+        id_table = bytearray()
+        for _, doc in live_docs:
+            id_table += ID_ENTRY.pack(doc)
+
+        grams = build_gram_index(terms)
+        gram_table = bytearray()
+        for gram in sorted(grams):
+            gram_off, gram_len = self._write(gram.encode("utf-8"))
+            numbers_off, numbers_len = self._write(encode_term_numbers(grams[gram]))
+            gram_table += GRAM_ENTRY.pack(gram_off, gram_len, numbers_off, numbers_len)
+
+        term_table_off, _ = self._write(term_table)
+        doc_table_off, _ = self._write(doc_table)
+        id_table_off, _ = self._write(id_table)
+        gram_table_off, _ = self._write(gram_table)
+
+        self._file.seek(0)
+        self._file.write(HEADER.pack(
+            MAGIC, len(terms), len(index.doc_ids), len(live_docs), len(grams),
+            index.total_length, term_table_off, doc_table_off, id_table_off,
+            gram_table_off
+        ))
+        self._finished = True
+
+
+
+def write_segment(path, index: CompactIndex, notes) -> None:
+    """Write an updated index, compacting it first so removed notes take no space."""
+    notes_by_id = {note["id"]: note for note in notes}
+    index.compact()
+
+    with SegmentWriter(path) as writer:
+        for note_id in index.doc_ids:
+            writer.add_note(notes_by_id[note_id])
+        writer.finish(index)
+
+
+
+class Segment:
+    """
+    Read-only, memory-mapped view of a segment file. Only the pages for
+    looked-up terms and requested notes are touched.
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        if not path.exists():
+            raise RuntimeError(f"Index segment not found: {path}")
+
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (
+            magic, self.n_terms, self.n_docs, self.n_ids, self.n_grams, self.total_length,
+            self._term_table_off, self._doc_table_off, self._id_table_off,
+            self._gram_table_off,
+        ) = HEADER.unpack_from(self._mmap, 0)
+
+        if magic != MAGIC:
+            self._mmap.close()
+            raise RuntimeError(
+                f"Invalid index segment: {path}. Run `mnemo rebuild`."
+            )
+
+        self.notes = StoredNotes(self)
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.n_terms
+
+    def __contains__(self, term: str) -> bool:
+        return self._find_term(term) is not None
+
+    def _term_entry(self, i: int) -> tuple[int, int, int, int]:
+        return TERM_ENTRY.unpack_from(self._mmap, self._term_table_off + i * TERM_ENTRY.size)
+
+    @property
+    def doc_count(self) -> int:
+        return self.n_ids
+
+    def _doc_entry(self, doc: int) -> tuple[int, int, int, int, int, int, int]:
+        return DOC_ENTRY.unpack_from(self._mmap, self._doc_table_off + doc * DOC_ENTRY.size)
+
+    def term_at(self, i: int) -> str:
+        term_off, term_len, _, _ = self._term_entry(i)
+        return self._mmap[term_off:term_off + term_len].decode("utf-8")
+
+    def _lower_bound(self, term: str) -> int:
+        """Number of the first term not less than `term`."""
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term_at(mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return lo
+
+    def _find_term(self, term: str) -> int | None:
+        i = self._lower_bound(term)
+        if i < self.n_terms and self.term_at(i) == term:
+            return i
+        return None
+
+    def iter_terms(self, prefix: str = ""):
+        """Terms starting with `prefix`, in sorted order."""
+        for i in range(self._lower_bound(prefix), self.n_terms):
+            term = self.term_at(i)
+            if not term.startswith(prefix):
+                break
+            yield term
+
+    def _raw_postings(self, i: int) -> bytes:
+        _, _, post_off, post_len = self._term_entry(i)
+        return self._mmap[post_off:post_off + post_len]
+
+    def postings(self, term: str) -> list[tuple[int, list[int]]]:
+        i = self._find_term(term)
+        if i is None:
+            return []
+        return decode_postings(self._raw_postings(i))
+
+    def doc_frequency(self, term: str) -> int:
+        i = self._find_term(term)
+        if i is None:
+            return 0
+        _, _, post_off, _ = self._term_entry(i)
+        return read_varint(self._mmap, post_off)[0]
+
+    def gram_terms(self, gram: str) -> list[int]:
+        """Numbers of the terms containing a trigram, see mnemo_cli.fuzzy."""
+        lo, hi = 0, self.n_grams
+        while lo < hi:
+            mid = (lo + hi) // 2
+            gram_off, gram_len, numbers_off, numbers_len = GRAM_ENTRY.unpack_from(
+                self._mmap, self._gram_table_off + mid * GRAM_ENTRY.size
+            )
+            current = self._mmap[gram_off:gram_off + gram_len].decode("utf-8")
+            if current == gram:
+                return decode_term_numbers(self._mmap[numbers_off:numbers_off + numbers_len])
+            if current < gram:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return []
+
+    def doc_id(self, doc: int) -> str | None:
+        id_off, id_len, _, _, _, _, _ = self._doc_entry(doc)
+        if id_len == 0:
+            return None
+        return self._mmap[id_off:id_off + id_len].decode("utf-8")
+
+    def doc_number(self, note_id: str) -> int | None:
+        lo, hi = 0, self.n_ids
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (doc,) = ID_ENTRY.unpack_from(self._mmap, self._id_table_off + mid * ID_ENTRY.size)
+            current = self.doc_id(doc)
+            if current == note_id:
+                return doc
+            if current < note_id:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        return None
+
+    def doc_length(self, doc: int) -> int:
+        return self._doc_entry(doc)[6]
+
+    def note(self, doc: int) -> dict | None:
+        _, _, stored_off, stored_len, _, _, _ = self._doc_entry(doc)
+        if stored_len == 0:
+            return None
+        return pickle.loads(self._mmap[stored_off:stored_off + stored_len])
+
+    def iter_notes(self):
+        for doc in range(self.n_docs):
+            note = self.note(doc)
+            if note is not None:
+                yield note
+
+    def to_compact_index(self) -> CompactIndex:
+        terms = [self.term_at(i) for i in range(self.n_terms)]
+        index = CompactIndex()
+        index.terms = {
+            term: self._raw_postings(i)
+            for i, term in enumerate(terms)
+        }
+
+        index.total_length = self.total_length
+
+        for doc in range(self.n_docs):
+            id_off, id_len, _, _, terms_off, terms_len, doc_length = self._doc_entry(doc)
+            index.doc_lengths.append(doc_length)
+            if id_len == 0:
+                index.doc_ids.append(None)
+                index.doc_terms.append(None)
+                continue
+
+            index.doc_ids.append(self._mmap[id_off:id_off + id_len].decode("utf-8"))
+            numbers = decode_term_numbers(self._mmap[terms_off:terms_off + terms_len])
+            index.doc_terms.append([terms[number] for number in numbers])
+
+        return index
+
+
+
+class StoredNotes(Mapping):
+    """Stored notes of a segment keyed by note id, loaded on access."""
+
+    def __init__(self, segment: Segment):
+        self._segment = segment
+
+    def __getitem__(self, note_id: str) -> dict:
+        doc = self._segment.doc_number(note_id)
+        if doc is None:
+            raise KeyError(note_id)
+        return self._segment.note(doc)
+
+    def __iter__(self):
+        for doc in range(self._segment.n_docs):
+            note_id = self._segment.doc_id(doc)
+            if note_id is not None:
+                yield note_id
+
+    def __len__(self) -> int:
+        return self._segment.n_ids
@@ -1,13 +1,26 @@
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 import json
 import os
-import sqlite3
 import subprocess
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
 from mnemo_cli.enums import Source
 
 
+BEAR_DB_PATH = Path(os.path.expanduser(
+    '~/Library/Group Containers/9K33E3U3T4.net.shinyfrog.bear/Application Data/database.sqlite'
+))
+
+# Bear stores Core Data timestamps, seconds since this moment
+CORE_DATA_EPOCH = datetime(2001, 1, 1, tzinfo=timezone.utc)
+CORE_DATA_OFFSET = CORE_DATA_EPOCH.timestamp()
+
+# Notes neither in the trash nor deleted
+BEAR_NOTES_WHERE = "ZTRASHED = 0 AND ZPERMANENTLYDELETED = 0"
+# Below SQLite's limit of host parameters in a query
+BEAR_IDS_PER_QUERY = 500
+
 
 def open_apple_note(note_id: str) -> None:
     script = f'''
@@ -60,55 +73,112 @@ def export_apple_notes():
 
 
 
-def export_bear_notes():
-    db_path = os.path.expanduser(
-        '~/Library/Group Containers/9K33E3U3T4.net.shinyfrog.bear/Application Data/database.sqlite'
-    )
+def core_data_timestamp(moment: datetime) -> float:
+    return moment.timestamp() - CORE_DATA_OFFSET
 
-    if not os.path.exists(db_path):
-        print("Ber db not found")
-        return []
 
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
 
-    cursor.execute("""
-        SELECT ZUNIQUEIDENTIFIER, ZTITLE, ZTEXT, ZCREATIONDATE, ZMODIFICATIONDATE
-        FROM ZSFNOTE
-        WHERE ZTRASHED = 0
-        ORDER BY ZMODIFICATIONDATE DESC
-    """)
+def connect_bear(db_path: Path):
+    """Read-only connection, Bear keeps writing to its database meanwhile."""
+    import sqlite3
 
-    bear_notes = cursor.fetchall()
-    conn.close()
+    return sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
 
-    notes = []
-    for note in bear_notes:
-        uid, title, body, created_timestamp, modified_timestamp = note
-        created = datetime(2001, 1, 1) + timedelta(seconds=created_timestamp)
-        created_string = created.strftime("%Y-%m-%d %H:%M:%S")
-        modified = datetime(2001, 1, 1) + timedelta(seconds=modified_timestamp)
-        modified_string = modified.strftime("%Y-%m-%d %H:%M:%S")
 
-        notes.append({
+
+def bear_rows(conn, where: str, params: list) -> Iterator[dict]:
+    cursor = conn.execute(f"""
+        SELECT ZUNIQUEIDENTIFIER, ZTITLE, ZTEXT, ZCREATIONDATE + ?, ZMODIFICATIONDATE + ?
+        FROM ZSFNOTE
+        WHERE {where}
+        ORDER BY ZMODIFICATIONDATE DESC
+    """, [CORE_DATA_OFFSET, CORE_DATA_OFFSET, *params])
+    for uid, title, body, created, modified in cursor:
+        yield {
             "id": uid,
             "title": title,
             "body": body,
-            "created": created_string,
-            "modified": modified_string
-        })
+            "created": created,
+            "modified": modified,
+        }
+
+
+
+def export_bear_notes(
+        db_path: Path = BEAR_DB_PATH,
+        *,
+        since: datetime | None = None,
+        ids: Iterable[str] | None = None,
+        ) -> Iterator[dict]:
+    """
+    Yield Bear notes with their dates as Unix timestamps. Rows are read
+    from the cursor one at a time, so no more than one note body is in
+    memory. With `since` only notes modified after it are read in full,
+    the other notes are yielded as {"id", "modified", "unchanged": True}
+    by a query without bodies: a note missing from both was trashed or
+    deleted. Edits synced late can be older than `since`, so their
+    modification time still has to be compared, see pipeline.diff_notes.
+    With `ids` only the notes with these ids are read.
+    """
+    if not os.path.exists(db_path):
+        raise RuntimeError(f"Bear database not found: {db_path}")
+
+    where = BEAR_NOTES_WHERE
+    params = []
+    if since is not None:
+        where += " AND ZMODIFICATIONDATE > ?"
+        params.append(core_data_timestamp(since))
+
+    conn = connect_bear(db_path)
+    try:
+        if ids is None:
+            yield from bear_rows(conn, where, params)
+        else:
+            ids = list(ids)
+            for i in range(0, len(ids), BEAR_IDS_PER_QUERY):
+                chunk = ids[i:i + BEAR_IDS_PER_QUERY]
+                yield from bear_rows(
+                    conn,
+                    f"{where} AND ZUNIQUEIDENTIFIER IN ({', '.join('?' * len(chunk))})",
+                    [*params, *chunk],
+                )
+
+        if since is not None:
+            cursor = conn.execute(
+                f"SELECT ZUNIQUEIDENTIFIER, ZMODIFICATIONDATE + ? FROM ZSFNOTE "
+                f"WHERE {BEAR_NOTES_WHERE} AND ZMODIFICATIONDATE <= ?",
+                (CORE_DATA_OFFSET, core_data_timestamp(since)),
+            )
+            for uid, modified in cursor:
+                yield {"id": uid, "modified": modified, "unchanged": True}
+    finally:
+        conn.close()
+
+
+
+def export_notes(source: Source, since: datetime | None = None) -> Iterator[dict]:
+    """
+    Export the notes of a source. `since` asks for the notes modified
+    after it only, sources that cannot tell export all notes.
+    """
+    if source is Source.APPLE:
+        return export_apple_notes()
+    if source is Source.BEAR:
+        return export_bear_notes(since=since)
 
-    return notes
+    raise ValueError(f"Unsupported source: {source}")
 
 
 
-def export_notes(source: Source) -> list[dict]:
-    if source is Source.APPLE:
-        return export_apple_notes()
+def export_notes_by_id(source: Source, ids: Iterable[str]) -> Iterator[dict]:
+    """
+    Export the notes of a source with the given ids, for notes a delta
+    export reported as unchanged that are not indexed.
+    """
     if source is Source.BEAR:
-        return export_bear_notes()
+        return export_bear_notes(ids=ids)
 
-    raise ValueError(f"Unsupported source: {souces}")
+    raise ValueError(f"Unsupported source: {source}")
 
 SOURCES = {
     'apple': export_apple_notes,
@@ -0,0 +1,331 @@
+from collections.abc import Mapping
+from datetime import datetime
+from pathlib import Path
+import sqlite3
+
+from mnemo_cli.fuzzy import build_gram_index
+from mnemo_cli.postings import group_tokens
+from mnemo_cli.segment import decode_term_numbers, encode_term_numbers
+
+
+# SQLite index layout:
+#
+#   notes            stored notes, rowid is the doc number, with token counts
+#   tokens           pre-stemmed text of every note in `columns` columns:
+#                    column k holds the k-th stem of each word position
+#                    (words get one stem per note language) or STOP_TOKEN,
+#                    so FTS token offsets are word positions
+#   notes_fts        FTS5 index over `tokens` (external content)
+#   notes_instances  fts5vocab view of notes_fts: (term, doc, column, offset)
+#   terms            sorted vocabulary with document frequencies, numbered
+#                    like the segment term table
+#   grams            trigram index over `terms`, see mnemo_cli.fuzzy
+#   meta             column count and ranking stats
+#
+# SqliteIndex reads it through the same interface as Segment, so
+# search_index ranks, matches phrases and expands wildcards the same way
+# on both backends.
+
+SQLITE_FILE = "index.sqlite"
+STOP_TOKEN = "_"
+
+# Stems are \w+ runs, which unicode61 keeps as one token with these options
+TOKENIZER = "unicode61 remove_diacritics 0 categories 'L* N*' tokenchars '_'"
+
+
+
+def create_schema(db: sqlite3.Connection, columns: int) -> None:
+    names = ", ".join(f"t{k}" for k in range(columns))
+    db.executescript(f"""
+        CREATE TABLE notes (
+            id TEXT NOT NULL UNIQUE,
+            source TEXT NOT NULL,
+            title TEXT NOT NULL,
+            body TEXT NOT NULL,
+            created TEXT NOT NULL,
+            modified TEXT NOT NULL,
+            offsets BLOB,
+            length INTEGER NOT NULL
+        );
+        CREATE TABLE tokens ({names});
+        CREATE VIRTUAL TABLE notes_fts USING fts5(
+            {names}, content='tokens', tokenize="{TOKENIZER}"
+        );
+        CREATE VIRTUAL TABLE notes_instances USING fts5vocab(notes_fts, instance);
+        CREATE VIRTUAL TABLE notes_rows USING fts5vocab(notes_fts, row);
+        CREATE TABLE terms (
+            number INTEGER PRIMARY KEY,
+            term TEXT NOT NULL UNIQUE,
+            df INTEGER NOT NULL
+        );
+        CREATE TABLE grams (gram TEXT PRIMARY KEY, numbers BLOB NOT NULL) WITHOUT ROWID;
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID;
+    """)
+    db.execute("INSERT INTO meta VALUES ('columns', ?)", (columns,))
+
+
+
+def token_columns(tokens: list[tuple[str, int]], columns: int) -> list[str]:
+    """Spread (stem, position) tokens over `columns` space separated texts."""
+    stems_by_pos = {}
+    for token, pos in tokens:
+        if pos not in stems_by_pos:
+            stems_by_pos[pos] = []
+        stems_by_pos[pos].append(token)
+
+    n_positions = max(stems_by_pos, default=-1) + 1
+    texts = []
+    for k in range(columns):
+        words = []
+        for pos in range(n_positions):
+            stems = stems_by_pos.get(pos, ())
+            words.append(stems[k] if k < len(stems) else STOP_TOKEN)
+        texts.append(" ".join(words))
+
+    return texts
+
+
+
+class SqliteWriter:
+    """
+    Adds and removes notes of a SQLite index. The vocabulary, trigram
+    index and ranking stats are rewritten and the changes committed in
+    `finish`; without it nothing is written.
+    """
+
+    def __init__(self, path, columns: int = 1):
+        self.path = Path(path)
+        self._created = not self.path.exists()
+        self._db = sqlite3.connect(self.path)
+        if not self._created:
+            (self.columns,) = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'columns'"
+            ).fetchone()
+        else:
+            create_schema(self._db, columns)
+            self.columns = columns
+        self._finished = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._finished:
+            self._db.rollback()
+        self._db.close()
+        if not self._finished and self._created:
+            self.path.unlink(missing_ok=True)
+
+    def add_notes(self, notes) -> None:
+        names = ", ".join(f"t{k}" for k in range(self.columns))
+        params = ", ".join("?" * self.columns)
+        for note in notes:
+            cursor = self._db.execute(
+                "INSERT INTO notes (id, source, title, body, created, modified, offsets, length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    note["id"], note["source"], note["title"], note["body"],
+                    note["created"].isoformat(), note["modified"].isoformat(),
+                    note.get("offsets"), len(note["tokens"]),
+                ),
+            )
+            texts = token_columns(note["tokens"], self.columns)
+            self._db.execute(
+                f"INSERT INTO tokens (rowid, {names}) VALUES (?, {params})",
+                (cursor.lastrowid, *texts),
+            )
+            self._db.execute(
+                f"INSERT INTO notes_fts (rowid, {names}) VALUES (?, {params})",
+                (cursor.lastrowid, *texts),
+            )
+
+    def remove_notes(self, note_ids) -> None:
+        names = ", ".join(f"t{k}" for k in range(self.columns))
+        params = ", ".join("?" * self.columns)
+        for note_id in note_ids:
+            row = self._db.execute(
+                f"SELECT notes.rowid, {names} FROM notes JOIN tokens ON tokens.rowid = notes.rowid "
+                "WHERE notes.id = ?",
+                (note_id,),
+            ).fetchone()
+            if row is None:
+                continue
+
+            # External content FTS5 tables delete by the indexed values
+            self._db.execute(
+                f"INSERT INTO notes_fts (notes_fts, rowid, {names}) VALUES ('delete', ?, {params})",
+                row,
+            )
+            self._db.execute("DELETE FROM tokens WHERE rowid = ?", (row[0],))
+            self._db.execute("DELETE FROM notes WHERE rowid = ?", (row[0],))
+
+    def finish(self) -> None:
+        self._db.execute("DELETE FROM terms")
+        self._db.execute("DELETE FROM grams")
+        terms = []
+        for term, df in self._db.execute(
+            "SELECT term, doc FROM notes_rows WHERE term != ? ORDER BY term", (STOP_TOKEN,)
+        ).fetchall():
+            self._db.execute(
+                "INSERT INTO terms (number, term, df) VALUES (?, ?, ?)", (len(terms), term, df)
+            )
+            terms.append(term)
+
+        self._db.executemany(
+            "INSERT INTO grams VALUES (?, ?)",
+            (
+                (gram, encode_term_numbers(numbers))
+                for gram, numbers in build_gram_index(terms).items()
+            ),
+        )
+
+        (total_length,) = self._db.execute("SELECT coalesce(sum(length), 0) FROM notes").fetchone()
+        self._db.execute("INSERT OR REPLACE INTO meta VALUES ('total_length', ?)", (total_length,))
+        self._db.commit()
+        self._finished = True
+
+
+
+class SqliteIndex:
+    """
+    Read-only view of a SQLite index with the interface of Segment. Only
+    the postings of looked-up terms and requested notes are read.
+    """
+
+    def __init__(self, path):
+        path = Path(path)
+        if not path.exists():
+            raise RuntimeError(f"Index database not found: {path}")
+
+        # The daemon reads the index from its request handler thread
+        self._db = sqlite3.connect(
+            path.resolve().as_uri() + "?mode=ro", uri=True, check_same_thread=False
+        )
+        try:
+            meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        except sqlite3.DatabaseError as e:
+            self._db.close()
+            raise RuntimeError(f"Invalid index database: {path}. Run `mnemo rebuild`.") from e
+
+        self.total_length = meta.get("total_length", 0)
+        (self.n_terms,) = self._db.execute("SELECT count(*) FROM terms").fetchone()
+        (self.n_ids,) = self._db.execute("SELECT count(*) FROM notes").fetchone()
+        self.notes = SqliteNotes(self)
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.n_terms
+
+    def __contains__(self, term: str) -> bool:
+        return self.doc_frequency(term) > 0
+
+    @property
+    def doc_count(self) -> int:
+        return self.n_ids
+
+    def term_at(self, i: int) -> str:
+        return self._db.execute("SELECT term FROM terms WHERE number = ?", (i,)).fetchone()[0]
+
+    def iter_terms(self, prefix: str = ""):
+        """Terms starting with `prefix`, in sorted order."""
+        for (term,) in self._db.execute(
+            "SELECT term FROM terms WHERE term >= ? ORDER BY term", (prefix,)
+        ):
+            if not term.startswith(prefix):
+                break
+            yield term
+
+    def gram_terms(self, gram: str) -> list[int]:
+        row = self._db.execute("SELECT numbers FROM grams WHERE gram = ?", (gram,)).fetchone()
+        return decode_term_numbers(row[0]) if row else []
+
+    def doc_frequency(self, term: str) -> int:
+        row = self._db.execute("SELECT df FROM terms WHERE term = ?", (term,)).fetchone()
+        return row[0] if row else 0
+
+    def postings(self, term: str) -> list[tuple[int, list[int]]]:
+        if term == STOP_TOKEN:
+            return []
+
+        rows = self._db.execute(
+            "SELECT doc, offset FROM notes_instances WHERE term = ?", (term,)
+        )
+        by_doc = group_tokens(rows)
+        return [(doc, sorted(set(positions))) for doc, positions in sorted(by_doc.items())]
+
+    def doc_id(self, doc: int) -> str | None:
+        row = self._db.execute("SELECT id FROM notes WHERE rowid = ?", (doc,)).fetchone()
+        return row[0] if row else None
+
+    def doc_number(self, note_id: str) -> int | None:
+        row = self._db.execute("SELECT rowid FROM notes WHERE id = ?", (note_id,)).fetchone()
+        return row[0] if row else None
+
+    def doc_length(self, doc: int) -> int:
+        row = self._db.execute("SELECT length FROM notes WHERE rowid = ?", (doc,)).fetchone()
+        return row[0] if row else 0
+
+    def note(self, doc: int) -> dict | None:
+        row = self._db.execute(
+            "SELECT id, source, title, body, created, modified, offsets FROM notes WHERE rowid = ?",
+            (doc,),
+        ).fetchone()
+        return None if row is None else note_from_row(row)
+
+    def stored_notes(self) -> list[dict]:
+        """id, source and modified of every note, enough to diff an export."""
+        return [
+            {"id": note_id, "source": source, "modified": datetime.fromisoformat(modified)}
+            for note_id, source, modified in self._db.execute(
+                "SELECT id, source, modified FROM notes"
+            )
+        ]
+
+    def iter_notes(self):
+        for row in self._db.execute(
+            "SELECT id, source, title, body, created, modified, offsets FROM notes ORDER BY rowid"
+        ):
+            yield note_from_row(row)
+
+
+
+def note_from_row(row) -> dict:
+    note_id, source, title, body, created, modified, offsets = row
+    return {
+        "id": note_id,
+        "source": source,
+        "title": title,
+        "body": body,
+        "created": datetime.fromisoformat(created),
+        "modified": datetime.fromisoformat(modified),
+        "offsets": offsets,
+    }
+
+
+
+class SqliteNotes(Mapping):
+    """Stored notes of a SQLite index keyed by note id, loaded on access."""
+
+    def __init__(self, index: SqliteIndex):
+        self._index = index
+
+    def __getitem__(self, note_id: str) -> dict:
+        doc = self._index.doc_number(note_id)
+        if doc is None:
+            raise KeyError(note_id)
+        return self._index.note(doc)
+
+    def __iter__(self):
+        for (note_id,) in self._index._db.execute("SELECT id FROM notes ORDER BY rowid"):
+            yield note_id
+
+    def __len__(self) -> int:
+        return self._index.n_ids
@@ -2,7 +2,8 @@ import json
 from pathlib import Path
 from datetime import timezone, datetime
 
-from mnemo_cli.enums import Language, Source
+from mnemo_cli.enums import Backend, Language, Source
+from mnemo_cli.utils.storage import atomic_write
 
 
 def save_config(
@@ -10,7 +11,16 @@ def save_config(
         *,
         sources: set[Source],
         languages: set[Language],
+        backend: Backend = Backend.SEGMENT,
+        indexed_at: dict[Source, datetime] | None = None,
         ) -> None:
+    """
+    Write the project config. `indexed_at` maps sources to the start time
+    of their last complete export, by default now for all sources.
+    """
+    now = datetime.now(timezone.utc)
+    if indexed_at is None:
+        indexed_at = dict.fromkeys(sources, now)
     mnemo_dir = project_root / ".mnemo"
 
     config_path = mnemo_dir / "config.json"
@@ -25,11 +35,13 @@ def save_config(
     config = {
         "sources": [s.value for s in sources],
         "languages": [l.value for l in languages],
+        "backend": backend.value,
         "created_at": created_at,
-        "last_indexed_at": datetime.now(timezone.utc).isoformat(),
+        "last_indexed_at": now.isoformat(),
+        "indexed_at": {s.value: t.isoformat() for s, t in indexed_at.items()},
     }
 
-    with open(mnemo_dir / "config.json", "w", encoding="utf-8") as f:
+    with atomic_write(mnemo_dir / "config.json", "w", encoding="utf-8") as f:
         json.dump(config, f, indent=2)
 
 
@@ -45,14 +57,25 @@ def load_config(project_root: Path) -> dict:
     try:
         sources = {Source(code) for code in raw.get("sources", [])}
         languages = {Language(code) for code in raw.get("languages", [])}
+        backend = Backend(raw.get("backend", Backend.SEGMENT.value))
         created_at = datetime.fromisoformat(raw["created_at"])
         last_indexed_at = datetime.fromisoformat(raw["last_indexed_at"])
+        # Configs before per-source times were indexed all at once
+        raw_indexed_at = raw.get("indexed_at") or dict.fromkeys(
+            (source.value for source in sources), raw["last_indexed_at"]
+        )
+        indexed_at = {
+            Source(code): datetime.fromisoformat(value)
+            for code, value in raw_indexed_at.items()
+        }
     except Exception as e:
         raise RuntimeError(f"Invalid mnemo config format: {e}")
 
     return {
         "sources": sources,
         "languages": languages,
+        "backend": backend,
         "created_at": created_at,
         "last_indexed_at": last_indexed_at,
+        "indexed_at": indexed_at,
     }
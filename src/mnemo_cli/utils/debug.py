@@ -1,22 +1,15 @@
-from mnemo_cli.utils.storage import find_project_root, load_pickle
+from mnemo_cli.pipeline import get_last_search_note as resolve_last_search_note
+from mnemo_cli.pipeline import open_segment
+from mnemo_cli.utils.storage import find_project_root
 
 
 def get_last_search_note() -> dict:
-    project_root = find_project_root()
-    path = project_root / ".mnemo" / "data" / "last_search.pkl"
-
-    results = load_pickle(path)
-
-    note = results[0]["note"]
-    return note
+    return resolve_last_search_note(1)
 
 def get_note():
     project_root = find_project_root()
-    path = project_root / ".mnemo" / "data" / "notes.pkl"
-
-    results = load_pickle(path)
-
-    note = results[0]
+    with open_segment(project_root / ".mnemo" / "data") as segment:
+        note = next(segment.iter_notes())
     return note
 
 
@@ -25,9 +18,6 @@ def debug_show_note():
     print("Last search note data")
     print(f"keys: {note_last_search.keys()}")
     print("")
-    print(f"tokens len: {len(note_last_search["tokens"])}")
-    print("")
-    # print(note_last_search["tokens"])
 
     note = get_note()
     print("Saved note data")
@@ -0,0 +1,101 @@
+import struct
+
+from mnemo_cli.utils.text import WORD_RE
+
+
+# Token offsets are stored per note as fixed-width little-endian integers,
+# so the offset of any token position is read without decoding the rest
+OFFSET = struct.Struct("<I")
+
+SNIPPET_WORDS = 16
+SNIPPET_CONTEXT = 4
+
+
+
+def encode_offsets(offsets: list[int]) -> bytes:
+    return struct.pack(f"<{len(offsets)}I", *offsets)
+
+
+
+def offset_at(buf: bytes, pos: int) -> int:
+    return OFFSET.unpack_from(buf, pos * OFFSET.size)[0]
+
+
+
+def densest_window(positions: list[int], size: int) -> tuple[int, int]:
+    """
+    Slice [i, j) of sorted positions holding the most positions within
+    `size` consecutive words.
+    """
+    best = (0, 1)
+    i = 0
+    for j in range(len(positions)):
+        while positions[j] - positions[i] >= size:
+            i += 1
+        if j + 1 - i > best[1] - best[0]:
+            best = (i, j + 1)
+
+    return best
+
+
+
+def build_snippet(
+        note: dict,
+        positions: list[int],
+        *,
+        words: int = SNIPPET_WORDS,
+        context: int = SNIPPET_CONTEXT,
+        ) -> list[tuple[str, bool]] | None:
+    """
+    Cut the body window with the most matched token positions and return
+    it as (text, matched) segments. Positions index the note's "title body"
+    token stream; title matches are left out. Returns None when the body
+    has no match or the note has no stored offsets.
+    """
+    offsets = note.get("offsets")
+    if not offsets or not positions:
+        return None
+
+    body = note["body"]
+    body_start = len(note["title"]) + 1
+    n_tokens = len(offsets) // OFFSET.size
+
+    positions = [
+        p for p in positions
+        if p < n_tokens and offset_at(offsets, p) >= body_start
+    ]
+    if not positions:
+        return None
+
+    i, j = densest_window(positions, words)
+    window = positions[i:j]
+
+    first = max(window[0] - context, 0)
+    while offset_at(offsets, first) < body_start:
+        first += 1
+    last = min(max(first + words - 1, window[-1]), n_tokens - 1)
+
+    def word_span(pos: int) -> tuple[int, int]:
+        start = offset_at(offsets, pos) - body_start
+        match = WORD_RE.match(body, start)
+        return start, match.end() if match else start + 1
+
+    start = word_span(first)[0]
+    end = word_span(last)[1]
+
+    segments = []
+    if start > 0:
+        segments.append(("...", False))
+
+    cursor = start
+    for pos in window:
+        word_start, word_end = word_span(pos)
+        segments.append((body[cursor:word_start], False))
+        segments.append((body[word_start:word_end], True))
+        cursor = word_end
+
+    segments.append((body[cursor:end], False))
+    if end < len(body):
+        segments.append(("...", False))
+
+    return segments
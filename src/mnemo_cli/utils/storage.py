@@ -1,10 +1,50 @@
+from contextlib import contextmanager
+import os
 from pathlib import Path
 import pickle
+import shutil
 
 
-def save_pickle(data, path):
+GENERATIONS_DIR = "generations"
+CURRENT_FILE = "CURRENT"
+KEEP_GENERATIONS = 2
+
+
+
+def fsync_dir(path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_write(path, mode: str = "wb", *, durable: bool = True, **kwargs):
+    """
+    Write to a temporary file next to `path` and rename it over `path`, so
+    readers see either the old or the complete new file. With `durable`
+    the data and the rename are fsynced before returning.
+    """
     path = Path(path)
-    with open(path, 'wb') as f:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, mode, **kwargs) as f:
+            yield f
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+    if durable:
+        fsync_dir(path.parent)
+
+
+def save_pickle(data, path, *, durable: bool = True):
+    with atomic_write(path, durable=durable) as f:
         pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
 
 def load_pickle(path):
@@ -15,6 +55,97 @@ def load_pickle(path):
         return pickle.load(f)
 
 
+LAST_SEARCH_FILE = "last_search.pkl"
+
+
+def compact_result(result: dict) -> tuple:
+    note = result["note"]
+    return (note["id"], note["source"], result["score"])
+
+
+def save_last_search(results: list[dict], path):
+    """Store search results as (note_id, source, score), enough to open them."""
+    # Written on every search, losing it on power loss is fine
+    save_pickle([compact_result(result) for result in results], path, durable=False)
+
+
+def load_last_search(path) -> list[tuple]:
+    path = Path(path)
+    if not path.exists():
+        return []
+    # Older versions stored full results
+    return [
+        compact_result(entry) if isinstance(entry, dict) else entry
+        for entry in load_pickle(path)
+    ]
+
+
+def generation_numbers(data_dir: Path) -> list[int]:
+    root = data_dir / GENERATIONS_DIR
+    if not root.is_dir():
+        return []
+    return sorted(int(path.name) for path in root.iterdir() if path.name.isdigit())
+
+
+def current_generation(data_dir: Path) -> Path | None:
+    """Directory of the published index generation, None before the first one."""
+    try:
+        name = (data_dir / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return None
+    return data_dir / GENERATIONS_DIR / name
+
+
+@contextmanager
+def new_generation(data_dir: Path):
+    """
+    Directory for the next index generation. When the block exits, its
+    files are fsynced and CURRENT is atomically switched to it, so readers
+    see either the previous or the complete new index, then old generations
+    are removed. On error, or when nothing was written to it, the new
+    generation is removed instead.
+    """
+    root = data_dir / GENERATIONS_DIR
+    root.mkdir(exist_ok=True)
+    path = root / str(max(generation_numbers(data_dir), default=0) + 1)
+    path.mkdir()
+    try:
+        yield path
+
+        if not any(path.iterdir()):
+            path.rmdir()
+            return
+
+        for child in path.iterdir():
+            with open(child, "rb+") as f:
+                os.fsync(f.fileno())
+        fsync_dir(path)
+        fsync_dir(root)
+    except BaseException:
+        shutil.rmtree(path, ignore_errors=True)
+        raise
+
+    with atomic_write(data_dir / CURRENT_FILE, "w", encoding="utf-8") as f:
+        f.write(path.name)
+
+    collect_generations(data_dir)
+
+
+def collect_generations(data_dir: Path, keep: int = KEEP_GENERATIONS) -> None:
+    """
+    Remove generations older than the `keep` most recent ones up to the
+    current one. The previous generation is kept by default for readers
+    that resolved CURRENT just before the switch.
+    """
+    current = current_generation(data_dir)
+    if current is None:
+        return
+
+    older = [n for n in generation_numbers(data_dir) if n < int(current.name)]
+    for number in older[:max(len(older) - (keep - 1), 0)]:
+        shutil.rmtree(data_dir / GENERATIONS_DIR / str(number), ignore_errors=True)
+
+
 def find_project_root(start: Path | None = None) -> Path:
     current = start or Path.cwd()
 
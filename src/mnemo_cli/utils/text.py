@@ -1,5 +1,5 @@
+from collections import OrderedDict
 import re
-import snowballstemmer
 
 from mnemo_cli.enums import Language
 
@@ -7,6 +7,8 @@ from mnemo_cli.enums import Language
 
 WHITESPACE_RE = re.compile(r"\s+")
 WORD_RE = re.compile(r"\b\w+\b")
+PHRASE_RE = re.compile(r'"([^"]*)"')
+WILDCARD_RE = re.compile(r"\w*\*[\w*]*")
 WHITE_LIST = {"c", "go", "js", "ts", "ai", "py", "sql", "css", "html", "jsx", "c#"}
 BLACK_LIST = {
     Language.EN: {"the", "and", "or", "to", "of", "in", "on", "for", "with"},
@@ -14,12 +16,98 @@ BLACK_LIST = {
     Language.RU: {"на", "по", "из", "под", "над", "из-за", "ко"}
 }
 
-STEMMERS = {
-    Language.EN: snowballstemmer.stemmer("english"),
-    Language.ES: snowballstemmer.stemmer("spanish"),
-    Language.RU: snowballstemmer.stemmer("russian"),
+STEMMER_NAMES = {
+    Language.EN: "english",
+    Language.ES: "spanish",
+    Language.RU: "russian",
 }
 
+# Created on first use of a language, see get_stemmer
+STEMMERS = {}
+
+STEM_CACHE_SIZE = 100_000
+
+
+
+class StemCache:
+    """
+    Bounded LRU cache of stems per language. Word frequencies are Zipfian,
+    so a small cache answers most stemWord calls.
+    """
+
+    def __init__(self, maxsize: int = STEM_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries: dict[Language, OrderedDict] = {
+            lang: OrderedDict() for lang in Language
+        }
+        self.hits = 0
+        self.misses = 0
+        # Stems added since take_new(), recorded in worker processes only
+        self.new: dict[Language, dict] | None = None
+
+    def stem(self, token: str, lang: Language) -> str:
+        entries = self.entries[lang]
+        stem = entries.get(token)
+        if stem is not None:
+            self.hits += 1
+            entries.move_to_end(token)
+            return stem
+
+        self.misses += 1
+        stem = get_stemmer(lang).stemWord(token)
+        entries[token] = stem
+        if self.new is not None:
+            self.new.setdefault(lang, {})[token] = stem
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+        return stem
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": sum(len(entries) for entries in self.entries.values()),
+        }
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def record_new(self) -> None:
+        """Start recording added stems and counting calls for take_new()."""
+        self.new = {}
+        self.reset_stats()
+
+    def take_new(self) -> dict:
+        """Stems added and call counts since the last call, for merge()."""
+        new = {
+            "stems": {lang.value: stems for lang, stems in self.new.items()},
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+        self.record_new()
+        return new
+
+    def merge(self, new: dict) -> None:
+        """Add what a worker process cached, see take_new()."""
+        self.load(new["stems"])
+        self.hits += new["hits"]
+        self.misses += new["misses"]
+
+    def dump(self) -> dict[str, dict[str, str]]:
+        return {lang.value: dict(entries) for lang, entries in self.entries.items()}
+
+    def load(self, data: dict[str, dict[str, str]]) -> None:
+        for code, stems in data.items():
+            entries = self.entries[Language(code)]
+            entries.update(stems)
+            while len(entries) > self.maxsize:
+                entries.popitem(last=False)
+
+
+STEM_CACHE = StemCache()
+
 
 
 def normalize_text(text:str) -> str:
@@ -36,6 +124,23 @@ def tokenize(text:str) -> list[str]:
     return tokens
 
 
+def token_offsets(text: str) -> list[int]:
+    """
+    Character offset in `text` of every token `tokenize(normalize_text(text))`
+    returns, so token positions can be mapped back to the original text.
+    """
+    lowered = text.lower()
+    offsets = [m.start() for m in WORD_RE.finditer(lowered)]
+    if len(lowered) == len(text):
+        return offsets
+
+    # Some characters lowercase to several, map offsets back one by one
+    mapping = []
+    for i, char in enumerate(text):
+        mapping.extend([i] * len(char.lower()))
+    return [mapping[offset] for offset in offsets]
+
+
 def filter_tokens(tokens: list[str], *, lang: Language = Language.EN) -> list[str]:
     filtered = []
     for t in tokens:
@@ -49,11 +154,19 @@ def filter_tokens(tokens: list[str], *, lang: Language = Language.EN) -> list[st
     return filtered
 
 
-def stem_word(token: str, *, lang: Language = Language.EN) -> str:
+def get_stemmer(lang: Language):
     stemmer = STEMMERS.get(lang)
-    if not stemmer:
+    if stemmer is None:
+        import snowballstemmer
+
+        stemmer = STEMMERS[lang] = snowballstemmer.stemmer(STEMMER_NAMES[lang])
+    return stemmer
+
+
+def stem_word(token: str, *, lang: Language = Language.EN) -> str:
+    if lang not in STEMMER_NAMES:
         return token
-    return stemmer.stemWord(token)
+    return STEM_CACHE.stem(token, lang)
 
 
 def prepare_for_index(text: str, languages: set[Language]) -> list[tuple[str, int]]:
@@ -80,20 +193,81 @@ def prepare_for_index(text: str, languages: set[Language]) -> list[tuple[str, in
     return result
 
 
-def prepare_for_search(query: str, languages: set[Language]) -> list:
+def search_token_words(query: str, languages: set[Language]) -> dict[str, str]:
+    """Tokens of prepare_for_search, mapped to the query word each comes from."""
     normalized = normalize_text(query)
     base_tokens = tokenize(normalized)
 
-    result = []
-    seen = set()
+    result = {}
+    for lang in languages:
+        for word in filter_tokens(base_tokens, lang=lang):
+            result.setdefault(stem_word(word, lang=lang), word)
+
+    return result
+
+
+def prepare_for_search(query: str, languages: set[Language]) -> list:
+    return list(search_token_words(query, languages))
+
+
+def split_phrases(query: str) -> tuple[str, list[str]]:
+    """Return the query without quotes and the list of quoted phrases."""
+    phrases = [p for p in PHRASE_RE.findall(query) if p.strip()]
+    return query.replace('"', " "), phrases
+
+
+def split_wildcards(query: str) -> tuple[str, list[str]]:
+    """
+    Return the query without wildcard words and the lowercased wildcard
+    patterns, e.g. `kube*` or `kube*tes`. Patterns are matched against
+    indexed terms as they are, see indexer.expand_wildcard.
+    """
+    patterns = []
+    for match in WILDCARD_RE.findall(query):
+        pattern = re.sub(r"\*+", "*", match.lower())
+        if pattern not in patterns:
+            patterns.append(pattern)
+
+    return WILDCARD_RE.sub(" ", query), patterns
+
 
+def stem_wildcard(pattern: str, languages: set[Language]) -> list[str]:
+    """`pattern` with its literal prefix stemmed, once per language."""
+    prefix, star, rest = pattern.partition("*")
+    variants = []
     for lang in languages:
-        filtered = filter_tokens(base_tokens, lang=lang)
-        stemmed = [stem_word(t, lang=lang) for t in filtered]
+        variant = stem_word(prefix, lang=lang) + star + rest
+        if variant != pattern and variant not in variants:
+            variants.append(variant)
 
-        for token in stemmed:
-            if token not in seen:
-                seen.add(token)
-                result.append(token)
+    return variants
 
-    return result
+
+def prepare_phrase(phrase: str, languages: set[Language]) -> list[tuple[int, list[str]]]:
+    """
+    Prepare a quoted phrase for exact matching: (offset, stems) for every
+    word indexed in at least one language. Offsets keep the gaps left by
+    stop words, so they line up with index positions.
+    """
+    normalized = normalize_text(phrase)
+    base_tokens = tokenize(normalized)
+    result = []
+
+    for offset, raw_token in enumerate(base_tokens):
+        stems = set()
+        for lang in languages:
+            if raw_token in BLACK_LIST[lang]:
+                continue
+            if raw_token in WHITE_LIST:
+                stems.add(raw_token)
+            else:
+                stems.add(stem_word(raw_token, lang=lang))
+
+        if stems:
+            result.append((offset, sorted(stems)))
+
+    if not result:
+        return []
+
+    first = result[0][0]
+    return [(offset - first, stems) for offset, stems in result]
@@ -0,0 +1,79 @@
+from contextlib import contextmanager
+import json
+from pathlib import Path
+import time
+
+from mnemo_cli.utils.storage import atomic_write
+
+
+
+class Timings:
+    """
+    Time spent per named span. Spans record exclusive time: time spent in
+    a nested span is not counted again in the enclosing one, so the spans
+    of a command add up to at most its total time.
+    """
+
+    def __init__(self):
+        self.spans: dict[str, list] = {}
+        self.profiling = False
+        self._children: list[float] = []
+
+    def reset(self) -> None:
+        self.spans = {}
+        self._children = []
+
+    def add(self, name: str, seconds: float, calls: int = 1) -> None:
+        """Record time measured outside of `span`, e.g. between generator steps."""
+        self._record(name, seconds, calls)
+        if self._children:
+            self._children[-1] += seconds
+
+    def _record(self, name: str, seconds: float, calls: int) -> None:
+        entry = self.spans.get(name)
+        if entry is None:
+            entry = self.spans[name] = [0.0, 0]
+        entry[0] += seconds
+        entry[1] += calls
+
+    @contextmanager
+    def span(self, name: str):
+        self._children.append(0.0)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            children = self._children.pop()
+            self._record(name, elapsed - children, 1)
+            if self._children:
+                self._children[-1] += elapsed
+
+    def snapshot(self) -> dict:
+        return {
+            name: {"seconds": seconds, "calls": calls}
+            for name, (seconds, calls) in self.spans.items()
+        }
+
+
+TIMINGS = Timings()
+
+
+
+def span(name: str):
+    return TIMINGS.span(name)
+
+
+
+def save_timings(path: Path, total: float, **extra) -> None:
+    data = {"total": total, "spans": TIMINGS.snapshot(), **extra}
+    with atomic_write(path, "w", durable=False, encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+
+
+
+def load_timings(path: Path) -> dict | None:
+    if not path.exists():
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -0,0 +1,123 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from mnemo_cli.enums import Scorer
+from mnemo_cli.indexer import average_length, bm25_idf, bm25_norm, bm25_term_score
+
+
+# NumPy scoring path of search_index. Postings of the query tokens become
+# doc number and term frequency arrays, candidate scores are accumulated
+# with bincount and the top of them found with partition. Only candidates
+# that can make the top `limit` get position lists and phrase matching,
+# and their final score comes from the pure Python scorer, so results and
+# ordering match the pure Python path.
+
+# Relative slack for candidates scored close to the cut-off, as NumPy and
+# Python may round float sums differently
+SCORE_TOLERANCE = 1e-9
+
+
+
+def available() -> bool:
+    return np is not None
+
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise RuntimeError(
+            "NumPy is not installed. Install it with `pip install mnemo-cli[numpy]`."
+        )
+
+
+
+def token_arrays(index, tokens: list[str]) -> list[tuple]:
+    """(token, postings, docs, tfs) for every indexed token."""
+    arrays = []
+    for token in tokens:
+        if token not in index:
+            continue
+
+        entries = index.postings(token)
+        docs = np.fromiter((doc for doc, _ in entries), dtype=np.int64, count=len(entries))
+        tfs = np.fromiter((len(p) for _, p in entries), dtype=np.int64, count=len(entries))
+        arrays.append((token, entries, docs, tfs))
+
+    return arrays
+
+
+
+def primary_scores(scorer: Scorer, index, arrays: list, docs, inverse, tfs):
+    """
+    Leading score part of every candidate, without the phrase bonus.
+    For the tuple scorer (coverage, frequency) is packed into one integer.
+    """
+    n = len(docs)
+    if scorer == Scorer.TUPLE:
+        coverage = np.bincount(inverse, minlength=n)
+        frequency = np.bincount(inverse, weights=tfs, minlength=n).astype(np.int64)
+        return coverage * (int(frequency.max()) + 1) + frequency
+
+    doc_count = index.doc_count
+    lengths = np.fromiter(map(index.doc_length, docs.tolist()), dtype=np.float64, count=n)
+    norm = bm25_norm(lengths, average_length(index))
+    idf = np.concatenate([
+        np.full(len(token_docs), bm25_idf(doc_count, len(token_docs)))
+        for _, _, token_docs, _ in arrays
+    ])
+    contrib = bm25_term_score(idf, tfs, norm[inverse])
+    return np.bincount(inverse, weights=contrib, minlength=n)
+
+
+
+def collect_candidates(index, tokens: list[str], scorer: Scorer, limit: int | None):
+    """
+    Find candidate docs of the query tokens and keep those that can reach
+    the top `limit`. Returns ((seq, doc, positions_by_token) in candidate
+    order, total, max_coverage) for indexer.select_top.
+    """
+    require_numpy()
+
+    arrays = token_arrays(index, tokens)
+    if not arrays:
+        return [], 0, 0
+
+    all_docs = np.concatenate([docs for _, _, docs, _ in arrays])
+    all_tfs = np.concatenate([tfs for _, _, _, tfs in arrays])
+    docs, first_seen, inverse = np.unique(all_docs, return_index=True, return_inverse=True)
+
+    total = len(docs)
+    max_coverage = int(np.bincount(inverse, minlength=total).max())
+    if limit is not None and limit <= 0:
+        return [], total, max_coverage
+
+    keep = np.arange(total)
+    if limit is not None and total > limit:
+        primary = primary_scores(scorer, index, arrays, docs, inverse, all_tfs)
+        cutoff = np.partition(primary, total - limit)[total - limit]
+        if primary.dtype.kind == "f":
+            cutoff -= SCORE_TOLERANCE * max(1.0, abs(cutoff))
+        keep = np.flatnonzero(primary >= cutoff)
+
+    # Sequence numbers follow the pure Python path: first appearance
+    # in the postings of the query tokens, in token order
+    keep = keep[np.argsort(first_seen[keep])]
+    kept_docs = docs[keep]
+
+    positions = [{} for _ in range(len(keep))]
+    for token, entries, token_docs, _ in arrays:
+        found = np.searchsorted(token_docs, kept_docs)
+        found[found == len(token_docs)] = 0
+        for i in np.flatnonzero(token_docs[found] == kept_docs).tolist():
+            positions[i][token] = entries[found[i]][1]
+
+    candidates = [
+        (seq, doc, positions_by_token)
+        for seq, doc, positions_by_token in zip(
+            first_seen[keep].tolist(), kept_docs.tolist(), positions
+        )
+    ]
+
+    return candidates, total, max_coverage
@@ -0,0 +1,203 @@
+from datetime import datetime, timezone
+from pathlib import Path
+import time
+
+from mnemo_cli.enums import Source
+from mnemo_cli.pipeline import rebuild_index
+from mnemo_cli.sources import BEAR_DB_PATH, BEAR_NOTES_WHERE, connect_bear, core_data_timestamp
+from mnemo_cli.utils.config import load_config
+from mnemo_cli.utils.storage import find_project_root
+
+
+# Watch mode polls the sources and applies their changes incrementally.
+#
+# Bear keeps notes in a SQLite database. Its file (and write-ahead log)
+# modification time is checked on every poll, and only when it changed
+# are the notes queried for a fingerprint, so Bear's frequent writes of
+# unrelated state do not trigger updates. Apple Notes has no cheap change
+# signal and is re-exported on a longer interval.
+#
+# Changes are debounced: Bear saves while a note is being typed, so its
+# update runs once the database has been quiet for `debounce` seconds.
+# Each update re-exports only the due sources, see rebuild_index.
+
+POLL_INTERVAL = 2.0
+DEBOUNCE = 5.0
+APPLE_INTERVAL = 300.0
+
+
+
+def file_version(path: Path) -> tuple:
+    """Modification time and size of a SQLite database and its WAL file."""
+    version = []
+    for file in (path, path.with_name(path.name + "-wal")):
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            version.append(None)
+            continue
+        version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+
+def query_bear(db_path: Path, sql: str, params=()) -> tuple:
+    conn = connect_bear(db_path)
+    try:
+        return conn.execute(sql, params).fetchone()
+    finally:
+        conn.close()
+
+
+
+def bear_fingerprint(db_path: Path) -> tuple:
+    """
+    Count and sum of modification times of the exported notes: an edit,
+    also one synced late with an older time, a new, trashed or deleted
+    note changes it.
+    """
+    return query_bear(
+        db_path,
+        "SELECT count(*), total(ZMODIFICATIONDATE) "
+        f"FROM ZSFNOTE WHERE {BEAR_NOTES_WHERE}",
+    )
+
+
+
+def bear_modified_since(db_path: Path, since: datetime) -> bool:
+    return query_bear(
+        db_path,
+        "SELECT count(*) FROM ZSFNOTE WHERE ZMODIFICATIONDATE > ?",
+        (core_data_timestamp(since),),
+    )[0] > 0
+
+
+
+class Watcher:
+    """
+    Change detection for the sources of a project. poll() returns the
+    sources due for an update, updated() records that it ran. Times are
+    time.monotonic() seconds.
+    """
+
+    def __init__(
+            self,
+            sources: set[Source],
+            indexed_at: dict[Source, datetime],
+            *,
+            now: float,
+            bear_db_path: Path = BEAR_DB_PATH,
+            debounce: float = DEBOUNCE,
+            apple_interval: float = APPLE_INTERVAL,
+            ):
+        self.sources = sources
+        self.indexed_at = indexed_at
+        self.bear_db_path = Path(bear_db_path)
+        self.debounce = debounce
+        self.apple_interval = apple_interval
+
+        self._file_version = None
+        self._fingerprint = None
+        self._changed_at = None
+
+        self._apple_due = now
+        if Source.APPLE in indexed_at:
+            age = (datetime.now(timezone.utc) - indexed_at[Source.APPLE]).total_seconds()
+            self._apple_due += max(apple_interval - age, 0)
+
+    def poll(self, now: float) -> set[Source]:
+        due = set()
+        if Source.BEAR in self.sources and self._bear_changed():
+            self._changed_at = now
+        if self._changed_at is not None and now - self._changed_at >= self.debounce:
+            due.add(Source.BEAR)
+        if Source.APPLE in self.sources and now >= self._apple_due:
+            due.add(Source.APPLE)
+        return due
+
+    def updated(self, sources: set[Source], now: float, *, failed: bool = False) -> None:
+        """Record an update of `sources`. A failed Bear update is retried after the debounce delay."""
+        if Source.BEAR in sources:
+            self._changed_at = now if failed else None
+        if Source.APPLE in sources:
+            self._apple_due = now + self.apple_interval
+
+    def _bear_changed(self) -> bool:
+        if not self.bear_db_path.exists():
+            return False
+
+        version = file_version(self.bear_db_path)
+        if version == self._file_version:
+            return False
+        self._file_version = version
+
+        fingerprint = bear_fingerprint(self.bear_db_path)
+        if self._fingerprint is None:
+            # First poll: compare against the last indexed state instead
+            self._fingerprint = fingerprint
+            since = self.indexed_at.get(Source.BEAR)
+            return since is None or bear_modified_since(self.bear_db_path, since)
+
+        changed = fingerprint != self._fingerprint
+        self._fingerprint = fingerprint
+        return changed
+
+
+
+def watch(
+        *,
+        interval: float = POLL_INTERVAL,
+        debounce: float = DEBOUNCE,
+        apple_interval: float = APPLE_INTERVAL,
+        progress=None,
+        ) -> None:
+    """
+    Poll the project sources every `interval` seconds and update the index
+    incrementally when they change, until interrupted. Every update is
+    reported as a watch:update progress event, and every source that failed
+    to export as a watch:error event; it is retried later.
+    """
+    config = load_config(find_project_root())
+    watcher = Watcher(
+        config["sources"],
+        config["indexed_at"],
+        now=time.monotonic(),
+        debounce=debounce,
+        apple_interval=apple_interval,
+    )
+
+    errors = {}
+
+    def report(event: str, **info):
+        if event == "export:source" and info["error"] is not None:
+            errors[info["source"]] = info["error"]
+        if progress:
+            progress(event, **info)
+
+    while True:
+        due = watcher.poll(time.monotonic())
+        if due:
+            started = time.perf_counter()
+            errors.clear()
+            failed_sources = set()
+            try:
+                rebuild_index(report, incremental=True, sources=due, failed_sources=failed_sources)
+            except Exception as e:
+                failed_sources = {source.value for source in due}
+                errors.update(dict.fromkeys(failed_sources, str(e)))
+
+            # Sources that failed to export are retried, their notes were kept
+            failed = {source for source in due if source.value in failed_sources}
+            watcher.updated(due - failed, time.monotonic())
+            watcher.updated(failed, time.monotonic(), failed=True)
+            if progress:
+                for name in sorted(failed_sources):
+                    progress("watch:error", source=name, error=errors.get(name, "export failed"))
+                if due - failed:
+                    progress(
+                        "watch:update",
+                        sources=sorted(source.value for source in due - failed),
+                        seconds=time.perf_counter() - started,
+                    )
+
+        time.sleep(interval)
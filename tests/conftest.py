@@ -0,0 +1,59 @@
+import sqlite3
+
+import pytest
+
+
+class BearDatabase:
+    """Local SQLite database with the columns of Bear's note table."""
+
+    def __init__(self, path):
+        self.path = path
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE ZSFNOTE (
+                    Z_PK INTEGER PRIMARY KEY,
+                    ZUNIQUEIDENTIFIER VARCHAR,
+                    ZTITLE VARCHAR,
+                    ZTEXT VARCHAR,
+                    ZCREATIONDATE TIMESTAMP,
+                    ZMODIFICATIONDATE TIMESTAMP,
+                    ZTRASHED INTEGER DEFAULT 0,
+                    ZPERMANENTLYDELETED INTEGER DEFAULT 0
+                )
+            """)
+        conn.close()
+
+    def connect(self):
+        return sqlite3.connect(self.path)
+
+    def add(self, uid, title, text, modified, *, created=None):
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT INTO ZSFNOTE (ZUNIQUEIDENTIFIER, ZTITLE, ZTEXT, ZCREATIONDATE, ZMODIFICATIONDATE) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (uid, title, text, modified if created is None else created, modified),
+            )
+        conn.close()
+
+    def update(self, uid, text, modified):
+        with self.connect() as conn:
+            conn.execute(
+                "UPDATE ZSFNOTE SET ZTEXT = ?, ZMODIFICATIONDATE = ? WHERE ZUNIQUEIDENTIFIER = ?",
+                (text, modified, uid),
+            )
+        conn.close()
+
+    def trash(self, uid):
+        with self.connect() as conn:
+            conn.execute("UPDATE ZSFNOTE SET ZTRASHED = 1 WHERE ZUNIQUEIDENTIFIER = ?", (uid,))
+        conn.close()
+
+    def delete(self, uid):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM ZSFNOTE WHERE ZUNIQUEIDENTIFIER = ?", (uid,))
+        conn.close()
+
+
+@pytest.fixture
+def bear_db(tmp_path):
+    return BearDatabase(tmp_path / "database.sqlite")
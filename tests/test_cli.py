@@ -32,10 +32,12 @@ def mock_pipeline():
             project_root=Path.cwd(),
         )
         m_notes.return_value = [{"title": "foo"}, {"title": "bar"}]
-        m_search.return_value = [
-            {"note": {"title": "hit1", "source": "apple", "id": "123"}, "score": 0.9}
-        ]
-        m_last.return_value = m_search.return_value
+        m_search.return_value = (
+            [{"note": {"title": "hit1", "source": "apple", "id": "123"}, "score": 0.9}],
+            1,
+            {},
+        )
+        m_last.return_value = [("123", "apple", 0.9)]
 
         yield Mock(
             init=m_init,
@@ -54,7 +56,7 @@ def test_help():
 
 
 def test_init_creates_new_index(mock_pipeline):
-    with patch("mnemo_cli.cli.questionary.checkbox") as q_chk:
+    with patch("questionary.checkbox") as q_chk:
         q_chk.return_value.ask.side_effect = [["apple"], ["en"]]
 
         result = runner.invoke(app, ["init"])
@@ -65,7 +67,7 @@ def test_init_creates_new_index(mock_pipeline):
 
 def test_init_rebuild_if_dir_exists(mock_pipeline):
     Path(".mnemo").mkdir()
-    with patch("mnemo_cli.cli.questionary.select") as q_sel:
+    with patch("questionary.select") as q_sel:
         q_sel.return_value.ask.return_value = "rebuild"
 
         result = runner.invoke(app, ["init"])
@@ -88,7 +90,7 @@ def test_search_command(mock_pipeline):
 
 
 def test_open_apple_note(mock_pipeline):
-    with patch("mnemo_cli.cli.subprocess.run") as sub_run:
+    with patch("subprocess.run") as sub_run:
         result = runner.invoke(app, ["open", "1"])
         assert result.exit_code == 0
         sub_run.assert_called_once()
@@ -96,9 +98,7 @@ def test_open_apple_note(mock_pipeline):
 
 
 def test_open_bear_note(mock_pipeline):
-    mock_pipeline.last.return_value = [
-        {"note": {"title": "bear", "source": "bear", "id": "xyz"}}
-    ]
+    mock_pipeline.last.return_value = [("xyz", "bear", 0.5)]
     with patch("mnemo_cli.cli.typer.launch") as launch:
         result = runner.invoke(app, ["open", "1"])
         assert result.exit_code == 0
@@ -116,3 +116,11 @@ def test_stats_command(mock_pipeline):
     result = runner.invoke(app, ["stats"])
     assert result.exit_code == 0
     assert "42 notes" in result.output
+
+
+def test_search_batch_rejects_query_arguments(mock_pipeline):
+    with patch("mnemo_cli.cli.ensure_initialized"), patch("mnemo_cli.cli.run_batch") as run_batch:
+        result = runner.invoke(app, ["search", "--batch", "-", "foo"])
+    assert result.exit_code == 1
+    assert "not both" in result.output
+    assert not run_batch.called
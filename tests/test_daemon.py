@@ -0,0 +1,78 @@
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from mnemo_cli import daemon, pipeline
+from mnemo_cli.enums import Language, Source
+from mnemo_cli.segment import SEGMENT_FILE, write_segment
+from mnemo_cli.utils.config import save_config
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    data_dir = tmp_path / ".mnemo" / "data"
+    data_dir.mkdir(parents=True)
+    save_config(tmp_path, sources={Source.APPLE}, languages={Language.EN})
+    notes = pipeline.process_notes(
+        [
+            {
+                "id": "n1",
+                "source": "apple",
+                "title": "Python",
+                "body": "ai notes",
+                "created": "2025-01-01 12:00:00",
+                "modified": "2025-01-01 12:00:00",
+            },
+        ],
+        {Language.EN},
+    )
+    write_segment(data_dir / SEGMENT_FILE, pipeline.build_index(notes), notes)
+    return tmp_path
+
+
+@pytest.fixture
+def server(project):
+    server = daemon.DaemonServer(project)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05})
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+    server.state.close()
+
+
+def test_daemon_search_and_last_search(project, server):
+    results, total, corrections = daemon.request(project, "search", query="python", limit=5)
+    assert total == 1
+    assert corrections == {}
+    assert results[0]["note"]["id"] == "n1"
+
+    last = daemon.request(project, "last_search")
+    assert last == [("n1", "apple", results[0]["score"])]
+
+
+def test_daemon_stats(project, server):
+    stats = daemon.request(project, "stats")
+    assert stats["notes_count"] == 1
+    assert stats["sources"] == ["apple"]
+
+
+def test_daemon_unknown_command(project, server):
+    with pytest.raises(RuntimeError, match="Unknown command"):
+        daemon.request(project, "nope")
+
+
+def test_call_uses_daemon_when_running(project, server):
+    fallback = Mock()
+    results, total, _ = daemon.call("search", fallback, query="ai", limit=1)
+    assert total == 1
+    assert not fallback.called
+
+
+def test_call_falls_back_without_daemon(project):
+    fallback = Mock(return_value="direct")
+    assert not daemon.is_running(project)
+    assert daemon.call("stats", fallback) == "direct"
@@ -0,0 +1,48 @@
+from mnemo_cli import fuzzy
+from mnemo_cli.postings import CompactIndex
+
+
+def make_index(*terms):
+    index = CompactIndex()
+    index.add_documents(
+        (f"n{i}", [(term, 0)]) for i, term in enumerate(terms)
+    )
+    return index
+
+
+def test_max_edits():
+    assert fuzzy.max_edits("go") == 0
+    assert fuzzy.max_edits("pyth") == 1
+    assert fuzzy.max_edits("kubernet") == 2
+
+
+def test_trigrams():
+    assert fuzzy.trigrams("ai") == {"$$a", "$ai", "ai$", "i$$"}
+
+
+def test_edit_distance():
+    assert fuzzy.edit_distance("python", "python", 2) == 0
+    assert fuzzy.edit_distance("pyhton", "python", 2) == 2
+    assert fuzzy.edit_distance("pythn", "python", 1) == 1
+    assert fuzzy.edit_distance("docker", "python", 2) == 3
+    assert fuzzy.edit_distance("py", "python", 2) == 3
+
+
+def test_build_gram_index():
+    grams = fuzzy.build_gram_index(["ai", "data"])
+    assert grams["$$a"] == [0]
+    assert grams["ta$"] == [1]
+    assert "$$d" in grams
+
+
+def test_correct_term():
+    index = make_index("python", "pytest", "docker", "data")
+    assert fuzzy.correct_term(index, "pyhton") == "python"
+    assert fuzzy.correct_term(index, "dockr") == "docker"
+    assert fuzzy.correct_term(index, "rust") is None
+    assert fuzzy.correct_term(index, "dt") is None
+
+
+def test_correct_term_prefers_frequent_terms():
+    index = make_index("cart", "card", "card")
+    assert fuzzy.correct_term(index, "carx") == "card"
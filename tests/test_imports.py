@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+
+# Modules a command only needs when it actually runs; importing the CLI
+# must not pull them in
+LAZY_MODULES = {
+    "questionary",
+    "prompt_toolkit",
+    "snowballstemmer",
+    "rich.progress",
+    "concurrent.futures.process",
+    "sqlite3",
+    "numpy",
+    "cProfile",
+}
+
+
+def imported_modules(statement: str) -> set[str]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+    return modules
+
+
+def test_cli_import_is_lazy():
+    modules = imported_modules("import mnemo_cli.cli")
+    assert "mnemo_cli.cli" in modules
+    assert not modules & LAZY_MODULES
+
+
+def test_stemmers_load_on_first_use():
+    modules = imported_modules(
+        "from mnemo_cli.utils import text; "
+        "from mnemo_cli.enums import Language; "
+        "text.stem_word('running', lang=Language.EN)"
+    )
+    assert "snowballstemmer" in modules
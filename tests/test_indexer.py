@@ -4,6 +4,7 @@ import pytest
 
 from mnemo_cli import indexer
 from mnemo_cli.enums import Language
+from mnemo_cli.utils import text
 
 
 @pytest.fixture
@@ -29,8 +30,8 @@ def test_build_index(notes):
     assert "python" in idx
     assert "ai" in idx
     assert "data" in idx
-    assert idx["python"]["n1"] == [0]
-    assert idx["python"]["n2"] == [0]
+    assert idx.postings("python") == [(0, [0]), (1, [0])]
+    assert idx.doc_id(1) == "n2"
 
 
 @patch("mnemo_cli.indexer.prepare_for_search")
@@ -39,7 +40,7 @@ def test_search_index_empty_query(prep):
     res = indexer.search_index(
         query="", index={}, notes={}, languages={Language.EN}
     )
-    assert res == []
+    assert res == ([], 0, {})
 
 
 @patch("mnemo_cli.indexer.prepare_for_search")
@@ -48,16 +49,17 @@ def test_search_index_no_match(prep):
     res = indexer.search_index(
         query="rust", index={"python": {}}, notes={}, languages={Language.EN}
     )
-    assert res == []
+    assert res == ([], 0, {})
 
 
 @patch("mnemo_cli.indexer.prepare_for_search")
 def test_search_index_single_token(prep, notes):
     idx = indexer.build_index(notes)
     prep.return_value = ["python"]
-    res = indexer.search_index(
+    res, total, _ = indexer.search_index(
         query="python", index=idx, notes={n["id"]: n for n in notes}, languages={Language.EN}
     )
+    assert total == 2
     assert len(res) == 2
     assert res[0]["note"]["id"] in ("n1", "n2")
     assert all("python" in r["matched_tokens"] for r in res)
@@ -67,7 +69,7 @@ def test_search_index_single_token(prep, notes):
 def test_search_index_phrase_bonus(prep, notes):
     idx = indexer.build_index(notes)
     prep.return_value = ["python", "ai"]
-    res = indexer.search_index(
+    res, _, _ = indexer.search_index(
         query="python ai", index=idx, notes={n["id"]: n for n in notes}, languages={Language.EN}
     )
     n1 = next(r for r in res if r["note"]["id"] == "n1")
@@ -75,3 +77,185 @@ def test_search_index_phrase_bonus(prep, notes):
     assert n1["phrase_matches"]
     assert not n2["phrase_matches"]
     assert n1["score"] > n2["score"]
+
+
+@patch("mnemo_cli.indexer.prepare_for_search")
+def test_search_index_limit(prep, notes):
+    idx = indexer.build_index(notes)
+    prep.return_value = ["python", "ai"]
+    res, total, _ = indexer.search_index(
+        query="python ai", index=idx, notes={n["id"]: n for n in notes},
+        languages={Language.EN}, limit=1
+    )
+    assert total == 2
+    assert [r["note"]["id"] for r in res] == ["n1"]
+
+
+def test_max_phrase_bonus():
+    positions = {"python": [0, 4, 9], "ai": [1, 5]}
+    assert indexer.max_phrase_bonus(["python", "ai"], positions) == 2
+    assert indexer.max_phrase_bonus(["python", "data"], positions) == 0
+
+
+@patch("mnemo_cli.indexer.prepare_for_search")
+def test_search_index_skips_candidates_that_cannot_win(prep):
+    notes = [
+        {"id": "n1", "tokens": [("python", 0), ("ai", 1), ("python", 2), ("ai", 3)]},
+        {"id": "n2", "tokens": [("python", 0)]},
+        {"id": "n3", "tokens": [("ai", 0)]},
+    ]
+    idx = indexer.build_index(notes)
+    prep.return_value = ["python", "ai"]
+    with patch(
+        "mnemo_cli.indexer.find_phrase_matches",
+        wraps=indexer.find_phrase_matches
+    ) as find:
+        res, total, _ = indexer.search_index(
+            query="python ai", index=idx, notes={n["id"]: n for n in notes},
+            languages={Language.EN}, limit=1, scorer="tuple"
+        )
+    assert total == 3
+    assert [r["note"]["id"] for r in res] == ["n1"]
+    assert res[0]["score"] == (2, 4, 2)
+    assert find.call_count == 1
+
+
+@patch("mnemo_cli.indexer.prepare_for_search")
+def test_search_index_bm25_prefers_short_focused_notes(prep):
+    long_tokens = [("python", i) for i in range(0, 20, 2)]
+    long_tokens += [(f"filler{i}", i) for i in range(1, 200, 2)]
+    notes = [
+        {"id": "long", "tokens": long_tokens},
+        {"id": "short", "tokens": [("python", 0), ("tip", 1)]},
+    ] + [
+        {"id": f"other{i}", "tokens": [("python", 0), ("other", 1)]}
+        for i in range(3)
+    ]
+    idx = indexer.build_index(notes)
+    prep.return_value = ["python", "tip"]
+
+    bm25, _, _ = indexer.search_index(
+        query="python tip", index=idx, notes={n["id"]: n for n in notes},
+        languages={Language.EN}, limit=2
+    )
+    by_tuple, _, _ = indexer.search_index(
+        query="python tip", index=idx, notes={n["id"]: n for n in notes},
+        languages={Language.EN}, limit=2, scorer="tuple"
+    )
+
+    assert [r["note"]["id"] for r in bm25] == ["short", "other0"]
+    assert [r["note"]["id"] for r in by_tuple] == ["short", "long"]
+    assert isinstance(bm25[0]["score"][0], float)
+
+
+def test_build_index_ranking_stats(notes):
+    idx = indexer.build_index(notes)
+    assert idx.doc_lengths == [2, 2]
+    assert idx.total_length == 4
+    assert idx.doc_count == 2
+    assert idx.doc_frequency("python") == 2
+    assert idx.doc_frequency("rust") == 0
+
+
+def test_shift_intersect():
+    assert indexer.shift_intersect([0, 4, 9, 20], [1, 5, 6, 21], 1) == [0, 4, 20]
+    assert indexer.shift_intersect([3], [], 1) == []
+
+
+def test_find_phrase_runs():
+    positions = {"kube": [0, 7, 12], "config": [1, 13], "file": [3, 15]}
+    phrase = [(0, ["kube"]), (1, ["config"]), (3, ["file"])]
+    assert indexer.find_phrase_runs(phrase, positions) == [0, 12]
+    assert indexer.find_phrase_runs([(0, ["kube"]), (1, ["rust"])], positions) == []
+
+
+def test_search_index_quoted_phrase():
+    notes = [
+        {"id": "n1", "tokens": text.prepare_for_index("edit the kube config file", {Language.EN})},
+        {"id": "n2", "tokens": text.prepare_for_index("config for kube file", {Language.EN})},
+    ]
+    idx = indexer.build_index(notes)
+    res, total, _ = indexer.search_index(
+        query='"kube config file"', index=idx, notes={n["id"]: n for n in notes},
+        languages={Language.EN}
+    )
+    assert total == 1
+    assert res[0]["note"]["id"] == "n1"
+    assert {"tokens": ("kube", "config", "file"), "position": 2} in res[0]["phrase_matches"]
+
+
+def test_expand_wildcard():
+    notes = [
+        {"id": "n1", "tokens": [("kube", 0), ("kubernet", 1), ("kubectl", 2), ("docker", 3)]},
+    ]
+    idx = indexer.build_index(notes)
+    assert indexer.expand_wildcard(idx, "kube*") == ["kube", "kubectl", "kubernet"]
+    assert indexer.expand_wildcard(idx, "kube*t") == ["kubernet"]
+    assert indexer.expand_wildcard(idx, "kube*", limit=2) == ["kube", "kubectl"]
+    assert indexer.expand_wildcard(idx, "*ker") == []
+
+
+def test_expand_wildcard_stems_long_prefixes():
+    languages = {Language.EN}
+    note = {"id": "n1", "tokens": text.prepare_for_index("Kubernetes meeting notes", languages)}
+    idx = indexer.build_index([note])
+
+    assert indexer.expand_wildcard(idx, "kubernetes*", languages=languages) == ["kubernet"]
+    assert indexer.expand_wildcard(idx, "meetings*", languages=languages) == ["meet"]
+    assert indexer.expand_wildcard(idx, "notes*", languages=languages) == ["note"]
+    assert indexer.expand_wildcard(idx, "notes*") == []
+
+
+def test_search_index_wildcard():
+    notes = [
+        {"id": "n1", "tokens": text.prepare_for_index("kubectl apply and kubernetes pods", {Language.EN})},
+        {"id": "n2", "tokens": text.prepare_for_index("docker pods", {Language.EN})},
+        {"id": "n3", "tokens": text.prepare_for_index("kube config", {Language.EN})},
+    ]
+    idx = indexer.build_index(notes)
+    res, total, _ = indexer.search_index(
+        query="Kube* pods", index=idx, notes={n["id"]: n for n in notes},
+        languages={Language.EN}
+    )
+    assert total == 3
+    assert res[0]["note"]["id"] == "n1"
+    assert res[0]["matched_tokens"] == ["pod", "kube*"]
+    assert res[0]["positions"] == [0, 3, 4]
+
+
+def test_search_index_fuzzy(notes):
+    idx = indexer.build_index(notes)
+    kwargs = dict(index=idx, notes={n["id"]: n for n in notes}, languages={Language.EN})
+
+    res, total, _ = indexer.search_index(query="pyhton", **kwargs)
+    assert total == 0
+
+    res, total, corrections = indexer.search_index(query="pyhton ai", fuzzy=True, **kwargs)
+    assert total == 2
+    assert res[0]["note"]["id"] == "n1"
+    assert corrections == {"pyhton": "python"}
+    assert res[0]["matched_tokens"] == ["pyhton", "ai"]
+
+
+def test_search_index_fuzzy_corrections_by_typed_word():
+    languages = {Language.EN, Language.ES}
+    note = {"id": "n1", "title": "Kubernetes", "body": "cluster"}
+    note["tokens"] = text.prepare_for_index("Kubernetes cluster", languages)
+    idx = indexer.build_index([note])
+
+    _, total, corrections = indexer.search_index(
+        query="kubernetis", index=idx, notes={"n1": note}, languages=languages, fuzzy=True
+    )
+
+    assert total == 1
+    assert corrections == {"kubernetis": "kubernet"}
+
+
+def test_remove_from_index(notes):
+    idx = indexer.build_index(notes)
+    indexer.remove_from_index(idx, ["n1"])
+    assert "ai" not in idx
+    assert idx.postings("python") == [(1, [0])]
+    assert "n1" not in idx.doc_numbers
+    assert idx.doc_lengths == [0, 2]
+    assert idx.total_length == 2
@@ -1,12 +1,19 @@
 import datetime as dt
 from pathlib import Path
 import re
+import threading
 from unittest.mock import Mock, patch
 
 import pytest
 
 from mnemo_cli import pipeline
-from mnemo_cli.enums import Language, Source
+from mnemo_cli.enums import Backend, Language, Source
+from mnemo_cli.migrate import migrate_data_dir
+from mnemo_cli.segment import Segment
+from mnemo_cli.utils.storage import load_pickle, save_pickle
+from mnemo_cli.utils import text
+from mnemo_cli.utils.text import StemCache
+from mnemo_cli.utils.timing import load_timings
 
 
 @pytest.fixture(autouse=True)
@@ -43,11 +50,19 @@ def mock_deps():
          patch("mnemo_cli.pipeline.build_index") as m_build_idx, \
          patch("mnemo_cli.pipeline.save_pickle") as m_save, \
          patch("mnemo_cli.pipeline.load_pickle") as m_load, \
+         patch("mnemo_cli.pipeline.write_segment") as m_write_seg, \
+         patch("mnemo_cli.pipeline.Segment") as m_segment, \
          patch("mnemo_cli.pipeline.save_config") as m_save_cfg, \
          patch("mnemo_cli.pipeline.load_config") as m_load_cfg, \
          patch("mnemo_cli.pipeline.find_project_root") as m_root:
 
         m_root.return_value = Path.cwd()
+        m_load_cfg.return_value = {
+            "sources": {Source.APPLE},
+            "languages": {Language.EN},
+            "backend": Backend.SEGMENT,
+            "indexed_at": {},
+        }
         m_build_idx.return_value = {"fake": "index"}
         m_export.return_value = []
 
@@ -56,6 +71,8 @@ def mock_deps():
             build_index=m_build_idx,
             save_pickle=m_save,
             load_pickle=m_load,
+            write_segment=m_write_seg,
+            segment=m_segment.return_value.__enter__.return_value,
             save_config=m_save_cfg,
             load_config=m_load_cfg,
             root=m_root,
@@ -64,17 +81,41 @@ def mock_deps():
 
 def test_export_all_notes(mock_deps):
     mock_deps.export.return_value = [{"id": "a"}]
-    notes = pipeline.export_all_notes({Source.APPLE, Source.BEAR})
+    notes = list(pipeline.export_all_notes({Source.APPLE, Source.BEAR}))
     assert len(notes) == 2
     assert all(n["source"] in ("apple", "bear") for n in notes)
 
 
+def test_export_all_notes_reports_sources_and_failures(mock_deps):
+    def export(source, since=None):
+        if source == Source.BEAR:
+            raise RuntimeError("database is locked")
+        return [{"id": "a"}, {"id": "b"}]
+
+    mock_deps.export.side_effect = export
+    progress = Mock()
+    failed = set()
+
+    notes = list(pipeline.export_all_notes({Source.APPLE, Source.BEAR}, progress, failed))
+
+    assert [n["id"] for n in notes] == ["a", "b"]
+    assert failed == {"bear"}
+    events = {
+        call.kwargs["source"]: call.kwargs
+        for call in progress.call_args_list
+        if call.args == ("export:source",)
+    }
+    assert events["apple"]["notes"] == 2 and events["apple"]["error"] is None
+    assert events["bear"]["error"] == "database is locked"
+
+
 def test_process_notes(fake_notes):
     processed = pipeline.process_notes(
         fake_notes, languages={Language.EN}
     )
     assert len(processed) == 2
     assert processed[0]["tokens"]
+    assert len(processed[0]["offsets"]) == 4 * 2
     assert isinstance(processed[0]["created"], dt.datetime)
 
 
@@ -86,11 +127,14 @@ def test_init_mnemo_creates_dirs_and_calls_pipeline(mock_deps, fake_notes):
         sources={Source.APPLE}, languages={Language.EN}, progress=progress
     )
 
-    assert Path(".mnemo/data").exists()
+    assert Path(".mnemo/data/generations/1/index.seg").exists()
     assert mock_deps.save_config.called
-    assert mock_deps.build_index.called
-    assert mock_deps.save_pickle.call_count == 2
-    assert progress.call_count == 6
+    assert mock_deps.save_pickle.call_args.args[1].name == "stem_cache.pkl"
+    events = [c.args[0] for c in progress.call_args_list]
+    assert events == [
+        "export:start", "export:source", "export:done", "process:start", "process:chunk",
+        "process:done", "index:start", "index:done",
+    ]
 
 
 def test_init_mnemo_fails_if_already_exists():
@@ -107,9 +151,27 @@ def test_rebuild_index_workflow(mock_deps, fake_notes):
 
     pipeline.rebuild_index(progress=progress)
 
-    assert mock_deps.build_index.called
-    assert mock_deps.save_pickle.call_count == 2
-    assert progress.call_count == 6
+    assert Path(".mnemo/data/generations/1/index.seg").exists()
+    assert not mock_deps.write_segment.called
+    assert mock_deps.save_pickle.call_args.args[1].name == "stem_cache.pkl"
+    assert progress.call_count == 8
+    timings = load_timings(Path(".mnemo/data/rebuild_timings.json"))
+    assert {"export", "process", "index", "save"} <= set(timings["spans"])
+    assert timings["total"] >= sum(s["seconds"] for s in timings["spans"].values())
+
+
+def test_rebuild_index_keeps_index_when_export_fails(mock_deps, fake_notes):
+    data_dir = Path(".mnemo/data")
+    data_dir.mkdir(parents=True)
+    mock_deps.export.return_value = fake_notes
+    pipeline.rebuild_index()
+    mock_deps.export.side_effect = RuntimeError("AppleScript timed out")
+
+    with pytest.raises(RuntimeError, match="Exporting apple notes failed"):
+        pipeline.rebuild_index()
+
+    assert pipeline.index_path(data_dir, Backend.SEGMENT) == data_dir / "generations/1/index.seg"
+    assert not (data_dir / "generations/2").exists()
 
 
 def test_rebuild_index_fails_without_mnemo_dir():
@@ -120,19 +182,18 @@ def test_rebuild_index_fails_without_mnemo_dir():
 def test_search_notes(mock_deps):
     Path(".mnemo").mkdir()
     Path(".mnemo/data").mkdir()
-    fake_index = {"token": {"n1": [0]}}
-    fake_notes = [{"id": "n1", "title": "Hit"}]
-    mock_deps.load_pickle.side_effect = (
-        fake_index,
-        fake_notes,
-    )
     with patch("mnemo_cli.pipeline.search_index") as m_search:
-        m_search.return_value = [{"note": {"id": "n1"}, "score": 0.9}]
-        results = pipeline.search_notes("query")
+        m_search.return_value = ([{"note": {"id": "n1", "source": "apple"}, "score": 0.9}], 3, {})
+        results, total, corrections = pipeline.search_notes("query", limit=1)
 
     assert len(results) == 1
+    assert total == 3
+    assert corrections == {}
     assert results[0]["note"]["id"] == "n1"
     m_search.assert_called_once()
+    assert m_search.call_args.kwargs["index"] is mock_deps.segment
+    assert m_search.call_args.kwargs["limit"] == 1
+    assert load_pickle(Path(".mnemo/data/last_search.pkl")) == [("n1", "apple", 0.9)]
 
 
 def test_get_last_search_empty_if_no_file():
@@ -140,6 +201,17 @@ def test_get_last_search_empty_if_no_file():
         assert pipeline.get_last_search() == []
 
 
+def test_get_last_search_note_resolves_from_segment(mock_deps):
+    data_dir = Path(".mnemo/data")
+    data_dir.mkdir(parents=True)
+    save_pickle([{"note": {"id": "n2", "source": "bear"}, "score": (1, 0)}], data_dir / "last_search.pkl")
+    mock_deps.segment.notes = {"n2": {"id": "n2", "title": "Second"}}
+
+    assert pipeline.get_last_search() == [("n2", "bear", (1, 0))]
+    assert pipeline.get_last_search_note(1)["title"] == "Second"
+    assert pipeline.get_last_search_note(2) is None
+
+
 
 def test_get_stats(mock_deps):
     Path(".mnemo").mkdir()
@@ -147,19 +219,20 @@ def test_get_stats(mock_deps):
     fake_cfg = {
         "sources": {Source.APPLE},
         "languages": {Language.EN},
+        "backend": Backend.SEGMENT,
         "created_at": "2025-01-01",
         "last_indexed_at": "2025-01-02",
     }
-    fake_notes = [{"id": "n1"}, {"id": "n2"}]
-    fake_index = {"token1": 1, "token2": 2}
     mock_deps.load_config.return_value = fake_cfg
-    mock_deps.load_pickle.side_effect = (fake_notes, fake_index)
+    mock_deps.segment.notes = {"n1": {}, "n2": {}}
+    mock_deps.segment.__len__.return_value = 2
 
     stats = pipeline.get_stats()
 
     assert stats["notes_count"] == 2
     assert stats["unique_tokens"] == 2
     assert stats["sources"] == ["apple"]
+    assert stats["backend"] == "segment"
     assert stats["languages"] == ["en"]
 
 
@@ -167,5 +240,308 @@ def test_get_notes(mock_deps):
     Path(".mnemo").mkdir()
     Path(".mnemo/data").mkdir()
     fake_notes = [{"id": "n1"}]
-    mock_deps.load_pickle.return_value = fake_notes
+    mock_deps.segment.iter_notes.return_value = iter(fake_notes)
     assert pipeline.get_notes() == fake_notes
+
+
+def test_diff_notes(fake_notes):
+    stored = pipeline.process_notes(fake_notes, languages={Language.EN})
+    exported = [
+        dict(fake_notes[0]),
+        dict(fake_notes[1], modified="2025-02-01 12:00:00"),
+        dict(fake_notes[0], id="n3"),
+    ]
+    stored.append(dict(stored[0], id="n4"))
+
+    added, updated, deleted = pipeline.diff_notes(stored, exported)
+
+    assert [n["id"] for n in added] == ["n3"]
+    assert [n["id"] for n in updated] == ["n2"]
+    assert deleted == ["n4"]
+
+    _, _, deleted = pipeline.diff_notes(stored, exported, {"apple"})
+    assert deleted == []
+
+
+def test_diff_notes_delta_export(fake_notes):
+    stored = pipeline.process_notes(fake_notes, languages={Language.EN})
+    stored.append(dict(stored[1], id="n3"))
+    exported = [
+        {"id": "n1", "modified": fake_notes[0]["modified"], "unchanged": True},
+        dict(fake_notes[1], modified=1738411200.5),
+    ]
+
+    added, updated, deleted = pipeline.diff_notes(stored, exported)
+
+    assert added == []
+    assert [n["id"] for n in updated] == ["n2"]
+    assert deleted == ["n3"]
+
+
+def test_diff_notes_fetches_unchanged_notes_not_stored(fake_notes):
+    stored = pipeline.process_notes(fake_notes[:1], languages={Language.EN})
+    exported = [
+        {"id": "n1", "source": "apple", "modified": fake_notes[0]["modified"], "unchanged": True},
+        {"id": "n2", "source": "bear", "modified": fake_notes[1]["modified"], "unchanged": True},
+    ]
+
+    with patch("mnemo_cli.pipeline.export_notes_by_id", return_value=[dict(fake_notes[1])]) as m_fetch:
+        added, updated, deleted = pipeline.diff_notes(stored, exported)
+
+    m_fetch.assert_called_once_with(Source.BEAR, ["n2"])
+    assert [(n["id"], n["source"]) for n in added] == [("n2", "bear")]
+    assert updated == deleted == []
+
+
+def test_diff_notes_fetches_unchanged_notes_synced_late(fake_notes):
+    stored = pipeline.process_notes(fake_notes, languages={Language.EN})
+    # Edited on another device before the last export, synced after it
+    synced = dict(fake_notes[1], body="Synced", modified="2025-01-05 12:00:00")
+    exported = [
+        {"id": "n1", "source": "apple", "modified": fake_notes[0]["modified"], "unchanged": True},
+        {"id": "n2", "source": "bear", "modified": synced["modified"], "unchanged": True},
+    ]
+
+    with patch("mnemo_cli.pipeline.export_notes_by_id", return_value=[synced]) as m_fetch:
+        added, updated, deleted = pipeline.diff_notes(stored, exported)
+
+    m_fetch.assert_called_once_with(Source.BEAR, ["n2"])
+    assert [(n["id"], n["body"]) for n in updated] == [("n2", "Synced")]
+    assert added == deleted == []
+
+
+def test_parse_date():
+    assert pipeline.parse_date("2025-02-01 12:00:00") == dt.datetime(2025, 2, 1, 12)
+    assert pipeline.parse_date(1738411200.5) == dt.datetime(2025, 2, 1, 12, 0, 0, 500000)
+
+
+def test_apply_delta_updates_index_in_place(fake_notes):
+    processed = pipeline.process_notes(fake_notes, languages={Language.EN})
+    index = pipeline.build_index(processed)
+    stored = [{"id": n["id"], "modified": n["modified"]} for n in processed]
+    exported = [dict(fake_notes[1], body="Other words", modified="2025-02-01 12:00:00")]
+    progress = Mock()
+
+    notes = pipeline.apply_delta(
+        stored, index, exported, {Language.EN}, progress=progress
+    )
+
+    assert [n["id"] for n in notes] == ["n2"]
+    assert "first" not in index
+    assert "more" not in index
+    assert [(index.doc_id(d), p) for d, p in index.postings("word")] == [("n2", [2])]
+    progress.assert_called_with("delta:done", added=0, updated=1, deleted=1)
+
+
+def test_rebuild_index_incremental(mock_deps, fake_notes):
+    Path(".mnemo/data").mkdir(parents=True)
+    Path(".mnemo/data/index.seg").touch()
+    mock_deps.export.return_value = fake_notes
+    mock_deps.segment.to_compact_index.return_value = pipeline.CompactIndex()
+    mock_deps.segment.iter_notes.return_value = iter([])
+    indexed_at = dt.datetime(2025, 1, 1, tzinfo=dt.timezone.utc)
+    mock_deps.load_config.return_value["indexed_at"] = {Source.APPLE: indexed_at}
+
+    pipeline.rebuild_index(incremental=True)
+
+    mock_deps.export.assert_called_once_with(Source.APPLE, since=indexed_at)
+    assert mock_deps.save_config.call_args.kwargs["indexed_at"][Source.APPLE] > indexed_at
+    assert not mock_deps.build_index.called
+    assert mock_deps.save_pickle.call_args.args[1].name == "stem_cache.pkl"
+    assert mock_deps.write_segment.called
+
+
+def test_rebuild_index_some_sources_keeps_others(mock_deps, fake_notes):
+    data_dir = Path(".mnemo/data")
+    data_dir.mkdir(parents=True)
+    pipeline.build_segment(iter(fake_notes), {Language.EN}, data_dir / "index.seg")
+    mock_deps.load_config.return_value["sources"] = {Source.APPLE, Source.BEAR}
+    mock_deps.export.return_value = [dict(fake_notes[1], body="Changed", modified="2025-02-01 12:00:00")]
+    with Segment(data_dir / "index.seg") as segment:
+        mock_deps.segment.to_compact_index.return_value = segment.to_compact_index()
+        mock_deps.segment.iter_notes.return_value = list(segment.iter_notes())
+
+    pipeline.rebuild_index(incremental=True, sources={Source.BEAR})
+
+    mock_deps.export.assert_called_once_with(Source.BEAR, since=None)
+    indexed_at = mock_deps.save_config.call_args.kwargs["indexed_at"]
+    assert set(indexed_at) == {Source.BEAR}
+    notes, index = mock_deps.write_segment.call_args.args[2], mock_deps.write_segment.call_args.args[1]
+    assert sorted(note["id"] for note in notes) == ["n1", "n2"]
+    assert "chang" in index
+
+
+def test_rebuild_index_incremental_without_changes(mock_deps, fake_notes):
+    data_dir = Path(".mnemo/data")
+    data_dir.mkdir(parents=True)
+    mock_deps.export.return_value = fake_notes
+    pipeline.rebuild_index()
+    with Segment(data_dir / "generations/1/index.seg") as segment:
+        mock_deps.segment.to_compact_index.return_value = segment.to_compact_index()
+        mock_deps.segment.iter_notes.return_value = list(segment.iter_notes())
+    progress = Mock()
+
+    pipeline.rebuild_index(progress=progress, incremental=True)
+
+    progress.assert_any_call("delta:done", added=0, updated=0, deleted=0)
+    assert not mock_deps.write_segment.called
+    assert pipeline.index_path(data_dir, Backend.SEGMENT) == data_dir / "generations/1/index.seg"
+    assert not (data_dir / "generations/2").exists()
+
+
+def test_rebuild_index_some_sources_needs_incremental(mock_deps):
+    Path(".mnemo/data").mkdir(parents=True)
+    mock_deps.load_config.return_value["sources"] = {Source.APPLE, Source.BEAR}
+
+    with pytest.raises(RuntimeError, match="needs an existing index"):
+        pipeline.rebuild_index(sources={Source.BEAR})
+
+
+def test_migrate_legacy_data_dir(fake_notes):
+    data_dir = Path(".mnemo/data")
+    data_dir.mkdir(parents=True)
+    processed = pipeline.process_notes(fake_notes, languages={Language.EN})
+    save_pickle(processed, data_dir / "notes.pkl")
+    save_pickle({"text": {"n1": [0]}}, data_dir / "index.pkl")
+    save_pickle([{"note": processed[0], "score": (1, 1, 0)}], data_dir / "last_search.pkl")
+
+    assert migrate_data_dir(data_dir)
+
+    assert not (data_dir / "notes.pkl").exists()
+    assert not (data_dir / "index.pkl").exists()
+    assert load_pickle(data_dir / "last_search.pkl") == [("n1", "apple", (1, 1, 0))]
+    with pipeline.Segment(data_dir / "generations/1/index.seg") as segment:
+        assert len(segment.notes) == 2
+        assert "tokens" not in segment.notes["n2"]
+        assert len(segment.postings("text")) == 2
+    assert not migrate_data_dir(data_dir)
+
+
+def test_migrate_flat_segment_to_generation(fake_notes):
+    data_dir = Path(".mnemo/data")
+    data_dir.mkdir(parents=True)
+    pipeline.build_segment(iter(fake_notes), {Language.EN}, data_dir / "index.seg")
+
+    assert migrate_data_dir(data_dir)
+
+    assert not (data_dir / "index.seg").exists()
+    assert pipeline.index_path(data_dir, Backend.SEGMENT) == data_dir / "generations/1/index.seg"
+    with pipeline.open_index(data_dir, Backend.SEGMENT) as segment:
+        assert len(segment.notes) == 2
+    assert not migrate_data_dir(data_dir)
+
+
+def test_build_segment_parallel_matches_serial(fake_notes):
+    notes = [
+        dict(fake_notes[i % 2], id=f"n{i}", body=f"text {i} words")
+        for i in range(20)
+    ]
+    progress = Mock()
+
+    pipeline.build_segment(iter(notes), {Language.EN}, Path("serial.seg"), batch_size=7)
+    pipeline.build_segment(
+        iter(notes), {Language.EN}, Path("parallel.seg"),
+        jobs=2, batch_size=7, progress=progress
+    )
+
+    with pipeline.Segment("serial.seg") as serial, pipeline.Segment("parallel.seg") as parallel:
+        serial_index = serial.to_compact_index()
+        parallel_index = parallel.to_compact_index()
+        assert [n["id"] for n in parallel.iter_notes()] == [n["id"] for n in notes]
+        assert "tokens" not in parallel.notes["n3"]
+    assert parallel_index.doc_ids == serial_index.doc_ids
+    assert parallel_index.terms == serial_index.terms
+    chunk_events = [c.kwargs for c in progress.call_args_list if c.args[0] == "process:chunk"]
+    assert chunk_events == [{"notes": 7}, {"notes": 14}, {"notes": 20}]
+
+
+def test_build_segment_parallel_keeps_worker_stems(monkeypatch, fake_notes):
+    cache = StemCache()
+    monkeypatch.setattr(pipeline, "STEM_CACHE", cache)
+    monkeypatch.setattr(text, "STEM_CACHE", cache)
+    notes = [dict(fake_notes[0], id=f"n{i}", body=f"running {i}") for i in range(4)]
+
+    pipeline.build_segment(iter(notes), {Language.EN}, Path("index.seg"), jobs=2)
+
+    assert cache.entries[Language.EN]["running"] == "run"
+    assert cache.stats()["misses"] >= 2
+
+
+def test_rebuild_index_rejects_empty_batches(mock_deps, fake_notes):
+    data_dir = Path(".mnemo/data")
+    data_dir.mkdir(parents=True)
+    mock_deps.export.return_value = fake_notes
+    pipeline.rebuild_index()
+
+    with pytest.raises(ValueError, match="batch_size must be 1 or more"):
+        pipeline.rebuild_index(batch_size=0)
+
+    assert pipeline.index_path(data_dir, Backend.SEGMENT) == data_dir / "generations/1/index.seg"
+
+
+def test_build_segment_rejects_negative_jobs(fake_notes):
+    with pytest.raises(ValueError, match="jobs must be 0 or more"):
+        pipeline.build_segment(iter(fake_notes), {Language.EN}, Path("index.seg"), jobs=-1)
+    assert not Path("index.seg").exists()
+
+
+def test_search_batch(fake_notes):
+    with patch("mnemo_cli.pipeline.export_notes", return_value=fake_notes):
+        pipeline.init_mnemo({Source.APPLE}, {Language.EN})
+    queries = ["text", "second", "missing", "mor"]
+
+    serial = list(pipeline.search_batch(iter(queries), limit=1, fuzzy=True))
+    parallel = list(pipeline.search_batch(iter(queries), jobs=2, limit=1, fuzzy=True))
+
+    assert [r["query"] for r in serial] == queries
+    assert [r["total"] for r in serial] == [2, 1, 0, 1]
+    assert [(r["id"], r["title"]) for r in serial[1]["results"]] == [("n2", "Second")]
+    assert serial[3]["corrections"] == {"mor": "more"}
+    assert all(r["seconds"] > 0 for r in serial)
+    for result in serial + parallel:
+        del result["seconds"]
+    assert parallel == serial
+    assert not Path(".mnemo/data/last_search.pkl").exists()
+
+
+def test_search_batch_answers_without_waiting_for_input(fake_notes):
+    with patch("mnemo_cli.pipeline.export_notes", return_value=fake_notes):
+        pipeline.init_mnemo({Source.APPLE}, {Language.EN})
+    answered = threading.Event()
+
+    def queries():
+        yield "text"
+        # Like an editor waiting for the answer before sending more
+        assert answered.wait(10)
+        yield "second"
+
+    results = pipeline.search_batch(queries(), jobs=2)
+    first = next(results)
+    answered.set()
+
+    assert [first["query"]] + [r["query"] for r in results] == ["text", "second"]
+
+
+def test_build_segment_removes_partial_file_on_error(fake_notes):
+    def notes():
+        yield fake_notes[0]
+        raise RuntimeError("export failed")
+
+    with pytest.raises(RuntimeError, match="export failed"):
+        pipeline.build_segment(notes(), {Language.EN}, Path("index.seg"))
+    assert not Path("index.seg").exists()
+
+
+def test_stem_cache_roundtrip(monkeypatch):
+    data_dir = Path(".mnemo/data")
+    data_dir.mkdir(parents=True)
+    cache = StemCache()
+    monkeypatch.setattr(pipeline, "STEM_CACHE", cache)
+    cache.stem("running", Language.EN)
+    pipeline.save_stem_cache(data_dir)
+
+    fresh = StemCache()
+    monkeypatch.setattr(pipeline, "STEM_CACHE", fresh)
+    pipeline.load_stem_cache(data_dir)
+
+    assert fresh.entries[Language.EN] == {"running": "run"}
@@ -0,0 +1,86 @@
+import pickle
+
+from mnemo_cli.postings import CompactIndex, IndexBuilder, decode_postings, encode_postings
+
+
+def test_encode_decode_roundtrip():
+    entries = [(0, [0, 5, 300]), (7, [2]), (1000, [0, 1, 2])]
+    buf = encode_postings(entries)
+    assert isinstance(buf, bytes)
+    assert decode_postings(buf) == entries
+
+
+def test_add_documents_appends_postings():
+    idx = CompactIndex()
+    idx.add_documents([("a", [("python", 0), ("ai", 1)])])
+    idx.add_documents([("b", [("python", 3), ("python", 9)])])
+
+    assert len(idx) == 2
+    assert idx.postings("python") == [(0, [0]), (1, [3, 9])]
+    assert idx.doc_numbers == {"a": 0, "b": 1}
+
+
+def test_remove_documents():
+    idx = CompactIndex()
+    idx.add_documents([
+        ("a", [("python", 0), ("ai", 1)]),
+        ("b", [("python", 0)]),
+    ])
+    idx.remove_documents(["a"])
+
+    assert "ai" not in idx
+    assert idx.postings("python") == [(1, [0])]
+    assert idx.doc_ids == [None, "b"]
+    assert idx.doc_terms == [None, ["python"]]
+
+
+def test_compact_renumbers_remaining_documents():
+    idx = CompactIndex()
+    idx.add_documents([
+        ("a", [("python", 0), ("ai", 1)]),
+        ("b", [("python", 0)]),
+        ("c", [("ai", 0), ("python", 2)]),
+    ])
+    idx.remove_documents(["b"])
+    idx.compact()
+
+    assert idx.doc_ids == ["a", "c"]
+    assert idx.doc_numbers == {"a": 0, "c": 1}
+    assert idx.postings("python") == [(0, [0]), (1, [2])]
+    assert idx.doc_lengths == [2, 2]
+
+
+def test_iter_terms_by_prefix():
+    index = CompactIndex()
+    index.add_documents([("n1", [("kube", 0), ("docker", 1)])])
+    assert list(index.iter_terms("ku")) == ["kube"]
+    index.add_documents([("n2", [("kubectl", 0)])])
+    assert list(index.iter_terms("kube")) == ["kube", "kubectl"]
+    index.remove_documents(["n1"])
+    assert list(index.iter_terms()) == ["kubectl"]
+
+
+def test_pickle_roundtrip():
+    idx = CompactIndex()
+    idx.add_documents([("a", [("python", 0)])])
+    loaded = pickle.loads(pickle.dumps(idx))
+
+    assert loaded.postings("python") == [(0, [0])]
+    assert loaded.doc_numbers == {"a": 0}
+
+
+def test_index_builder_matches_add_documents():
+    docs = [("a", [("python", 0), ("ai", 1)]), ("b", [("ai", 1)]), ("c", [("python", 2)])]
+    expected = CompactIndex()
+    expected.add_documents(docs)
+
+    builder = IndexBuilder()
+    builder.add(*docs[0])
+    part = CompactIndex()
+    part.add_documents(docs[1:])
+    builder.add_index(part)
+    index = builder.finish()
+
+    assert index.doc_ids == ["a", "b", "c"]
+    assert index.doc_terms == expected.doc_terms
+    assert index.terms == expected.terms
@@ -0,0 +1,98 @@
+from datetime import datetime
+
+import pytest
+
+from mnemo_cli.postings import CompactIndex
+from mnemo_cli.segment import Segment, write_segment
+
+
+@pytest.fixture
+def notes():
+    return [
+        {
+            "id": "n2",
+            "title": "Second",
+            "body": "Python with data",
+            "modified": datetime(2025, 1, 2),
+            "tokens": [("python", 0), ("data", 2)],
+        },
+        {
+            "id": "n1",
+            "title": "First",
+            "body": "Python ai",
+            "modified": datetime(2025, 1, 1),
+            "tokens": [("python", 0), ("ai", 1)],
+        },
+    ]
+
+
+@pytest.fixture
+def segment(tmp_path, notes):
+    index = CompactIndex()
+    index.add_documents([("gone", [("gone", 0), ("python", 1)])])
+    index.add_documents((n["id"], n["tokens"]) for n in notes)
+    index.remove_documents(["gone"])
+    path = tmp_path / "index.seg"
+    write_segment(path, index, notes)
+    with Segment(path) as seg:
+        yield seg
+
+
+def test_segment_terms(segment):
+    assert len(segment) == 3
+    assert [segment.term_at(i) for i in range(3)] == ["ai", "data", "python"]
+    assert "python" in segment
+    assert "rust" not in segment
+    assert segment.postings("python") == [(0, [0]), (1, [0])]
+    assert segment.postings("rust") == []
+    assert segment.doc_frequency("python") == 2
+    assert segment.doc_frequency("rust") == 0
+
+
+def test_segment_iter_terms(segment):
+    assert list(segment.iter_terms()) == ["ai", "data", "python"]
+    assert list(segment.iter_terms("da")) == ["data"]
+    assert list(segment.iter_terms("b")) == []
+    assert list(segment.iter_terms("z")) == []
+
+
+def test_segment_gram_terms(segment):
+    assert segment.n_grams == len(segment.to_compact_index().grams)
+    assert segment.gram_terms("$$p") == [2]
+    assert segment.gram_terms("ta$") == [1]
+    assert segment.gram_terms("zzz") == []
+
+
+def test_segment_ranking_stats(segment):
+    assert segment.doc_count == 2
+    assert segment.total_length == 4
+    assert segment.n_docs == 2
+    assert [segment.doc_length(doc) for doc in range(2)] == [2, 2]
+
+
+def test_segment_stored_notes(segment):
+    assert segment.doc_id(1) == "n1"
+    assert segment.doc_number("n2") == 0
+    assert segment.doc_number("n3") is None
+    note = segment.notes["n1"]
+    assert note["title"] == "First"
+    assert note["modified"] == datetime(2025, 1, 1)
+    assert "tokens" not in note
+    assert sorted(segment.notes) == ["n1", "n2"]
+    assert [n["id"] for n in segment.iter_notes()] == ["n2", "n1"]
+
+
+def test_segment_to_compact_index(segment):
+    index = segment.to_compact_index()
+    assert index.doc_ids == ["n2", "n1"]
+    assert index.doc_terms == [["data", "python"], ["ai", "python"]]
+    assert index.postings("data") == [(0, [2])]
+    assert index.doc_lengths == [2, 2]
+    assert index.total_length == 4
+
+
+def test_segment_invalid_file(tmp_path):
+    path = tmp_path / "index.seg"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(RuntimeError, match="Invalid index segment"):
+        Segment(path)
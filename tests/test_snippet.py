@@ -0,0 +1,52 @@
+from mnemo_cli.enums import Language
+from mnemo_cli.utils import snippet
+from mnemo_cli.utils.text import prepare_for_index, token_offsets
+
+
+def make_note(title, body):
+    text = title + " " + body
+    return {
+        "title": title,
+        "body": body,
+        "offsets": snippet.encode_offsets(token_offsets(text)),
+        "tokens": prepare_for_index(text, {Language.EN}),
+    }
+
+
+def positions_of(note, stems):
+    return sorted(pos for token, pos in note["tokens"] if token in stems)
+
+
+def test_token_offsets_map_to_original_text():
+    text = "Hello,  WORLD\n İZMİR trip"
+    offsets = token_offsets(text)
+    assert text[offsets[0]:].startswith("Hello")
+    assert text[offsets[1]:].startswith("WORLD")
+    assert text[offsets[-1]:].startswith("trip")
+
+
+def test_densest_window():
+    assert snippet.densest_window([1, 40, 42, 45, 90], 10) == (1, 4)
+    assert snippet.densest_window([7], 10) == (0, 1)
+
+
+def test_build_snippet_highlights_stemmed_matches():
+    body = (
+        "Some intro words that are not relevant here at all. "
+        "Later I was running tests and the runner ran more tests quickly. "
+        "Trailing words follow after the match window ends here."
+    )
+    note = make_note("Tests", body)
+    segments = snippet.build_snippet(note, positions_of(note, {"run", "runner", "test"}))
+
+    matched = [text for text, is_match in segments if is_match]
+    assert matched == ["running", "tests", "runner", "tests"]
+    assert segments[0] == ("...", False)
+    assert segments[-1] == ("...", False)
+    assert "".join(text for text, _ in segments[1:-1]) in body
+
+
+def test_build_snippet_ignores_title_matches():
+    note = make_note("Python", "Nothing relevant in the body")
+    assert snippet.build_snippet(note, positions_of(note, {"python"})) is None
+    assert snippet.build_snippet({"title": "t", "body": "b"}, [1]) is None
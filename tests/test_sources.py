@@ -0,0 +1,110 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+
+from mnemo_cli import pipeline
+from mnemo_cli.enums import Language
+from mnemo_cli.sources import CORE_DATA_EPOCH, CORE_DATA_OFFSET, export_bear_notes
+
+
+def test_export_bear_notes(bear_db):
+    bear_db.add("a", "First", "text", 500, created=100)
+    bear_db.add("b", "Second", "more", 700)
+    bear_db.add("c", "Trashed", "gone", 800)
+    bear_db.trash("c")
+
+    notes = list(export_bear_notes(bear_db.path))
+
+    assert [note["id"] for note in notes] == ["b", "a"]
+    assert notes[1] == {
+        "id": "a",
+        "title": "First",
+        "body": "text",
+        "created": CORE_DATA_OFFSET + 100,
+        "modified": CORE_DATA_OFFSET + 500,
+    }
+
+
+def test_export_bear_notes_since(bear_db):
+    bear_db.add("a", "First", "text", 500)
+    bear_db.add("b", "Second", "more", 1500)
+    bear_db.add("c", "Third", "gone", 600)
+    bear_db.trash("c")
+
+    notes = list(export_bear_notes(bear_db.path, since=CORE_DATA_EPOCH + timedelta(seconds=1000)))
+
+    assert notes == [
+        {
+            "id": "b",
+            "title": "Second",
+            "body": "more",
+            "created": CORE_DATA_OFFSET + 1500,
+            "modified": CORE_DATA_OFFSET + 1500,
+        },
+        {"id": "a", "modified": CORE_DATA_OFFSET + 500, "unchanged": True},
+    ]
+
+
+def test_export_bear_notes_by_id(bear_db):
+    for uid in "abc":
+        bear_db.add(uid, uid.upper(), "text", 500)
+    bear_db.trash("c")
+
+    with patch("mnemo_cli.sources.BEAR_IDS_PER_QUERY", 1):
+        notes = list(export_bear_notes(bear_db.path, ids=["a", "c", "b"]))
+
+    assert sorted(note["id"] for note in notes) == ["a", "b"]
+
+
+def test_delta_export_adds_restored_notes(bear_db):
+    bear_db.add("a", "First", "text", 500)
+    bear_db.add("b", "Second", "zebra", 600)
+    bear_db.trash("b")
+    stored = pipeline.process_notes(
+        [dict(note, source="bear") for note in export_bear_notes(bear_db.path)], {Language.EN}
+    )
+    index = pipeline.build_index(stored)
+
+    # Restored from the trash, its modification time stays before `since`
+    with bear_db.connect() as conn:
+        conn.execute("UPDATE ZSFNOTE SET ZTRASHED = 0 WHERE ZUNIQUEIDENTIFIER = 'b'")
+    conn.close()
+    since = CORE_DATA_EPOCH + timedelta(seconds=1000)
+    exported = [dict(note, source="bear") for note in export_bear_notes(bear_db.path, since=since)]
+
+    with patch(
+            "mnemo_cli.pipeline.export_notes_by_id",
+            lambda source, ids: export_bear_notes(bear_db.path, ids=ids),
+            ):
+        notes = pipeline.apply_delta(stored, index, exported, {Language.EN})
+
+    assert sorted(note["id"] for note in notes) == ["a", "b"]
+    assert "zebra" in index
+
+
+def test_delta_export_updates_notes_synced_late(bear_db):
+    bear_db.add("a", "First", "text", 500)
+    stored = pipeline.process_notes(
+        [dict(note, source="bear") for note in export_bear_notes(bear_db.path)], {Language.EN}
+    )
+    index = pipeline.build_index(stored)
+
+    # Edited elsewhere before `since`, synced after the last export
+    bear_db.update("a", "zebra", 800)
+    since = CORE_DATA_EPOCH + timedelta(seconds=1000)
+    exported = [dict(note, source="bear") for note in export_bear_notes(bear_db.path, since=since)]
+
+    with patch(
+            "mnemo_cli.pipeline.export_notes_by_id",
+            lambda source, ids: export_bear_notes(bear_db.path, ids=ids),
+            ):
+        notes = pipeline.apply_delta(stored, index, exported, {Language.EN})
+
+    assert [note["body"] for note in notes] == ["zebra"]
+    assert "zebra" in index
+
+
+def test_export_bear_notes_missing_database(tmp_path):
+    with pytest.raises(RuntimeError, match="Bear database not found"):
+        list(export_bear_notes(tmp_path / "database.sqlite"))
@@ -0,0 +1,124 @@
+import pytest
+
+from mnemo_cli import pipeline
+from mnemo_cli.enums import Language
+from mnemo_cli.indexer import search_index
+from mnemo_cli.segment import Segment
+from mnemo_cli.sqlite_index import STOP_TOKEN, SqliteIndex, token_columns
+
+
+LANGUAGES = {Language.EN, Language.ES}
+
+
+def make_note(note_id, title, body, modified="2025-01-02 12:00:00"):
+    return {
+        "id": note_id,
+        "source": "apple",
+        "title": title,
+        "body": body,
+        "created": "2025-01-01 12:00:00",
+        "modified": modified,
+    }
+
+
+@pytest.fixture
+def notes():
+    return [
+        make_note("n1", "Kubernetes", "Edit the kube config file and restart the pods"),
+        make_note("n2", "Python", "Running python scripts with the kubectl client"),
+        make_note("n3", "Recetas", "La receta de café con leche para la mañana"),
+        make_note("n4", "Config", "Config for kube file, then running tests"),
+    ]
+
+
+@pytest.fixture
+def indexes(tmp_path, notes):
+    pipeline.build_segment(iter(notes), LANGUAGES, tmp_path / "index.seg")
+    pipeline.build_sqlite(iter(notes), LANGUAGES, tmp_path / "index.sqlite", batch_size=2)
+    with Segment(tmp_path / "index.seg") as segment, SqliteIndex(tmp_path / "index.sqlite") as index:
+        yield segment, index
+
+
+def search(index, query, **options):
+    results, total, _ = search_index(
+        query=query, index=index, notes=index.notes, languages=LANGUAGES, **options
+    )
+    return [(r["note"]["id"], r["score"], r["positions"]) for r in results], total
+
+
+def test_token_columns():
+    tokens = [("edit", 0), ("kube", 2), ("kub", 2), ("config", 3)]
+    assert token_columns(tokens, 2) == [
+        f"edit {STOP_TOKEN} kube config",
+        f"{STOP_TOKEN} {STOP_TOKEN} kub {STOP_TOKEN}",
+    ]
+
+
+def test_sqlite_index_matches_segment(indexes):
+    segment, index = indexes
+    assert len(index) == len(segment)
+    assert len(index.notes) == 4
+    assert index.total_length == segment.total_length
+    assert list(index.iter_terms("kub")) == list(segment.iter_terms("kub"))
+    assert [(index.doc_id(d), p) for d, p in index.postings("kube")] == [
+        (segment.doc_id(d), p) for d, p in segment.postings("kube")
+    ]
+    assert index.notes["n3"] == segment.notes["n3"]
+
+    for query, options in [
+        ("kube config", {}),
+        ('"kube config file"', {}),
+        ("running python", {"scorer": "tuple"}),
+        ("kub*", {}),
+        ("recta cafe", {"fuzzy": True}),
+    ]:
+        assert search(index, query, **options) == search(segment, query, **options)
+
+
+def test_update_sqlite(tmp_path, notes):
+    path = tmp_path / "index.sqlite"
+    pipeline.build_sqlite(iter(notes), LANGUAGES, path)
+    exported = [
+        notes[0],
+        make_note("n2", "Python", "Only rust now", modified="2025-02-01 12:00:00"),
+        make_note("n5", "New", "A new python note"),
+    ]
+
+    pipeline.update_sqlite(path, iter(exported), LANGUAGES, failed_sources={"bear"})
+
+    with SqliteIndex(path) as index:
+        assert sorted(index.notes) == ["n1", "n2", "n5"]
+        assert "kubectl" not in index
+        assert [index.doc_id(doc) for doc, _ in index.postings("python")] == ["n5", "n2"]
+        assert index.total_length == sum(
+            index.doc_length(index.doc_number(note_id)) for note_id in index.notes
+        )
+
+
+def test_update_sqlite_writes_changes_to_output(tmp_path, notes):
+    path = tmp_path / "index.sqlite"
+    output = tmp_path / "updated.sqlite"
+    pipeline.build_sqlite(iter(notes), LANGUAGES, path)
+
+    pipeline.update_sqlite(path, iter(notes), LANGUAGES, output=output)
+    assert not output.exists()
+
+    pipeline.update_sqlite(path, iter(notes[1:]), LANGUAGES, output=output)
+    with SqliteIndex(path) as index:
+        assert "n1" in index.notes
+    with SqliteIndex(output) as index:
+        assert sorted(index.notes) == sorted(note["id"] for note in notes[1:])
+
+
+def test_sqlite_index_path_with_uri_characters(tmp_path, notes):
+    path = tmp_path / "h#a?sh" / "index.sqlite"
+    path.parent.mkdir()
+    pipeline.build_sqlite(iter(notes), LANGUAGES, path)
+
+    with SqliteIndex(path) as index:
+        assert sorted(index.notes) == sorted(note["id"] for note in notes)
+
+
+def test_sqlite_index_missing_file(tmp_path):
+    with pytest.raises(RuntimeError, match="Index database not found"):
+        SqliteIndex(tmp_path / "index.sqlite")
@@ -0,0 +1,60 @@
+import pytest
+
+from mnemo_cli.utils.storage import (
+    GENERATIONS_DIR,
+    atomic_write,
+    current_generation,
+    generation_numbers,
+    new_generation,
+)
+
+
+def test_atomic_write_keeps_old_file_on_error(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text("old")
+
+    with pytest.raises(ValueError):
+        with atomic_write(path, "w") as f:
+            f.write("new")
+            raise ValueError
+
+    assert path.read_text() == "old"
+    assert list(tmp_path.iterdir()) == [path]
+
+    with atomic_write(path, "w") as f:
+        f.write("new")
+    assert path.read_text() == "new"
+
+
+def test_new_generation_publishes_on_success(tmp_path):
+    assert current_generation(tmp_path) is None
+
+    with new_generation(tmp_path) as generation:
+        (generation / "index.seg").write_bytes(b"first")
+        assert current_generation(tmp_path) is None
+
+    assert current_generation(tmp_path) == generation
+    assert (current_generation(tmp_path) / "index.seg").read_bytes() == b"first"
+
+
+def test_new_generation_rolls_back_on_error(tmp_path):
+    with new_generation(tmp_path) as first:
+        (first / "index.seg").write_bytes(b"first")
+
+    with pytest.raises(RuntimeError):
+        with new_generation(tmp_path) as generation:
+            (generation / "index.seg").write_bytes(b"partial")
+            raise RuntimeError
+
+    assert current_generation(tmp_path) == first
+    assert generation_numbers(tmp_path) == [1]
+
+
+def test_old_generations_are_collected(tmp_path):
+    for _ in range(4):
+        with new_generation(tmp_path) as generation:
+            (generation / "index.seg").write_bytes(generation.name.encode())
+
+    # The current generation and the one before it are kept
+    assert generation_numbers(tmp_path) == [3, 4]
+    assert current_generation(tmp_path) == tmp_path / GENERATIONS_DIR / "4"
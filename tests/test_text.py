@@ -53,3 +53,47 @@ def test_prepare_for_search():
     assert "ai" in q
     assert "the" not in q
     assert "and" not in q
+
+
+def test_split_phrases():
+    query, phrases = text.split_phrases('docker "kube config" ""')
+    assert phrases == ["kube config"]
+    assert '"' not in query
+
+
+def test_split_wildcards():
+    query, patterns = text.split_wildcards("Kube** setup kube**tes* kube*")
+    assert patterns == ["kube*", "kube*tes*"]
+    assert "*" not in query
+    assert text.tokenize(query) == ["setup"]
+
+
+def test_prepare_phrase_keeps_stop_word_gaps():
+    phrase = text.prepare_phrase("the running of python", {Language.EN})
+    assert phrase == [(0, ["run"]), (2, ["python"])]
+
+
+def test_stem_cache_counts_hits_and_evicts():
+    cache = text.StemCache(maxsize=2)
+    assert cache.stem("running", Language.EN) == "run"
+    assert cache.stem("running", Language.EN) == "run"
+    cache.stem("jumping", Language.EN)
+    cache.stem("walking", Language.EN)
+
+    assert cache.stats() == {"hits": 1, "misses": 3, "size": 2}
+    assert "running" not in cache.entries[Language.EN]
+
+
+def test_stem_cache_merges_worker_stems():
+    worker = text.StemCache()
+    worker.stem("running", Language.EN)
+    worker.record_new()
+    worker.stem("running", Language.EN)
+    worker.stem("jumping", Language.EN)
+
+    cache = text.StemCache()
+    cache.merge(worker.take_new())
+
+    assert dict(cache.entries[Language.EN]) == {"jumping": "jump"}
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+    assert worker.take_new() == {"stems": {}, "hits": 0, "misses": 0}
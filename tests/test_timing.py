@@ -0,0 +1,38 @@
+import time
+
+from mnemo_cli.utils.timing import Timings
+
+
+def test_nested_spans_record_exclusive_time():
+    timings = Timings()
+    with timings.span("outer"):
+        time.sleep(0.01)
+        with timings.span("inner"):
+            time.sleep(0.02)
+
+    spans = timings.snapshot()
+    assert spans["inner"]["seconds"] >= 0.02
+    assert 0.01 <= spans["outer"]["seconds"] < 0.02
+
+
+def test_added_time_is_excluded_from_enclosing_span():
+    timings = Timings()
+    with timings.span("process"):
+        started = time.perf_counter()
+        time.sleep(0.02)
+        timings.add("export", time.perf_counter() - started)
+
+    spans = timings.snapshot()
+    assert spans["export"]["seconds"] >= 0.02
+    assert spans["process"]["seconds"] < 0.01
+
+
+def test_spans_accumulate_calls():
+    timings = Timings()
+    for _ in range(3):
+        with timings.span("search:score"):
+            pass
+    assert timings.snapshot()["search:score"]["calls"] == 3
+
+    timings.reset()
+    assert timings.snapshot() == {}
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from mnemo_cli import indexer
+from mnemo_cli.enums import Language
+
+pytest.importorskip("numpy")
+
+
+WORDS = ["python", "ai", "data", "rust", "kube", "config", "file", "note"]
+
+
+@pytest.fixture
+def corpus():
+    rng = random.Random(7)
+    notes = []
+    for i in range(300):
+        length = rng.randint(1, 30)
+        words = rng.choices(WORDS, k=length)
+        notes.append({
+            "id": f"n{i}",
+            "tokens": [(word, pos) for pos, word in enumerate(words)],
+        })
+    index = indexer.build_index(notes)
+    indexer.remove_from_index(index, ["n3", "n50"])
+    return index, {n["id"]: n for n in notes}
+
+
+@pytest.mark.parametrize("scorer", ["bm25", "tuple"])
+@pytest.mark.parametrize("limit", [None, 0, 1, 5, 40])
+@pytest.mark.parametrize("query", ["python", "python ai", "kube config file rust"])
+def test_vectorized_matches_python(corpus, monkeypatch, scorer, limit, query):
+    index, notes = corpus
+    monkeypatch.setattr(indexer, "prepare_for_search", lambda q, languages: q.split())
+
+    kwargs = dict(query=query, index=index, notes=notes, languages={Language.EN},
+                  limit=limit, scorer=scorer)
+    expected, expected_total, _ = indexer.search_index(**kwargs)
+    results, total, _ = indexer.search_index(**kwargs, vectorized=True)
+
+    assert total == expected_total
+    assert [r["note"]["id"] for r in results] == [r["note"]["id"] for r in expected]
+    assert [r["score"] for r in results] == [r["score"] for r in expected]
+    assert [r["phrase_matches"] for r in results] == [r["phrase_matches"] for r in expected]
+    assert [r["max_coverage"] for r in results] == [r["max_coverage"] for r in expected]
+
+
+def test_vectorized_no_candidates(corpus, monkeypatch):
+    index, notes = corpus
+    monkeypatch.setattr(indexer, "prepare_for_search", lambda q, languages: q.split())
+    res = indexer.search_index(
+        query="golang", index=index, notes=notes, languages={Language.EN},
+        limit=5, vectorized=True
+    )
+    assert res == ([], 0, {})
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
+import pytest
+
+from mnemo_cli.enums import Source
+from mnemo_cli.sources import CORE_DATA_EPOCH
+from mnemo_cli.watcher import Watcher, bear_fingerprint, bear_modified_since, watch
+
+
+LAST_INDEXED_AT = CORE_DATA_EPOCH + timedelta(seconds=1000)
+
+
+def make_watcher(bear_db, sources=frozenset({Source.BEAR}), **options):
+    return Watcher(
+        set(sources),
+        {Source.BEAR: LAST_INDEXED_AT},
+        now=0.0,
+        bear_db_path=bear_db.path,
+        debounce=5.0,
+        **options,
+    )
+
+
+def test_bear_fingerprint(bear_db):
+    bear_db.add("a", "First", "text", 500)
+    bear_db.add("b", "Second", "text", 700)
+    assert bear_fingerprint(bear_db.path) == (2, 1200)
+    assert not bear_modified_since(bear_db.path, LAST_INDEXED_AT)
+
+    bear_db.trash("b")
+    assert bear_fingerprint(bear_db.path) == (1, 500)
+
+    # Synced from another device with an older modification time
+    bear_db.update("a", "synced text", 400)
+    assert bear_fingerprint(bear_db.path) == (1, 400)
+
+    bear_db.update("a", "new text", 1500)
+    assert bear_modified_since(bear_db.path, LAST_INDEXED_AT)
+
+
+def test_watcher_debounces_bear_changes(bear_db):
+    bear_db.add("a", "First", "text", 500)
+    watcher = make_watcher(bear_db)
+    assert watcher.poll(0.0) == set()
+
+    bear_db.update("a", "typing", 2000)
+    assert watcher.poll(1.0) == set()
+    bear_db.update("a", "typing more", 2001)
+    assert watcher.poll(4.0) == set()
+    # Quiet for the debounce delay since the last change
+    assert watcher.poll(8.0) == set()
+    assert watcher.poll(9.0) == {Source.BEAR}
+
+    watcher.updated({Source.BEAR}, 9.5)
+    assert watcher.poll(20.0) == set()
+
+    bear_db.delete("a")
+    assert watcher.poll(21.0) == set()
+    assert watcher.poll(26.0) == {Source.BEAR}
+
+
+def test_watcher_updates_changes_made_before_start(bear_db):
+    bear_db.add("a", "First", "text", 1500)
+    watcher = make_watcher(bear_db)
+
+    assert watcher.poll(0.0) == set()
+    assert watcher.poll(5.0) == {Source.BEAR}
+
+
+def test_watcher_retries_failed_update(bear_db):
+    bear_db.add("a", "First", "text", 1500)
+    watcher = make_watcher(bear_db)
+    watcher.poll(0.0)
+
+    watcher.updated({Source.BEAR}, 5.0, failed=True)
+    assert watcher.poll(6.0) == set()
+    assert watcher.poll(10.0) == {Source.BEAR}
+
+
+def test_watcher_exports_apple_on_interval(tmp_path):
+    watcher = Watcher(
+        {Source.APPLE},
+        {Source.APPLE: CORE_DATA_EPOCH},
+        now=0.0,
+        bear_db_path=tmp_path / "missing.sqlite",
+        apple_interval=60.0,
+    )
+    # Last indexed long ago
+    assert watcher.poll(0.0) == {Source.APPLE}
+
+    watcher.updated({Source.APPLE}, 1.0)
+    assert watcher.poll(30.0) == set()
+    assert watcher.poll(61.0) == {Source.APPLE}
+
+
+def test_watch_reports_failed_exports(tmp_path):
+    def rebuild_index(progress, *, incremental, sources, failed_sources):
+        progress("export:source", source="bear", notes=0, seconds=0.1, error="database is locked")
+        progress("export:source", source="apple", notes=2, seconds=0.1, error=None)
+        failed_sources.add("bear")
+
+    config = {"sources": {Source.APPLE, Source.BEAR}, "indexed_at": {}}
+    watcher = Mock()
+    watcher.poll.return_value = {Source.APPLE, Source.BEAR}
+    progress = Mock()
+    with patch("mnemo_cli.watcher.find_project_root", return_value=tmp_path), \
+         patch("mnemo_cli.watcher.load_config", return_value=config), \
+         patch("mnemo_cli.watcher.Watcher", return_value=watcher), \
+         patch("mnemo_cli.watcher.rebuild_index", rebuild_index), \
+         patch("mnemo_cli.watcher.time.sleep", side_effect=KeyboardInterrupt), \
+         pytest.raises(KeyboardInterrupt):
+        watch(progress=progress)
+
+    assert watcher.updated.call_args_list[0].args[0] == {Source.APPLE}
+    assert watcher.updated.call_args_list[1].args[0] == {Source.BEAR}
+    assert watcher.updated.call_args_list[1].kwargs == {"failed": True}
+    progress.assert_any_call("watch:error", source="bear", error="database is locked")
+    assert progress.call_args.args == ("watch:update",)
+    assert progress.call_args.kwargs["sources"] == ["apple"]